@@ -1,14 +1,77 @@
 # src/app.py
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from src.models import Base
-from src.database import engine
+from fastapi.responses import JSONResponse, PlainTextResponse
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+from src import metrics
+from src.changes import compact_periodically
+from src.config import Config
+from src.database import dispose_async_engine, dispose_engine, get_engine
+from src.health import health_checker
+from src.migrations import ensure_schema
+from src.password_hashing import password_hasher
 from src.routes.users_routes import router as user_router
+from src.routes.internal_routes import router as internal_router
+from src.middleware.metrics_middleware import MetricsMiddleware
+from src.middleware.access_log_middleware import AccessLogMiddleware, parse_route_sample_rates
+from src.middleware.compression_middleware import CompressionMiddleware
+from src.middleware.jwt_middleware import cleanup_auth_middleware
+from src.logger_config import setup_logging
+
+config = Config()
+setup_logging(config)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nada toca la BD al importar: el esquema se comprueba aquí, una vez por
+    # worker, y solo uno aplica migraciones pendientes (lock + reintentos)
+    if config.RUN_MIGRATIONS_ON_STARTUP:
+        started = time.perf_counter()
+        applied = await run_in_threadpool(
+            ensure_schema,
+            get_engine(),
+            config.DB_STARTUP_TIMEOUT,
+            config.DB_STARTUP_MAX_BACKOFF,
+            config.MIGRATION_LOCK_TIMEOUT,
+        )
+        logger.info(
+            "Schema ready",
+            extra={"applied_migrations": applied, "duration_ms": round((time.perf_counter() - started) * 1000, 1)},
+        )
+    # Comprobaciones de BD y Auth Service en segundo plano; /readyz lee su caché
+    health_checker.start()
+    # Compactación/retención del feed de cambios (user_changes)
+    compaction = None
+    if config.CHANGES_COMPACT_INTERVAL > 0:
+        compaction = asyncio.ensure_future(compact_periodically(
+            get_engine,
+            config.CHANGES_COMPACT_INTERVAL,
+            config.CHANGES_COMPACT_AFTER,
+            config.CHANGES_TOMBSTONE_RETENTION,
+        ))
+    yield
+    if compaction is not None:
+        compaction.cancel()
+    await health_checker.stop()
+    await cleanup_auth_middleware()
+    password_hasher.shutdown(wait=False)
+    await dispose_async_engine()
+    dispose_engine()
+
 
 app = FastAPI(
     title="User Service API",
     description="API for user management and authentication",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS for frontend communication
@@ -28,11 +91,42 @@ app = FastAPI(
 #     allow_headers=["*"],
 # )
 
-# Create tables on startup
-Base.metadata.create_all(bind=engine)
+# Compresión brotli/gzip; la más interna, así métricas y access log incluyen su coste
+if config.RESPONSE_COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=config.RESPONSE_COMPRESSION_MIN_SIZE,
+        gzip_level=config.RESPONSE_GZIP_LEVEL,
+        brotli_quality=config.RESPONSE_BROTLI_QUALITY,
+    )
+
+# Access log JSON; se añade antes que MetricsMiddleware para quedar dentro
+# de él y poder leer el tiempo de BD de la request
+if config.ACCESS_LOG_ENABLED:
+    app.add_middleware(
+        AccessLogMiddleware,
+        sample_rate=config.ACCESS_LOG_SAMPLE_RATE,
+        route_sample_rates=parse_route_sample_rates(config.ACCESS_LOG_ROUTE_SAMPLE_RATES),
+    )
+
+# Latencia por ruta y consultas SQL por request (expuesto en /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# La más externa: IP real del cliente para el límite de login, las réplicas y
+# el access log. Solo se cree a X-Forwarded-For cuando lo envía un proxy de
+# confianza, y se toma la entrada más a la derecha no confiable (las de la
+# izquierda las controla el cliente)
+if config.FORWARDED_ALLOW_IPS:
+    app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=config.FORWARDED_ALLOW_IPS)
 
 # Registrar rutas
+if config.USE_ASYNC_DB:
+    # Las rutas async van primero y reemplazan a las CRUD síncronas;
+    # el resto de endpoints sigue sirviéndose desde user_router
+    from src.routes.users_async_routes import router as async_user_router
+    app.include_router(async_user_router, prefix="/users", tags=["Users"])
 app.include_router(user_router, prefix="/users", tags=["Users"])
+app.include_router(internal_router, prefix="/internal", tags=["Internal"])
 
 @app.get("/")
 async def root():
@@ -42,7 +136,24 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "user-service"}
 
+# Liveness: el proceso y su event loop responden; no toca dependencias
+@app.get("/livez")
+async def liveness():
+    return {"status": "alive", "service": "user-service"}
+
+# Readiness: resultado cacheado de las comprobaciones en segundo plano (503 si falla alguna requerida)
+@app.get("/readyz")
+async def readiness():
+    ready, checks = health_checker.status()
+    return JSONResponse(
+        {"status": "ready" if ready else "not_ready", "service": "user-service", "checks": checks},
+        status_code=200 if ready else 503,
+    )
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
-    Base.metadata.create_all(bind=engine)
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,71 @@
+# benchmarks/password_cost.py
+"""
+Pick the password hashing cost for a target verification latency.
+
+Measures the median verify time of each bcrypt cost (and argon2 time costs
+when argon2-cffi is installed) on this machine, then recommends the highest
+cost whose median stays within --target-ms. Also prints the sustained
+logins/s one hashing worker can serve at each cost, to size
+PASSWORD_HASH_WORKERS against expected login traffic.
+
+    python -m benchmarks.password_cost                  # target 250 ms
+    python -m benchmarks.password_cost --target-ms 100 --samples 5
+"""
+
+import argparse
+import statistics
+import time
+
+from src.password_hashing import HashPolicy, check_password, hash_password
+
+
+def _median_verify(policy: HashPolicy, samples: int) -> float:
+    hashed = hash_password("benchmark-password", policy)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        check_password("benchmark-password", hashed)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def _candidates(args):
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        yield f"PASSWORD_BCRYPT_ROUNDS={rounds}", HashPolicy(bcrypt_rounds=rounds)
+    try:
+        import argon2  # noqa: F401
+    except ImportError:
+        return
+    for time_cost in range(1, 7):
+        yield (
+            f"PASSWORD_HASH_SCHEME=argon2 PASSWORD_ARGON2_TIME_COST={time_cost}",
+            HashPolicy(scheme="argon2", argon2_time_cost=time_cost),
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-ms", type=float, default=250.0, help="maximum median verify latency")
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--min-rounds", type=int, default=8)
+    parser.add_argument("--max-rounds", type=int, default=14)
+    args = parser.parse_args(argv)
+
+    best = {}
+    print(f"{'setting':<58} {'verify ms':>10} {'logins/s/worker':>16}")
+    for label, policy in _candidates(args):
+        latency = _median_verify(policy, args.samples)
+        print(f"{label:<58} {latency:>10.1f} {1000 / latency:>16.1f}")
+        if latency <= args.target_ms:
+            # Candidates come in increasing cost: keep the last one that fits
+            best[policy.scheme] = label
+
+    print()
+    for scheme, label in best.items():
+        print(f"Recommended {scheme} within {args.target_ms:.0f} ms: {label}")
+    if not best:
+        print(f"No setting verifies within {args.target_ms:.0f} ms; lower --min-rounds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/serialization.py
+"""
+Cost of turning 1k users into a JSON response body, per pipeline.
+
+- orm+validate: ORM entities validated as list[UserOut] and dumped by
+  pydantic-core (what FastAPI does with response_model and ORM results)
+- dict+validate: Core row dicts through the same response_model path
+- stdlib json: the pre-pydantic-core FastAPI path (jsonable_encoder + json.dumps)
+- trusted: serializers.user_out projection + serializers.dumps (orjson if
+  installed), as used by the user routes
+
+Then the cost and size of compressing the trusted body with gzip (and brotli
+when installed) at the levels the CompressionMiddleware uses by default.
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --users 5000 --repeat 200
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from src import schemas, serializers
+from src.middleware import compression_middleware
+from src.models import User
+
+USERS_OUT = TypeAdapter(List[schemas.UserOut])
+
+
+def _rows(count: int):
+    return [
+        {
+            "id": i,
+            "email": f"user{i}@example.com",
+            "full_name": f"Usuario Número {i}",
+            "is_active": i % 7 != 0,
+            "version": 1,
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def _median_ms(func, repeat: int) -> float:
+    func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    rows = _rows(args.users)
+    entities = [User(**row) for row in rows]
+    pipelines = {
+        "orm+validate": lambda: USERS_OUT.dump_json(USERS_OUT.validate_python(entities, from_attributes=True)),
+        "dict+validate": lambda: USERS_OUT.dump_json(USERS_OUT.validate_python(rows, from_attributes=True)),
+        "stdlib json": lambda: json.dumps(
+            jsonable_encoder(USERS_OUT.validate_python(rows, from_attributes=True))
+        ).encode("utf-8"),
+        "trusted": lambda: serializers.dumps(serializers.user_out.many(rows)),
+    }
+
+    encoder = "orjson" if serializers.orjson is not None else "stdlib json"
+    print(f"Serializing {args.users} users, median of {args.repeat} runs (trusted encoder: {encoder})")
+    baseline = None
+    for name, func in pipelines.items():
+        elapsed = _median_ms(func, args.repeat)
+        baseline = baseline or elapsed
+        print(f"  {name:<14} {elapsed:8.3f} ms   {baseline / elapsed:6.1f}x   {len(func())} bytes")
+
+    body = pipelines["trusted"]()
+    compressors = {"gzip": lambda: compression_middleware._Compressor("gzip", 6, 4).finish(body)}
+    if compression_middleware.brotli is not None:
+        compressors["brotli"] = lambda: compression_middleware._Compressor("br", 6, 4).finish(body)
+    print(f"Compressing the {len(body)} byte trusted body")
+    for name, func in compressors.items():
+        print(f"  {name:<14} {_median_ms(func, args.repeat):8.3f} ms   {len(func())} bytes")
+
+
+if __name__ == "__main__":
+    main()
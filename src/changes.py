@@ -0,0 +1,190 @@
+# src/changes.py
+"""
+User change feed (transactional outbox).
+
+Every register, update, deactivation and delete adds a row to
+``user_changes`` in the same transaction as the change (crud.record_change),
+so the feed can never miss a committed change or announce a rolled-back one.
+Downstream services follow it with GET /users/changes?since=<seq> and keep a
+local copy current instead of re-fetching profiles:
+
+- entries carry the user's current state (joined when read) or null once the
+  user is hard-deleted, so applying them is an idempotent upsert/delete
+- ``since=0`` replays the compacted log, i.e. a snapshot of every user
+- long-poll (``wait``) and SSE wake up on commits of this process and poll
+  the DB every CHANGES_POLL_INTERVAL for commits of other workers
+
+Sequence numbers come from an auto-increment key, which is assigned at insert
+and not at commit: a transaction can commit seq N+1 before N. Rows after a
+gap are held back for CHANGES_GAP_GRACE seconds so a consumer never skips N;
+a gap older than that is a rolled-back or compacted seq.
+
+Retention: superseded entries older than CHANGES_COMPACT_AFTER are deleted
+(only the latest change per user is kept) and tombstones of hard-deleted
+users are dropped after CHANGES_TOMBSTONE_RETENTION. Consumers that fall
+further behind than that may miss a hard delete and should resync. Each
+worker compacts every CHANGES_COMPACT_INTERVAL seconds, or run
+
+    python -m src.changes --compact
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.engine import Engine
+
+from . import metrics
+from .models import UserChange
+
+logger = logging.getLogger(__name__)
+
+CREATED = "created"
+UPDATED = "updated"
+DEACTIVATED = "deactivated"
+DELETED = "deleted"
+
+CHANGES_COMPACTED = metrics.counter(
+    "user_changes_compacted_total",
+    "Change feed entries removed by compaction (superseded) or retention (tombstone)",
+    labelnames=("reason",),
+)
+
+
+class ChangeNotifier:
+    """
+    Wakes this process's long-poll and SSE readers after a change is committed
+
+    ``generation`` increases on every notify; readers take it before querying
+    and pass it to ``wait``, so a commit landing between the query and the
+    wait is not missed. notify() may be called from any thread.
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._waiters = set()
+
+    def notify(self):
+        with self._lock:
+            self.generation += 1
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:  # loop already closed
+                pass
+
+    async def wait(self, generation: int, timeout: float) -> bool:
+        """Wait up to ``timeout`` for a change newer than ``generation``"""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            if self.generation != generation:
+                return True
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+# Shared by the write paths (crud.invalidate_user) and the feed routes
+change_notifier = ChangeNotifier()
+
+
+def _utc_cutoff(seconds: float) -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=seconds)
+
+
+def compact_changes(
+    engine: Engine,
+    compact_after: float,
+    tombstone_retention: float,
+    batch_size: int = 1000,
+) -> Dict[str, int]:
+    """Delete superseded entries and expired tombstones, in short batches.
+
+    The seqs to delete are selected first and removed by primary key, which
+    MySQL needs (no DELETE with a subquery on the same table) and which keeps
+    each transaction small.
+    """
+    changes = UserChange.__table__
+    latest = (
+        select(changes.c.user_id, func.max(changes.c.seq).label("seq"))
+        .group_by(changes.c.user_id)
+        .subquery()
+    )
+    superseded = (
+        select(changes.c.seq)
+        .join(latest, latest.c.user_id == changes.c.user_id)
+        .where(changes.c.seq < latest.c.seq, changes.c.changed_at < _utc_cutoff(compact_after))
+        .limit(batch_size)
+    )
+    tombstones = (
+        select(changes.c.seq)
+        .where(changes.c.op == DELETED, changes.c.changed_at < _utc_cutoff(tombstone_retention))
+        .limit(batch_size)
+    )
+
+    removed = {"superseded": 0, "tombstone": 0}
+    for reason, query in (("superseded", superseded), ("tombstone", tombstones)):
+        while True:
+            with engine.begin() as conn:
+                seqs = list(conn.execute(query).scalars())
+                if seqs:
+                    conn.execute(delete(changes).where(changes.c.seq.in_(seqs)))
+            removed[reason] += len(seqs)
+            if len(seqs) < batch_size:
+                break
+        if removed[reason]:
+            CHANGES_COMPACTED.inc(removed[reason], reason=reason)
+    if any(removed.values()):
+        logger.info("Compacted user change feed", extra=removed)
+    return removed
+
+
+async def compact_periodically(engine_factory, interval: float, compact_after: float, tombstone_retention: float):
+    """Background compaction for the app lifespan; workers start at random offsets"""
+    await asyncio.sleep(random.uniform(0, interval))
+    while True:
+        try:
+            await asyncio.to_thread(compact_changes, engine_factory(), compact_after, tombstone_retention)
+        except Exception as e:
+            logger.warning(f"User change feed compaction failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the user change feed (user_changes)")
+    parser.add_argument("--compact", action="store_true", help="apply compaction and retention now")
+    parser.add_argument("--status", action="store_true", help="show entries and the current seq")
+    args = parser.parse_args(argv)
+
+    from .config import Config
+    from .database import get_engine
+
+    config = Config()
+    engine = get_engine()
+    if args.compact:
+        logging.basicConfig(level=logging.INFO)
+        removed = compact_changes(engine, config.CHANGES_COMPACT_AFTER, config.CHANGES_TOMBSTONE_RETENTION)
+        print(f"Removed {removed['superseded']} superseded entries and {removed['tombstone']} tombstones")
+    if args.status or not args.compact:
+        with engine.connect() as conn:
+            count, first, last = conn.execute(
+                select(func.count(), func.min(UserChange.seq), func.max(UserChange.seq))
+            ).one()
+        print(f"{count} entries, seq {first or 0}..{last or 0}")
+
+
+if __name__ == "__main__":
+    main()
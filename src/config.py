@@ -10,4 +10,160 @@ class Config:
         # El , 8000 es el valor por defecto si la variable no está
         self.SERVICE_PORT = int(os.getenv("SERVICE_PORT", 8000)) 
         self.LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-        self.SECRET_KEY = os.getenv("SECRET_KEY", "un_secreto")
\ No newline at end of file
+        self.SECRET_KEY = os.getenv("SECRET_KEY", "un_secreto")
+
+        # Servidor de producción (python -m src.server)
+        self.SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+        # Procesos worker; 0 = uno por CPU disponible (afinidad y cuota del cgroup).
+        # Los workers no comparten memoria: con más de uno, USER_CACHE_BACKEND=memory
+        # puede servir perfiles viejos hasta USER_CACHE_TTL y, con réplicas,
+        # DB_READ_YOUR_WRITES_BACKEND debe ser "redis" (se avisa al arrancar)
+        self.SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", os.getenv("WEB_CONCURRENCY", 0)))
+        # Conexiones pendientes de accept() en el socket de escucha
+        self.SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", 2048))
+        # Mayor que el keepalive del API Gateway, para que nunca cierre el servicio primero
+        self.SERVER_KEEPALIVE_TIMEOUT = int(os.getenv("SERVER_KEEPALIVE_TIMEOUT", 75))
+        # Reciclar cada worker tras N requests (+ jitter aleatorio); 0 = nunca
+        self.SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", 10000))
+        self.SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", 1000))
+        # Segundos para terminar las requests en curso tras SIGTERM
+        self.SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", 30))
+        # TLS: "auto" (si existen los certificados), "true" o "false"
+        self.SERVER_TLS = os.getenv("SERVER_TLS", "auto").lower()
+        self.SSL_CERTFILE = os.getenv("SSL_CERTFILE", "/etc/ssl/certs/server.crt")
+        self.SSL_KEYFILE = os.getenv("SSL_KEYFILE", "/etc/ssl/private/server.key")
+
+        # Política de hash de contraseñas: "bcrypt" o "argon2" (requiere argon2-cffi)
+        self.PASSWORD_HASH_SCHEME = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt").lower()
+        # Coste de bcrypt (ver benchmarks/password_cost.py para elegirlo)
+        self.PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", 12))
+        self.PASSWORD_ARGON2_TIME_COST = int(os.getenv("PASSWORD_ARGON2_TIME_COST", 3))
+        self.PASSWORD_ARGON2_MEMORY_COST = int(os.getenv("PASSWORD_ARGON2_MEMORY_COST", 65536))
+        self.PASSWORD_ARGON2_PARALLELISM = int(os.getenv("PASSWORD_ARGON2_PARALLELISM", 4))
+
+        # Pool dedicado para bcrypt ("thread" o "process")
+        self.PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+        self.PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+        # Trabajos en espera permitidos antes de responder 503
+        self.PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+        self.PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 1))
+
+        # Paginación por cursor de GET /users/
+        self.USERS_PAGE_DEFAULT_LIMIT = int(os.getenv("USERS_PAGE_DEFAULT_LIMIT", 100))
+        self.USERS_PAGE_MAX_LIMIT = int(os.getenv("USERS_PAGE_MAX_LIMIT", 1000))
+        # Filas por lote al transmitir GET /users/?stream=true (yield_per)
+        self.USERS_STREAM_BATCH_SIZE = int(os.getenv("USERS_STREAM_BATCH_SIZE", 500))
+
+        # Pila asíncrona (AsyncEngine); la URL se deriva de DATABASE_URL si no se define
+        self.USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "false").lower() in ("1", "true", "yes")
+        self.ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+        # Pool de conexiones (no aplica a SQLite)
+        self.DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+        self.DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+        self.DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+        # Reciclar antes del wait_timeout de MySQL para evitar conexiones caducadas
+        self.DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+        self.DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+        # Réplicas de lectura (URLs separadas por comas); vacío = todo al primario
+        self.DATABASE_READ_URLS = [
+            url.strip() for url in os.getenv("DATABASE_READ_URLS", "").split(",") if url.strip()
+        ]
+        # round_robin | least_loaded (menos conexiones en uso)
+        self.DB_READ_STRATEGY = os.getenv("DB_READ_STRATEGY", "round_robin").lower()
+        # Segundos fuera de rotación de una réplica caída antes de volver a probarla
+        self.DB_REPLICA_RETRY_INTERVAL = float(os.getenv("DB_REPLICA_RETRY_INTERVAL", 30))
+        # Tras una escritura, las lecturas del mismo usuario/cliente van al primario
+        self.DB_READ_YOUR_WRITES_WINDOW = float(os.getenv("DB_READ_YOUR_WRITES_WINDOW", 5))
+        # Dónde se guardan esas marcas: "memory" (por proceso) o "redis" (compartido
+        # entre workers; necesario con SERVER_WORKERS > 1)
+        self.DB_READ_YOUR_WRITES_BACKEND = os.getenv("DB_READ_YOUR_WRITES_BACKEND", "memory").lower()
+        self.DB_READ_YOUR_WRITES_REDIS_URL = os.getenv(
+            "DB_READ_YOUR_WRITES_REDIS_URL", os.getenv("USER_CACHE_REDIS_URL", "redis://localhost:6379/0")
+        )
+
+
+        # Importación masiva POST /users/bulk
+        self.BULK_IMPORT_CHUNK_SIZE = int(os.getenv("BULK_IMPORT_CHUNK_SIZE", 1000))
+        self.BULK_IMPORT_MAX_ROWS = int(os.getenv("BULK_IMPORT_MAX_ROWS", 100000))
+
+        # Máximo de ids por consulta en /users/batch
+        self.USERS_BATCH_MAX_IDS = int(os.getenv("USERS_BATCH_MAX_IDS", 500))
+
+        # Búsqueda por prefijo GET /users/search
+        self.USERS_SEARCH_DEFAULT_LIMIT = int(os.getenv("USERS_SEARCH_DEFAULT_LIMIT", 10))
+        self.USERS_SEARCH_MAX_LIMIT = int(os.getenv("USERS_SEARCH_MAX_LIMIT", 50))
+
+        # Feed de cambios GET /users/changes (outbox user_changes)
+        self.CHANGES_DEFAULT_LIMIT = int(os.getenv("CHANGES_DEFAULT_LIMIT", 100))
+        self.CHANGES_MAX_LIMIT = int(os.getenv("CHANGES_MAX_LIMIT", 1000))
+        # Espera máxima de long-poll (?wait=) y cada cuánto se consulta la BD mientras tanto
+        self.CHANGES_MAX_WAIT = float(os.getenv("CHANGES_MAX_WAIT", 30))
+        self.CHANGES_POLL_INTERVAL = float(os.getenv("CHANGES_POLL_INTERVAL", 1))
+        # Segundos que se retienen las filas tras un hueco de seq (transacción aún sin commit)
+        self.CHANGES_GAP_GRACE = float(os.getenv("CHANGES_GAP_GRACE", 5))
+        # SSE: comentario keep-alive cada N segundos y duración máxima de la conexión
+        self.CHANGES_SSE_HEARTBEAT = float(os.getenv("CHANGES_SSE_HEARTBEAT", 15))
+        self.CHANGES_SSE_MAX_DURATION = float(os.getenv("CHANGES_SSE_MAX_DURATION", 300))
+        # Compactación: solo el último cambio por usuario pasado este tiempo (segundos)
+        self.CHANGES_COMPACT_AFTER = float(os.getenv("CHANGES_COMPACT_AFTER", 86400))
+        # Retención de los borrados definitivos (tombstones)
+        self.CHANGES_TOMBSTONE_RETENTION = float(os.getenv("CHANGES_TOMBSTONE_RETENTION", 7 * 86400))
+        # Cada cuánto compacta cada worker; 0 = nunca (usar python -m src.changes --compact)
+        self.CHANGES_COMPACT_INTERVAL = float(os.getenv("CHANGES_COMPACT_INTERVAL", 3600))
+
+        # Caché de perfiles de usuario: "memory", "redis" o "none"
+        self.USER_CACHE_BACKEND = os.getenv("USER_CACHE_BACKEND", "memory").lower()
+        self.USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))
+        self.USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", 10000))
+        self.USER_CACHE_REDIS_URL = os.getenv("USER_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+        # Compresión de respuestas JSON/NDJSON (brotli si está instalado, si no gzip)
+        self.RESPONSE_COMPRESSION_ENABLED = os.getenv("RESPONSE_COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+        # Bytes mínimos del cuerpo para comprimir (respuestas no transmitidas)
+        self.RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", 1024))
+        self.RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", 6))
+        self.RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", 4))
+
+        # Comprobaciones de dependencias para /readyz, en segundo plano cada N segundos
+        self.HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", 10))
+        self.HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", 2))
+        # Resultado más antiguo aceptado antes de dejar de estar listo (por defecto 3 intervalos)
+        self.HEALTH_CHECK_MAX_AGE = float(os.getenv("HEALTH_CHECK_MAX_AGE", 3 * self.HEALTH_CHECK_INTERVAL))
+        # Dependencias que deben estar bien para responder 200 en /readyz. Auth
+        # Service solo se informa: si cae, sacar todas las réplicas del balanceo
+        # no ayuda (el circuit breaker ya lo gestiona)
+        self.HEALTH_READY_CHECKS = [
+            name.strip() for name in os.getenv("HEALTH_READY_CHECKS", "database").split(",") if name.strip()
+        ]
+
+        # Access log JSON (una línea por request)
+        self.ACCESS_LOG_ENABLED = os.getenv("ACCESS_LOG_ENABLED", "true").lower() in ("1", "true", "yes")
+        # Fracción de requests registradas por defecto (0.0 - 1.0)
+        self.ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", 1.0))
+        # Muestreo por ruta para endpoints de alto volumen: "/health=0.01,/metrics=0"
+        self.ACCESS_LOG_ROUTE_SAMPLE_RATES = os.getenv("ACCESS_LOG_ROUTE_SAMPLE_RATES", "/health=0.01,/livez=0.01,/readyz=0.01,/metrics=0")
+
+        # Arranque: migraciones en el lifespan con lock y reintentos
+        self.RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+        # Tiempo máximo esperando a que la BD esté disponible al arrancar
+        self.DB_STARTUP_TIMEOUT = float(os.getenv("DB_STARTUP_TIMEOUT", 60))
+        # Espera máxima entre reintentos (backoff exponencial con jitter)
+        self.DB_STARTUP_MAX_BACKOFF = float(os.getenv("DB_STARTUP_MAX_BACKOFF", 5))
+        # Segundos esperando el lock de migraciones que tiene otro worker
+        self.MIGRATION_LOCK_TIMEOUT = int(os.getenv("MIGRATION_LOCK_TIMEOUT", 120))
+
+        # Límite de intentos de login (ventana deslizante): "memory", "redis" o "none"
+        self.LOGIN_RATE_LIMIT_BACKEND = os.getenv("LOGIN_RATE_LIMIT_BACKEND", "memory").lower()
+        self.LOGIN_RATE_LIMIT_REDIS_URL = os.getenv("LOGIN_RATE_LIMIT_REDIS_URL", self.USER_CACHE_REDIS_URL)
+        # Intentos por IP cliente en LOGIN_IP_WINDOW segundos
+        self.LOGIN_IP_MAX_ATTEMPTS = int(os.getenv("LOGIN_IP_MAX_ATTEMPTS", 20))
+        self.LOGIN_IP_WINDOW = float(os.getenv("LOGIN_IP_WINDOW", 60))
+        # Intentos fallidos por email en LOGIN_EMAIL_WINDOW segundos
+        self.LOGIN_EMAIL_MAX_FAILURES = int(os.getenv("LOGIN_EMAIL_MAX_FAILURES", 5))
+        self.LOGIN_EMAIL_WINDOW = float(os.getenv("LOGIN_EMAIL_WINDOW", 900))
+        # Proxies de confianza (IPs o CIDRs separados por comas, p. ej. la red del
+        # API Gateway): de X-Forwarded-For se toma la dirección más a la derecha que
+        # no sea de confianza, la que añadió el gateway. Vacío = IP del socket
+        self.FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "")
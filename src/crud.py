@@ -1,14 +1,212 @@
 # src/crud.py
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Union
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
-from . import models, schemas, security
+from . import models, schemas
+from .changes import CREATED, change_notifier
+from .database import get_replica_router, user_key
+from .password_hashing import hash_password
+from .user_cache import user_cache
+
+# Columns served by UserOut; also the shape stored in the user cache
+USER_OUT_COLUMNS = (models.User.id, models.User.email, models.User.full_name, models.User.is_active)
+# Cached profiles also carry the row version for ETags
+USER_CACHE_COLUMNS = USER_OUT_COLUMNS + (models.User.version,)
+
+# Read helpers only issue Core selects, so they accept either a Session or the
+# read-only Connection from database.get_read_db
+Reader = Union[Session, Connection]
+
+def _load_user(db: Reader, user_id: int):
+    row = db.execute(select(*USER_CACHE_COLUMNS).where(models.User.id == user_id)).mappings().first()
+    return dict(row) if row is not None else None
+
+def get_user(db: Reader, user_id: int):
+    """UserOut fields for ``user_id`` as a dict (read through the user cache)"""
+    return user_cache.get_or_load(user_id, lambda: _load_user(db, user_id))
+
+def invalidate_user(user_id: int):
+    """Drop ``user_id`` from the user cache; call after committing any change.
+
+    Also keeps reads of the user on the primary for the read-your-writes
+    window, so a lagging replica cannot refill the cache with the old row.
+    """
+    user_cache.invalidate(user_id)
+    get_replica_router().note_write(user_key(user_id))
+    change_notifier.notify()
+
+def record_change(db, user_id: int, op: str):
+    """Add a change feed entry to the caller's transaction (Session or AsyncSession)"""
+    db.add(models.UserChange(user_id=user_id, op=op))
 
 def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+    """Case-insensitive lookup (served by the lower(email) index)"""
+    return db.query(models.User).filter(func.lower(models.User.email) == email.lower()).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = security.get_password_hash(user.password)
+def update_password_hash(db: Session, user_id: int, hashed_password: str):
+    """Store an upgraded hash (login rehash); profile fields and version are untouched"""
+    db.execute(
+        update(models.User).where(models.User.id == user_id).values(hashed_password=hashed_password)
+    )
+    db.commit()
+
+def _users_after(stmt, after: int, active: Optional[bool]):
+    # With ``active`` the (is_active, id) index serves both filter and order
+    stmt = stmt.where(models.User.id > after)
+    if active is not None:
+        stmt = stmt.where(models.User.is_active == active)
+    return stmt.order_by(models.User.id)
+
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: Optional[str] = None):
+    # hashed_password lets callers hash off the request thread (see password_hashing)
+    if hashed_password is None:
+        hashed_password = hash_password(user.password)
     db_user = models.User(email=user.email, hashed_password=hashed_password, full_name=user.full_name)
     db.add(db_user)
+    db.flush()
+    record_change(db, db_user.id, CREATED)
     db.commit()
     db.refresh(db_user)
-    return db_user
\ No newline at end of file
+    invalidate_user(db_user.id)
+    return db_user
+
+def get_users_page(db: Reader, after: int, limit: int, active: Optional[bool] = None):
+    """Keyset page over User.id, optionally only (in)active users.
+
+    Users are UserOut dicts built from plain rows (no ORM objects). Fetches
+    one extra row to know whether a next page exists and returns
+    (users, next_cursor) where next_cursor is None on the last page.
+    """
+    stmt = _users_after(select(*USER_OUT_COLUMNS), after, active).limit(limit + 1)
+    rows = [dict(row) for row in db.execute(stmt).mappings()]
+    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def get_users_page_versions(db: Reader, after: int, limit: int, active: Optional[bool] = None):
+    """(id, version) pairs of the page get_users_page would return, plus the
+    look-ahead row; enough to compute the page ETag without loading users"""
+    rows = db.execute(
+        _users_after(select(models.User.id, models.User.version), after, active).limit(limit + 1)
+    )
+    return [tuple(row) for row in rows]
+
+def iter_user_rows(
+    db: Reader, after: int, batch_size: int, limit: Optional[int] = None, active: Optional[bool] = None
+):
+    """Yield users as plain row mappings, fetching batch_size rows at a time"""
+    stmt = _users_after(select(*USER_OUT_COLUMNS), after, active).execution_options(yield_per=batch_size)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    yield from db.execute(stmt).mappings()
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    # Smallest string greater than every string starting with ``prefix``
+    # (code point order, as under the binary collation of SearchKey)
+    prefix = prefix.rstrip(chr(0x10FFFF))
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else None
+
+def prefix_query(key, prefix: str, limit: int):
+    """Active users whose search ``key`` column (User.email_search or
+    User.full_name_search) starts with ``prefix``, in index order"""
+    conditions = [key >= prefix, models.User.is_active.is_(True)]
+    upper = _prefix_upper_bound(prefix)
+    if upper is not None:
+        conditions.append(key < upper)
+    return select(*USER_OUT_COLUMNS).where(*conditions).order_by(key).limit(limit)
+
+def search_users(db: Reader, query: str, limit: int):
+    """Active users whose email or full_name starts with ``query`` (case-insensitive).
+
+    Exact matches rank first, then email matches before name matches, then
+    shorter values (closer to the typed prefix); ties are broken by id.
+    Each index range is read in index order, so a bounded window of
+    candidates is fetched and ranked rather than only ``limit`` rows.
+    """
+    prefix = models.search_key(query.strip())
+    if not prefix:
+        return []
+    candidates = max(limit * 3, 20)
+    ranked = {}
+    for field, weight in (("email", 0), ("full_name", 1)):
+        key = getattr(models.User, f"{field}_search")
+        for row in db.execute(prefix_query(key, prefix, candidates)).mappings():
+            value = models.search_key(row[field])
+            rank = (0 if value == prefix else 1, weight, len(value), row["id"])
+            if row["id"] not in ranked or rank < ranked[row["id"]][0]:
+                ranked[row["id"]] = (rank, dict(row))
+    return [user for _, user in sorted(ranked.values(), key=lambda item: item[0])[:limit]]
+
+def get_existing_emails(db: Session, emails):
+    """Return the lowercased subset of ``emails`` already registered, compared
+    case-insensitively like get_user_by_email (one IN query on lower(email))"""
+    if not emails:
+        return set()
+    key = func.lower(models.User.email)
+    rows = db.execute(select(key.label("email")).where(key.in_({email.lower() for email in emails})))
+    return {row.email for row in rows}
+
+def bulk_insert_users(db: Session, rows):
+    """Insert prepared user rows and their change feed entries with one
+    executemany each, and commit.
+
+    ``rows`` are dicts with email, hashed_password and full_name. Returns a
+    {email: id} map for the inserted users.
+    """
+    if not rows:
+        return {}
+    db.execute(insert(models.User), [dict(row, is_active=True) for row in rows])
+    emails = [row["email"] for row in rows]
+    result = db.execute(
+        select(models.User.id, models.User.email).where(models.User.email.in_(emails)).order_by(models.User.id)
+    )
+    ids = {row.email: row.id for row in result}
+    db.execute(insert(models.UserChange), [{"user_id": user_id, "op": CREATED} for user_id in ids.values()])
+    db.commit()
+    for user_id in ids.values():
+        invalidate_user(user_id)
+    return ids
+
+def get_users_by_ids(db: Reader, ids):
+    """Fetch UserOut dicts for ``ids`` with a single IN query, keyed by id"""
+    if not ids:
+        return {}
+    rows = db.execute(select(*USER_OUT_COLUMNS).where(models.User.id.in_(list(ids)))).mappings()
+    return {row["id"]: dict(row) for row in rows}
+
+def get_user_changes(db: Reader, since: int, limit: int, gap_grace: float = 0):
+    """Change feed entries after ``since`` with the current state of each user.
+
+    Returns (changes, has_more). ``user`` is None once the user no longer
+    exists. A seq can commit after a higher one; entries following a gap are
+    held back until they are ``gap_grace`` seconds old (see src/changes.py).
+    """
+    changes = models.UserChange
+    stmt = (
+        select(changes.seq, changes.op, changes.user_id, changes.changed_at, *USER_CACHE_COLUMNS)
+        .select_from(changes)
+        .outerjoin(models.User, models.User.id == changes.user_id)
+        .where(changes.seq > since)
+        .order_by(changes.seq)
+        .limit(limit + 1)
+    )
+    rows = db.execute(stmt).mappings().all()
+    settled_before = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=gap_grace)
+    entries = []
+    expected = since + 1
+    for row in rows[:limit]:
+        if row["seq"] != expected and row["changed_at"] > settled_before:
+            return entries, True
+        user = None
+        if row["id"] is not None:
+            user = {name: row[name] for name in ("id", "email", "full_name", "is_active", "version")}
+        entries.append({
+            "seq": row["seq"],
+            "op": row["op"],
+            "user_id": row["user_id"],
+            "changed_at": row["changed_at"].isoformat() + "Z",
+            "user": user,
+        })
+        expected = row["seq"] + 1
+    return entries, len(rows) > limit
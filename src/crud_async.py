@@ -0,0 +1,71 @@
+# src/crud_async.py
+"""
+Async counterparts of src/crud.py for the AsyncSession stack (USE_ASYNC_DB).
+"""
+from typing import Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, schemas
+from .changes import CREATED
+from .crud import USER_CACHE_COLUMNS, USER_OUT_COLUMNS, _users_after, invalidate_user, record_change
+from .user_cache import user_cache
+
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.get(models.User, user_id)
+
+async def get_user_out(db: AsyncSession, user_id: int):
+    """UserOut fields as a dict, read through the user cache"""
+
+    async def load():
+        result = await db.execute(select(*USER_CACHE_COLUMNS).where(models.User.id == user_id))
+        row = result.mappings().first()
+        return dict(row) if row is not None else None
+
+    return await user_cache.get_or_load_async(user_id, load)
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    """Case-insensitive lookup, see crud.get_user_by_email"""
+    result = await db.execute(select(models.User).where(func.lower(models.User.email) == email.lower()))
+    return result.scalars().first()
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate, hashed_password: str):
+    db_user = models.User(email=user.email, hashed_password=hashed_password, full_name=user.full_name)
+    db.add(db_user)
+    await db.flush()
+    record_change(db, db_user.id, CREATED)
+    await db.commit()
+    await db.refresh(db_user)
+    invalidate_user(db_user.id)
+    return db_user
+
+async def update_password_hash(db: AsyncSession, user_id: int, hashed_password: str):
+    """See crud.update_password_hash"""
+    await db.execute(
+        update(models.User).where(models.User.id == user_id).values(hashed_password=hashed_password)
+    )
+    await db.commit()
+
+async def get_users_page(db: AsyncSession, after: int, limit: int, active: Optional[bool] = None):
+    """Keyset page over User.id, see crud.get_users_page"""
+    result = await db.execute(_users_after(select(*USER_OUT_COLUMNS), after, active).limit(limit + 1))
+    rows = [dict(row) for row in result.mappings()]
+    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+async def get_users_page_versions(db: AsyncSession, after: int, limit: int, active: Optional[bool] = None):
+    """See crud.get_users_page_versions"""
+    result = await db.execute(
+        _users_after(select(models.User.id, models.User.version), after, active).limit(limit + 1)
+    )
+    return [tuple(row) for row in result]
+
+async def iter_user_rows(
+    db: AsyncSession, after: int, batch_size: int, limit: Optional[int] = None, active: Optional[bool] = None
+):
+    """Stream users as row mappings through a server-side cursor"""
+    stmt = _users_after(select(*USER_OUT_COLUMNS), after, active).execution_options(yield_per=batch_size)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    result = await db.stream(stmt)
+    async for row in result.mappings():
+        yield row
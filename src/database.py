@@ -1,66 +1,210 @@
 # src/database.py
+from contextlib import contextmanager
+from typing import Iterable, Optional
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+import hashlib
 import os
-from sqlalchemy import inspect, text
-import logging
+import threading
+from .config import Config
+from .db_pool import instrument_pool, pool_options
 
 # Database URL from environment variable (MySQL in Docker, SQLite fallback for local dev)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Sync driver -> asyncio driver used by the async stack
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql+mysqlconnector": "mysql+aiomysql",
+}
+
+# The engine is created on first use (get_engine, or the ``engine`` module
+# attribute), so importing this module never loads a DB driver or connects.
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
+                instrument_pool(engine)
+                SessionLocal.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+
+def dispose_engine():
+    """Close the sync pool and the replica pools (call on app shutdown)"""
+    if _engine is not None:
+        _engine.dispose()
+    if _replica_router is not None:
+        _replica_router.dispose()
+
+
+def __getattr__(name):
+    # Keeps ``from src.database import engine`` working, creating it lazily
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _LazySessionmaker(sessionmaker):
+    """sessionmaker that creates the engine the first time a session is made"""
+
+    def __call__(self, **local_kw):
+        if _engine is None:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
+# Read replicas (DATABASE_READ_URLS); None until first use, then a
+# ReplicaRouter, which sends everything to the primary when no URL is set
+_replica_router = None
+
+
+def get_replica_router():
+    global _replica_router
+    if _replica_router is None:
+        with _engine_lock:
+            if _replica_router is None:
+                from .replicas import ReplicaRouter, RedisPinStore
+
+                config = Config()
+                if config.DB_READ_YOUR_WRITES_BACKEND == "redis":
+                    pin_store = RedisPinStore.from_url(config.DB_READ_YOUR_WRITES_REDIS_URL)
+                elif config.DB_READ_YOUR_WRITES_BACKEND == "memory":
+                    pin_store = None
+                else:
+                    raise ValueError(f"Unknown DB_READ_YOUR_WRITES_BACKEND: {config.DB_READ_YOUR_WRITES_BACKEND}")
+                _replica_router = ReplicaRouter(
+                    get_engine,
+                    config.DATABASE_READ_URLS,
+                    strategy=config.DB_READ_STRATEGY,
+                    retry_interval=config.DB_REPLICA_RETRY_INTERVAL,
+                    read_your_writes_window=config.DB_READ_YOUR_WRITES_WINDOW,
+                    pin_store=pin_store,
+                )
+    return _replica_router
+
+
+def user_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def client_key(request: Request) -> Optional[str]:
+    """Identifies the caller for read-your-writes by its token; anonymous
+    callers get no key, as their address may be the gateway or a shared NAT
+    and would pin everyone's reads to the primary (written users are pinned
+    by user_key either way)"""
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return "client:" + hashlib.sha256(authorization.encode("utf-8")).hexdigest()[:32]
+    return None
+
+
+def _read_keys(request: Request):
+    keys = [client_key(request)]
+    if "user_id" in request.path_params:
+        keys.append(user_key(request.path_params["user_id"]))
+    return [key for key in keys if key]
+
+
 # Función para obtener una sesión de BD en cada request
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+        # Tras una escritura, este cliente lee del primario durante un tiempo
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            key = client_key(request)
+            if key:
+                get_replica_router().note_write(key)
 
 
-def ensure_canvas_id_column():
-    """Ensure dashboards.canvas_id column exists in the connected database.
+@contextmanager
+def read_only_connection(keys: Iterable[str] = ()):
+    """Core connection for reads: no Session, identity map or autoflush.
 
-    If the column is missing this will add it (as NULLable), populate it for
-    existing rows using the dashboard id, and then make it NOT NULL and UNIQUE.
-    This is a small, safe migration to align runtime schema with the models.
+    Served by a read replica when DATABASE_READ_URLS is set (see replicas.py);
+    ``keys`` that were written recently stay on the primary. On MySQL the
+    transaction is declared READ ONLY, which skips transaction id allocation
+    and rejects writes. The connection is never committed; returning it to
+    the pool rolls the transaction back.
     """
-    try:
-        inspector = inspect(engine)
-        if 'dashboards' not in inspector.get_table_names():
-            # no dashboards table yet, nothing to do
-            return
-
-        cols = {c['name'] for c in inspector.get_columns('dashboards')}
-        if 'canvas_id' in cols:
-            return
-
-        logging.info("Applying lightweight migration: adding dashboards.canvas_id column")
-        # Add column as nullable first
-        with engine.begin() as conn:
-            conn.execute(text("ALTER TABLE dashboards ADD COLUMN canvas_id VARCHAR(36) NULL"))
-            # populate existing rows with the id (string) to avoid NULLs
-            conn.execute(text("UPDATE dashboards SET canvas_id = CAST(id AS CHAR) WHERE canvas_id IS NULL"))
-            # make column NOT NULL
-            conn.execute(text("ALTER TABLE dashboards MODIFY canvas_id VARCHAR(36) NOT NULL"))
-            # create unique index
-            try:
-                conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS idx_dashboards_canvas_id ON dashboards(canvas_id)"))
-            except Exception:
-                # Some MySQL versions don't support IF NOT EXISTS for CREATE INDEX; ignore if it fails
-                try:
-                    conn.execute(text("CREATE UNIQUE INDEX idx_dashboards_canvas_id ON dashboards(canvas_id)"))
-                except Exception:
-                    logging.warning("Could not create unique index on dashboards.canvas_id; it may exist already or the DB doesn't support the statement")
-
-    except Exception as e:
-        # Log but don't crash the whole service on migration failure
-        logging.exception(f"Failed to ensure dashboards.canvas_id column: {e}")
-
-
-# Run the small schema alignment on import so it executes during container startup
-ensure_canvas_id_column()
\ No newline at end of file
+    with get_replica_router().connect(keys) as conn:
+        if conn.dialect.name == "mysql":
+            conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+        yield conn
+
+
+# Dependencia para rutas de solo lectura (GET): conexión Core en vez de Session
+def get_read_db(request: Request):
+    with read_only_connection(_read_keys(request)) as conn:
+        yield conn
+
+
+def to_async_url(url: str) -> str:
+    """Swap the sync driver of ``url`` for its asyncio counterpart"""
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+# Async engine and session factory are created on first use, so the sync
+# stack never needs aiosqlite/aiomysql installed.
+_async_engine = None
+_async_session_factory = None
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        config = Config()
+        async_url = config.ASYNC_DATABASE_URL or to_async_url(DATABASE_URL)
+        options = pool_options(async_url, config)
+        # The async engine needs its own asyncio-aware pool class
+        options.pop("poolclass", None)
+        options.pop("connect_args", None)
+        _async_engine = create_async_engine(async_url, **options)
+    return _async_engine
+
+
+def get_async_sessionmaker():
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_session_factory = async_sessionmaker(
+            bind=get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _async_session_factory
+
+
+# Equivalente asíncrono de get_db
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    """Close the async pool (call on app shutdown)"""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_session_factory = None
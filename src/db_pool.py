@@ -0,0 +1,104 @@
+# src/db_pool.py
+"""
+Connection pool configuration and statistics.
+
+Pool sizing comes from Config (DB_POOL_*). Checkouts, checkins, new
+connections and invalidations are counted through SQLAlchemy pool events;
+the time a request waits for a free connection is measured by
+InstrumentedQueuePool, since the pool has no "before checkout" event.
+"""
+import time
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from . import metrics
+from .config import Config
+
+POOL_WAIT = metrics.histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled DB connection",
+)
+POOL_EVENTS = metrics.counter(
+    "db_pool_events_total",
+    "Pool events (checkout, checkin, connect, invalidate)",
+    labelnames=("event",),
+)
+POOL_CHECKED_OUT = metrics.gauge("db_pool_checked_out", "Connections currently checked out")
+POOL_OVERFLOW = metrics.gauge("db_pool_overflow", "Connections open beyond pool_size")
+POOL_SIZE = metrics.gauge("db_pool_size", "Configured pool size")
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - started)
+
+
+def pool_options(url: str, config: Config = None) -> Dict[str, Any]:
+    """create_engine keyword arguments for ``url``"""
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    config = config or Config()
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+
+def instrument_pool(engine: Engine):
+    """Attach pool event counters and expose live pool gauges for ``engine``"""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        POOL_EVENTS.inc(event="connect")
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_EVENTS.inc(event="checkout")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        POOL_EVENTS.inc(event="checkin")
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        POOL_EVENTS.inc(event="invalidate")
+
+    # Read from the pool itself so the values never drift from reality
+    def _pool_value(name):
+        return lambda: {(): float(getattr(engine.pool, name)())} if hasattr(engine.pool, name) else {}
+
+    POOL_CHECKED_OUT.set_function(_pool_value("checkedout"))
+    POOL_OVERFLOW.set_function(_pool_value("overflow"))
+    POOL_SIZE.set_function(_pool_value("size"))
+
+
+def pool_status(engine: Engine) -> Dict[str, Any]:
+    """Snapshot of pool occupancy, event counts and checkout wait histogram"""
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__, "status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    status["events"] = {key[0]: int(value) for key, value in POOL_EVENTS.samples().items()}
+
+    cumulative, count, total = POOL_WAIT.samples().get((), ([0] * (len(POOL_WAIT.buckets) + 1), 0, 0.0))
+    bounds = [str(b) for b in POOL_WAIT.buckets] + ["+Inf"]
+    status["wait_seconds"] = {
+        "count": count,
+        "sum": total,
+        "buckets": dict(zip(bounds, cumulative)),
+    }
+    return status
@@ -0,0 +1,36 @@
+# src/etags.py
+"""
+Weak ETag helpers for conditional GETs on user resources.
+"""
+import hashlib
+from typing import Iterable, Tuple
+
+from fastapi import Request
+
+
+def user_etag(user_id: int, version: int) -> str:
+    return f'W/"u{user_id}-v{version}"'
+
+
+def collection_etag(rows: Iterable[Tuple[int, int]], *scope) -> str:
+    """ETag for a list from its (id, version) pairs and the query that produced it"""
+    digest = hashlib.sha1(repr(scope).encode("utf-8"))
+    for user_id, version in rows:
+        digest.update(f"{user_id}:{version};".encode("ascii"))
+    return f'W/"c-{digest.hexdigest()[:20]}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """True when If-None-Match matches ``etag`` (weak comparison, RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    target = _opaque(etag)
+    return any(_opaque(candidate) == target for candidate in header.split(","))
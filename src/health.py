@@ -0,0 +1,168 @@
+# src/health.py
+"""
+Cached dependency checks behind the /livez and /readyz probes.
+
+A background task runs every check (DB pool connectivity, Auth Service
+reachability) once per HEALTH_CHECK_INTERVAL and keeps the last result.
+Probes only read those results, so no matter how many orchestrators and load
+balancers poll each replica, MySQL and Auth Service see one check per worker
+per interval and a probe never opens a connection itself.
+
+/readyz fails while a required check is failing, has not completed yet, or
+is older than HEALTH_CHECK_MAX_AGE (the checker itself is stuck).
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import text
+
+from . import metrics
+from .config import Config
+from .database import get_engine
+from .middleware.jwt_middleware import check_auth_service
+
+logger = logging.getLogger(__name__)
+
+DEPENDENCY_UP = metrics.gauge(
+    "dependency_up",
+    "1 when the last background check of the dependency succeeded",
+    labelnames=("dependency",),
+)
+DEPENDENCY_CHECK_DURATION = metrics.histogram(
+    "dependency_check_duration_seconds",
+    "Duration of the background dependency checks",
+    labelnames=("dependency",),
+)
+
+Check = Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class HealthChecker:
+    """
+    Runs ``checks`` periodically and serves their cached results
+
+    Each check is a coroutine that raises when the dependency is unhealthy
+    and may return a dict of details for the report.
+    """
+
+    def __init__(
+        self,
+        checks: Dict[str, Check],
+        interval: float = 10,
+        timeout: float = 2,
+        max_age: Optional[float] = None,
+        required: Optional[Iterable[str]] = None,
+        clock=time.monotonic,
+    ):
+        self.checks = checks
+        self.interval = interval
+        self.timeout = timeout
+        self.max_age = max_age if max_age is not None else 3 * interval
+        self.required = tuple(checks if required is None else (name for name in required if name in checks))
+        self._clock = clock
+        # name -> (ok, checked at [clock], duration, error, details)
+        self._results: Dict[str, Tuple[bool, float, float, Optional[str], Optional[Dict[str, Any]]]] = {}
+        self._task: Optional["asyncio.Task"] = None
+
+    async def run_checks(self):
+        await asyncio.gather(*(self._run(name, check) for name, check in self.checks.items()))
+
+    async def _run(self, name: str, check: Check):
+        started = self._clock()
+        ok, error, details = True, None, None
+        try:
+            details = await asyncio.wait_for(check(), self.timeout)
+        except asyncio.TimeoutError:
+            ok, error = False, f"timeout after {self.timeout}s"
+        except Exception as e:
+            ok, error = False, f"{type(e).__name__}: {e}"
+        finished = self._clock()
+
+        previous = self._results.get(name)
+        was_ok = previous[0] if previous is not None else True
+        if ok != was_ok:
+            if ok:
+                logger.info(f"Dependency {name} recovered")
+            else:
+                logger.warning(f"Dependency {name} check failed: {error}")
+        self._results[name] = (ok, finished, finished - started, error, details)
+        DEPENDENCY_UP.set(1 if ok else 0, dependency=name)
+        DEPENDENCY_CHECK_DURATION.observe(finished - started, dependency=name)
+
+    def start(self):
+        """Start the periodic checks on the running loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._check_periodically())
+
+    async def _check_periodically(self):
+        while True:
+            await self.run_checks()
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+
+    def status(self) -> Tuple[bool, Dict[str, Any]]:
+        """(ready, report) from the cached results; never runs a check"""
+        now = self._clock()
+        ready = True
+        report = {}
+        for name in self.checks:
+            result = self._results.get(name)
+            if result is None:
+                entry = {"status": "unknown", "age_seconds": None}
+            else:
+                ok, checked_at, duration, error, details = result
+                age = now - checked_at
+                entry = {
+                    "status": "ok" if ok else "fail",
+                    "age_seconds": round(age, 3),
+                    "duration_ms": round(duration * 1000, 1),
+                }
+                if age > self.max_age:
+                    entry["status"] = "stale"
+                if error is not None:
+                    entry["error"] = error
+                if details:
+                    entry.update(details)
+            entry["required"] = name in self.required
+            if entry["required"] and entry["status"] != "ok":
+                ready = False
+            report[name] = entry
+        return ready, report
+
+
+async def check_database() -> Dict[str, Any]:
+    """SELECT 1 through the primary pool (in a thread, the driver blocks)"""
+
+    def ping():
+        engine = get_engine()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return {"pool": engine.pool.status()}
+
+    return await asyncio.to_thread(ping)
+
+
+def _build_default_checker() -> HealthChecker:
+    config = Config()
+    return HealthChecker(
+        {"database": check_database, "auth_service": check_auth_service},
+        interval=config.HEALTH_CHECK_INTERVAL,
+        timeout=config.HEALTH_CHECK_TIMEOUT,
+        max_age=config.HEALTH_CHECK_MAX_AGE,
+        required=config.HEALTH_READY_CHECKS,
+    )
+
+
+# Singleton checker started by the app lifespan
+health_checker = _build_default_checker()
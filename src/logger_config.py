@@ -1,33 +1,74 @@
+import atexit
 import logging
+import queue
 import sys
-from pythonjsonlogger import jsonlogger
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+try:
+    from pythonjsonlogger.json import JsonFormatter
+except ImportError:  # python-json-logger < 3.1
+    from pythonjsonlogger.jsonlogger import JsonFormatter
 from .config import Config
 
-def setup_logging():
+# Listener that drains the log queue on its own thread (one per process)
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+def setup_logging(config: Optional[Config] = None):
     """
     Sets up JSON logging format for the service.
+
+    Records are put on an in-memory queue by a QueueHandler and written to
+    stdout by a QueueListener thread, so request handlers never block on I/O.
+    Calling it again is a no-op.
     """
+    global _listener, _queue_handler
+    config = config or Config()
+
     # Create the root logger
     logger = logging.getLogger()
-    
+
     # Set the logging level from configuration
-    logger.setLevel(Config.LOG_LEVEL)
+    logger.setLevel(config.LOG_LEVEL)
 
-    # Create a handler to display logs to standard output
+    if _listener is not None:
+        return logger
+
+    # Create a handler to display logs to standard output (runs on the listener thread)
     handler = logging.StreamHandler(sys.stdout)
-    
+
     # Define the JSON format with required fields
-    formatter = jsonlogger.JsonFormatter(
+    formatter = JsonFormatter(
         "%(asctime)s %(levelname)s %(name)s %(message)s"
     )
     handler.setFormatter(formatter)
 
-    # Add the handler to the logger
-    logger.addHandler(handler)
+    # Unbounded queue: enqueueing never blocks the caller
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    # Add the queue handler to the logger
+    _queue_handler = QueueHandler(log_queue)
+    logger.addHandler(_queue_handler)
 
     # Return the configured logger instance
     return logger
 
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener, _queue_handler
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)
+    _queue_handler = None
+    listener.stop()
+
 # Example usage:
 # logger = setup_logging()
-# logger.info("Service started successfully", extra={'service_name': 'user-service'})
\ No newline at end of file
+# logger.info("Service started successfully", extra={'service_name': 'user-service'})
@@ -0,0 +1,107 @@
+# src/middleware/access_log_middleware.py
+"""
+JSON access log: one record per HTTP request on the "access" logger.
+
+Each record carries request_id, method, route template, path, status,
+duration_ms, db_queries and db_time_ms. The request id is taken from the
+X-Request-ID header (set by the gateway) or generated, and echoed back on the
+response. DB figures come from MetricsMiddleware, so this middleware must be
+added before it (Starlette runs the last added middleware outermost):
+
+    app.add_middleware(AccessLogMiddleware, sample_rate=1.0, route_sample_rates={"/health": 0.01})
+    app.add_middleware(MetricsMiddleware)
+
+High-volume routes can be sampled down per route template; 5xx responses are
+always logged. Records go through the queue set up by setup_logging, so
+writing them never blocks the event loop on stdout.
+"""
+
+import logging
+import random
+import time
+import uuid
+from typing import Dict, Optional
+
+from src.middleware.metrics_middleware import current_request_stats, route_template
+
+access_logger = logging.getLogger("access")
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+def parse_route_sample_rates(value: str) -> Dict[str, float]:
+    """Parse "/health=0.01,/metrics=0" into {route: rate}"""
+    rates = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        route, _, rate = item.partition("=")
+        if not rate:
+            raise ValueError(f"Invalid access log sample rate: {item!r}")
+        rates[route.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+def _request_id(scope) -> str:
+    for name, value in scope.get("headers", ()):
+        if name == REQUEST_ID_HEADER and value:
+            # Bounded so a client cannot inflate every log line
+            return value.decode("latin-1")[:128]
+    return uuid.uuid4().hex
+
+
+class AccessLogMiddleware:
+    def __init__(
+        self,
+        app,
+        sample_rate: float = 1.0,
+        route_sample_rates: Optional[Dict[str, float]] = None,
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.route_sample_rates = route_sample_rates or {}
+
+    def _sampled(self, route: str, status_code: int) -> bool:
+        if status_code >= 500:
+            return True
+        rate = self.route_sample_rates.get(route, self.sample_rate)
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _request_id(scope)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", ()))
+                headers.append((REQUEST_ID_HEADER, request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            duration = time.perf_counter() - started
+            route = route_template(scope)
+            if access_logger.isEnabledFor(logging.INFO) and self._sampled(route, status_code):
+                stats = current_request_stats.get()
+                access_logger.info(
+                    "request",
+                    extra={
+                        "request_id": request_id,
+                        "method": scope["method"],
+                        "route": route,
+                        "path": scope["path"],
+                        "status": status_code,
+                        "duration_ms": round(duration * 1000, 3),
+                        "db_queries": stats.db_queries if stats else 0,
+                        "db_time_ms": round(stats.db_time * 1000, 3) if stats else 0.0,
+                    },
+                )
@@ -0,0 +1,148 @@
+# src/middleware/compression_middleware.py
+"""
+Response compression (brotli or gzip) for JSON and text bodies.
+
+A response is compressed when the client accepts an encoding, its media type
+is compressible (JSON, NDJSON, text) and it has no Content-Encoding yet:
+
+- buffered bodies only from ``minimum_size`` bytes up; smaller ones are sent
+  as is, since compression would cost more CPU than it saves on the wire
+- streamed bodies (GET /users/?stream=true) chunk by chunk, flushing each
+  chunk so NDJSON rows still reach the client as they are produced
+
+Brotli is preferred when the client accepts it and the optional ``brotli``
+package is installed; otherwise gzip. ETags on the user routes are weak, so
+they stay valid for the compressed representation.
+"""
+
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (b"application/json", b"application/x-ndjson", b"text/")
+# Responses that must not carry a body
+NO_BODY_STATUSES = (204, 304)
+
+
+def _quality(params: str) -> float:
+    for param in params.split(";"):
+        name, _, value = param.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def _accepted_encodings(scope) -> set:
+    """Codings from Accept-Encoding, without the ones refused with q=0"""
+    for name, value in scope.get("headers", ()):
+        if name == b"accept-encoding":
+            accepted = set()
+            for item in value.decode("latin-1").lower().split(","):
+                coding, _, params = item.partition(";")
+                if coding.strip() and _quality(params) > 0:
+                    accepted.add(coding.strip())
+            return accepted
+    return set()
+
+
+def choose_encoding(scope) -> Optional[str]:
+    accepted = _accepted_encodings(scope)
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            # wbits 16 + MAX_WBITS: gzip container
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress ``data`` and flush it, so the client can decode it right away"""
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", ()))
+                content_type = headers.get(b"content-type", b"")
+                if (
+                    message["status"] in NO_BODY_STATUSES
+                    or b"content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                ):
+                    await send(message)
+                else:
+                    # Held until the first body chunk shows whether it is worth it
+                    start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                compressed = compressor.chunk(body) if more_body else compressor.finish(body)
+                headers = [
+                    (name, value)
+                    for name, value in start_message.get("headers", ())
+                    if name not in (b"content-length", b"content-encoding")
+                ]
+                headers.append((b"content-encoding", encoding.encode("ascii")))
+                headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    headers.append((b"content-length", str(len(compressed)).encode("ascii")))
+                await send(dict(start_message, headers=headers))
+            else:
+                compressed = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
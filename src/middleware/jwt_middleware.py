@@ -5,6 +5,13 @@ JWT Authentication Middleware for FastAPI Services
 This middleware validates JWT tokens from the centralized Auth Service.
 Can be used by User_Service, Canvas_Service, Chat_Service, Comments_Service.
 
+Set AUTH_LOCAL_VERIFY=true to verify tokens offline with the Auth Service
+signing keys (JWKS); /auth/token/validate is then only used as a fallback.
+
+Calls to Auth Service share a pooled keep-alive client (HTTP/2 when h2 is
+installed), are retried with jitter on transient errors and go through a
+circuit breaker that fails fast while Auth Service is unhealthy.
+
 Usage:
     from src.middleware.jwt_middleware import require_auth
     
@@ -15,10 +22,27 @@ Usage:
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+from collections import OrderedDict
+from datetime import datetime, timezone
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
 import httpx
 import os
-from functools import lru_cache
+from jose import jwk, jwt
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
+from src import metrics
+
+try:
+    import h2  # noqa: F401  (httpx[http2])
+except ImportError:
+    h2 = None
+
+logger = logging.getLogger(__name__)
 
 # Security scheme for Swagger UI
 security = HTTPBearer()
@@ -26,30 +50,447 @@ security = HTTPBearer()
 # Auth Service configuration
 AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "https://auth_service:8443")
 CA_CERT_PATH = os.getenv("CA_CERT_PATH", "/etc/ssl/certs/ca.crt")
+# Endpoint probed by the readiness checks (any non-5xx answer = reachable)
+AUTH_HEALTH_URL = os.getenv("AUTH_HEALTH_URL", f"{AUTH_SERVICE_URL}/health")
+
+# Connection pool to Auth Service (HTTP/2 only when the h2 package is installed)
+AUTH_HTTP2 = os.getenv("AUTH_HTTP2", "true").lower() in ("1", "true", "yes")
+AUTH_HTTP_MAX_CONNECTIONS = int(os.getenv("AUTH_HTTP_MAX_CONNECTIONS", 100))
+AUTH_HTTP_MAX_KEEPALIVE = int(os.getenv("AUTH_HTTP_MAX_KEEPALIVE", 20))
+AUTH_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("AUTH_HTTP_KEEPALIVE_EXPIRY", 30))
+AUTH_HTTP_CONNECT_TIMEOUT = float(os.getenv("AUTH_HTTP_CONNECT_TIMEOUT", 1))
+# Read/write/pool timeout of each attempt
+AUTH_HTTP_TIMEOUT = float(os.getenv("AUTH_HTTP_TIMEOUT", 2))
+
+# Attempts per validation (timeouts, connection errors and 5xx are retried)
+AUTH_RETRY_ATTEMPTS = int(os.getenv("AUTH_RETRY_ATTEMPTS", 2))
+# Base of the exponential backoff; each wait is drawn uniformly from [0, base * 2^n]
+AUTH_RETRY_BACKOFF = float(os.getenv("AUTH_RETRY_BACKOFF", 0.05))
+# Consecutive failures that open the circuit, and seconds before a probe call
+AUTH_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("AUTH_CIRCUIT_FAILURE_THRESHOLD", 5))
+AUTH_CIRCUIT_RESET_TIMEOUT = float(os.getenv("AUTH_CIRCUIT_RESET_TIMEOUT", 30))
+
+# Local validation cache configuration
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 60))
+AUTH_CACHE_NEGATIVE_TTL = float(os.getenv("AUTH_CACHE_NEGATIVE_TTL", 10))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", 10000))
+# Extra seconds past the TTL a validated token may be served while Auth Service
+# is unavailable (never past the token's own expires_at); 0 disables it
+AUTH_CACHE_STALE_TTL = float(os.getenv("AUTH_CACHE_STALE_TTL", 300))
+
+# Offline verification with the Auth Service signing keys (JWKS)
+AUTH_LOCAL_VERIFY = os.getenv("AUTH_LOCAL_VERIFY", "false").lower() in ("1", "true", "yes")
+AUTH_JWKS_URL = os.getenv("AUTH_JWKS_URL", f"{AUTH_SERVICE_URL}/auth/.well-known/jwks.json")
+AUTH_JWKS_REFRESH_INTERVAL = float(os.getenv("AUTH_JWKS_REFRESH_INTERVAL", 300))
+# Minimum seconds between forced refreshes triggered by an unknown kid
+AUTH_JWKS_MIN_REFRESH_INTERVAL = float(os.getenv("AUTH_JWKS_MIN_REFRESH_INTERVAL", 30))
+AUTH_JWT_ALGORITHMS = [a.strip() for a in os.getenv("AUTH_JWT_ALGORITHMS", "RS256,ES256").split(",") if a.strip()]
+AUTH_JWT_ISSUER = os.getenv("AUTH_JWT_ISSUER") or None
+AUTH_JWT_AUDIENCE = os.getenv("AUTH_JWT_AUDIENCE") or None
+
+AUTH_SERVICE_LATENCY = metrics.histogram(
+    "auth_service_request_duration_seconds",
+    "Latency of calls to Auth Service",
+    labelnames=("call", "outcome"),
+)
+AUTH_CIRCUIT_STATE = metrics.gauge(
+    "auth_service_circuit_open",
+    "1 while the Auth Service circuit breaker is open or half-open",
+)
+AUTH_CIRCUIT_REJECTIONS = metrics.counter(
+    "auth_service_circuit_rejections_total",
+    "Validations failed fast or served stale because the circuit was open",
+    labelnames=("outcome",),
+)
+
+
+def _parse_expires_at(value: Any) -> Optional[float]:
+    """Convert Auth Service expires_at (epoch seconds or ISO-8601) to epoch seconds"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of token validation results
+
+    Entries are keyed by the SHA-256 of the token (raw tokens are never kept)
+    and expire at the earlier of the configured TTL and the token's own
+    expires_at. Rejected tokens are cached for a shorter negative TTL.
+
+    Validated tokens are kept ``stale_ttl`` seconds longer (still capped by
+    expires_at) so ``get_stale`` can answer while Auth Service is down.
+    """
+
+    def __init__(
+        self,
+        max_size: int = AUTH_CACHE_MAX_SIZE,
+        ttl: float = AUTH_CACHE_TTL,
+        negative_ttl: float = AUTH_CACHE_NEGATIVE_TTL,
+        stale_ttl: float = AUTH_CACHE_STALE_TTL,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        # key -> (fresh until, usable until when stale [monotonic], user info or None, rejection detail or None)
+        self._entries: "OrderedDict[str, Tuple[float, float, Optional[Dict[str, Any]], Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+        """Return (user_info, rejection_detail) or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None and entry[1] <= now:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if entry[3] is not None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry[2], entry[3]
+
+    def get_stale(self, key: str) -> Optional[Dict[str, Any]]:
+        """User info of a validated token past its TTL but not its expiry, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] is None or entry[1] <= now:
+                return None
+            self.stale_hits += 1
+            return entry[2]
+
+    def _put(self, key: str, expires: float, usable_until: float, user_info, detail):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (expires, usable_until, user_info, detail)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def set_valid(self, key: str, user_info: Dict[str, Any]):
+        ttl = self.ttl
+        usable = self.ttl + max(self.stale_ttl, 0)
+        token_expiry = _parse_expires_at(user_info.get("expires_at"))
+        if token_expiry is not None:
+            ttl = min(ttl, token_expiry - time.time())
+            usable = min(usable, token_expiry - time.time())
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        self._put(key, now + ttl, now + usable, dict(user_info), None)
+
+    def set_invalid(self, key: str, detail: str):
+        if self.negative_ttl <= 0:
+            return
+        expires = time.monotonic() + self.negative_ttl
+        self._put(key, expires, expires, None, detail)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "coalesced": self.coalesced,
+            "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+class TokenRejected(HTTPException):
+    """Auth Service definitively rejected the token (safe to cache)"""
+
+
+def _unauthorized(detail: str, definitive: bool = False) -> HTTPException:
+    exc_class = TokenRejected if definitive else HTTPException
+    return exc_class(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+
+
+def _service_unavailable(detail: str, retry_after: Optional[float] = None) -> HTTPException:
+    headers = {"Retry-After": str(max(1, round(retry_after)))} if retry_after is not None else None
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers=headers,
+    )
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for the Auth Service calls
+
+    After ``failure_threshold`` failed calls in a row the circuit opens and
+    ``allow()`` returns False, so requests fail fast instead of each waiting
+    for the timeout. Once ``reset_timeout`` has passed a single probe call is
+    let through (half-open): success closes the circuit, failure re-opens it
+    for another ``reset_timeout``.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = AUTH_CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = AUTH_CIRCUIT_RESET_TIMEOUT,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        now = self._clock()
+        if now - self._opened_at < self.reset_timeout:
+            return False
+        # Let one probe through; the rest keep failing fast until it answers
+        self.state = self.HALF_OPEN
+        self._opened_at = now
+        return True
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.reset_timeout - self._clock())
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info("Auth Service circuit closed")
+            AUTH_CIRCUIT_STATE.set(0)
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.failure_threshold > 0 and self.failures >= self.failure_threshold
+        ):
+            if self.state == self.CLOSED:
+                logger.warning(f"Auth Service circuit opened after {self.failures} consecutive failures")
+            self.state = self.OPEN
+            self._opened_at = self._clock()
+            AUTH_CIRCUIT_STATE.set(1)
+
+
+class SigningKeyUnavailable(Exception):
+    """No usable signing key for a token; callers fall back to remote validation"""
+
+
+class JWKSKeyStore:
+    """
+    Cache of the Auth Service public signing keys
+
+    Keys are fetched from the JWKS endpoint, refreshed in the background every
+    ``refresh_interval`` seconds and re-fetched on demand when a token carries
+    an unknown ``kid`` (at most once per ``min_refresh_interval``, so forged
+    kids cannot hammer Auth Service). On fetch errors the previous keys stay.
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        client_factory,
+        refresh_interval: float = AUTH_JWKS_REFRESH_INTERVAL,
+        min_refresh_interval: float = AUTH_JWKS_MIN_REFRESH_INTERVAL,
+    ):
+        self.jwks_url = jwks_url
+        self._client_factory = client_factory
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at: Optional[float] = None
+        self._last_attempt: Optional[float] = None
+        self._refresh_task: Optional["asyncio.Task"] = None
+        self._background_task: Optional["asyncio.Task"] = None
+
+    @property
+    def key_ids(self):
+        return list(self._keys)
+
+    async def refresh(self) -> bool:
+        """Fetch the JWKS now; concurrent callers share one request"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._fetch())
+        return await asyncio.shield(self._refresh_task)
+
+    async def _fetch(self) -> bool:
+        self._last_attempt = time.monotonic()
+        started = time.perf_counter()
+        try:
+            client = await self._client_factory()
+            try:
+                response = await client.get(self.jwks_url)
+            finally:
+                AUTH_SERVICE_LATENCY.observe(time.perf_counter() - started, call="jwks", outcome="done")
+            response.raise_for_status()
+            keys = {}
+            for key_data in response.json().get("keys", []):
+                if key_data.get("use", "sig") != "sig":
+                    continue
+                kid = key_data.get("kid", "")
+                keys[kid] = jwk.construct(key_data, key_data.get("alg", AUTH_JWT_ALGORITHMS[0]))
+        except Exception as e:
+            logger.warning(f"Could not refresh Auth Service signing keys: {e}")
+            return False
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        return True
+
+    def _is_stale(self) -> bool:
+        return self._fetched_at is None or time.monotonic() - self._fetched_at > self.refresh_interval
+
+    def _can_force_refresh(self) -> bool:
+        return self._last_attempt is None or time.monotonic() - self._last_attempt >= self.min_refresh_interval
+
+    async def get_key(self, kid: Optional[str]):
+        """Return the key for ``kid`` or raise SigningKeyUnavailable"""
+        self.start_background_refresh()
+        if self._is_stale() and self._can_force_refresh():
+            await self.refresh()
+
+        key = self._lookup(kid)
+        if key is None and self._can_force_refresh():
+            # Unknown kid: Auth Service probably rotated its keys
+            await self.refresh()
+            key = self._lookup(kid)
+        if key is None:
+            raise SigningKeyUnavailable(kid)
+        return key
+
+    def _lookup(self, kid: Optional[str]):
+        if kid is None and len(self._keys) == 1:
+            return next(iter(self._keys.values()))
+        return self._keys.get(kid or "")
+
+    def start_background_refresh(self):
+        """Start the periodic refresh task on the running loop (idempotent)"""
+        if self._background_task is None or self._background_task.done():
+            self._background_task = asyncio.ensure_future(self._refresh_periodically())
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    async def stop(self):
+        for task in (self._background_task, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._background_task = None
+        self._refresh_task = None
+
+
+def _claims_to_user_info(claims: Dict[str, Any]) -> Dict[str, Any]:
+    """Map JWT claims to the shape returned by /auth/token/validate"""
+    user_id = claims.get("user_id", claims.get("sub"))
+    if isinstance(user_id, str) and user_id.isdigit():
+        user_id = int(user_id)
+    scopes = claims.get("scopes")
+    if scopes is None:
+        scopes = claims.get("scope", "").split()
+    return {
+        "user_id": user_id,
+        "email": claims.get("email"),
+        "scopes": list(scopes),
+        "expires_at": claims.get("exp"),
+    }
 
 
 class TokenValidator:
     """
     Token validator that communicates with Auth Service
+
+    With a ``key_store`` (AUTH_LOCAL_VERIFY=true) tokens are verified locally
+    against the cached signing keys and Auth Service is only called when no
+    usable key is available.
+
+    Remote validation is idempotent, so timeouts, connection errors and 5xx
+    are retried up to ``retry_attempts`` times with jittered backoff. The
+    ``breaker`` fails calls fast while Auth Service is unhealthy; tokens
+    validated recently enough are then still served from the cache.
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        cache: Optional[TokenCache] = None,
+        key_store: Optional[JWKSKeyStore] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        retry_attempts: int = AUTH_RETRY_ATTEMPTS,
+        retry_backoff: float = AUTH_RETRY_BACKOFF,
+    ):
         self.auth_service_url = AUTH_SERVICE_URL
         self.ca_cert_path = CA_CERT_PATH
         self._client: Optional[httpx.AsyncClient] = None
+        self.cache = cache if cache is not None else TokenCache()
+        self.key_store = key_store
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.retry_attempts = max(1, retry_attempts)
+        self.retry_backoff = retry_backoff
+        # token hash -> in-flight validation shared by concurrent requests
+        self._inflight: Dict[str, "asyncio.Task"] = {}
     
     async def get_client(self) -> httpx.AsyncClient:
-        """Get or create async HTTP client"""
+        """Get or create the pooled (keep-alive, HTTP/2 when available) HTTP client"""
         if self._client is None:
             self._client = httpx.AsyncClient(
                 verify=self.ca_cert_path if os.path.exists(self.ca_cert_path) else True,
-                timeout=httpx.Timeout(5.0)
+                timeout=httpx.Timeout(AUTH_HTTP_TIMEOUT, connect=AUTH_HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=AUTH_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=AUTH_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=AUTH_HTTP_KEEPALIVE_EXPIRY,
+                ),
+                http2=AUTH_HTTP2 and h2 is not None,
             )
         return self._client
     
     async def validate_token(self, token: str) -> Dict[str, Any]:
         """
-        Validate token against Auth Service
+        Validate token, answering from the local cache when possible
+
+        Concurrent validations of the same token share a single call
+        to Auth Service.
         
         Args:
             token: JWT access token
@@ -60,30 +501,137 @@ class TokenValidator:
         Raises:
             HTTPException: If token is invalid or validation fails
         """
+        key = self.cache.key(token)
+        cached = self.cache.get(key)
+        if cached is not None:
+            user_info, rejection = cached
+            if rejection is not None:
+                raise _unauthorized(rejection)
+            return dict(user_info)
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._validate_and_cache(key, token))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish_inflight(key, done))
+        else:
+            self.cache.coalesced += 1
+
+        # shield: a cancelled request must not cancel the call other requests wait on
+        return dict(await asyncio.shield(task))
+
+    def _finish_inflight(self, key: str, task: "asyncio.Task"):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            task.exception()
+
+    async def _validate_and_cache(self, key: str, token: str) -> Dict[str, Any]:
+        try:
+            user_info = None
+            if self.key_store is not None:
+                try:
+                    user_info = await self._validate_local(token)
+                except SigningKeyUnavailable:
+                    user_info = None
+            if user_info is None:
+                user_info = await self._validate_remote(token)
+        except TokenRejected as exc:
+            # Only definitive rejections are cached, never 5xx/503s
+            self.cache.set_invalid(key, exc.detail)
+            raise
+        except HTTPException as exc:
+            if exc.status_code != status.HTTP_503_SERVICE_UNAVAILABLE:
+                raise
+            # Auth Service unavailable: accept a token it validated recently
+            stale = self.cache.get_stale(key)
+            if stale is None:
+                raise
+            if self.breaker.state != CircuitBreaker.CLOSED:
+                AUTH_CIRCUIT_REJECTIONS.inc(outcome="stale")
+            return dict(stale)
+        self.cache.set_valid(key, user_info)
+        return user_info
+
+    async def _validate_local(self, token: str) -> Dict[str, Any]:
+        """
+        Verify signature, exp (and iss/aud when configured) with cached keys
+
+        Raises:
+            SigningKeyUnavailable: No key for the token's kid (use remote)
+            TokenRejected: Token is malformed, expired or badly signed
+        """
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError:
+            raise _unauthorized("Malformed token", definitive=True)
+
+        signing_key = await self.key_store.get_key(header.get("kid"))
+        try:
+            claims = jwt.decode(
+                token,
+                signing_key,
+                algorithms=AUTH_JWT_ALGORITHMS,
+                audience=AUTH_JWT_AUDIENCE,
+                issuer=AUTH_JWT_ISSUER,
+                # python-jose accepts tokens without exp unless it is required
+                options={"verify_aud": AUTH_JWT_AUDIENCE is not None, "require_exp": True},
+            )
+        except ExpiredSignatureError:
+            raise _unauthorized("Token expired", definitive=True)
+        except JWTClaimsError as e:
+            raise _unauthorized(f"Invalid token claims: {e}", definitive=True)
+        except JWTError as e:
+            # Bad signature or a missing required claim
+            raise _unauthorized(f"Invalid token: {e}", definitive=True)
+        return _claims_to_user_info(claims)
+
+    async def _validate_remote(self, token: str) -> Dict[str, Any]:
+        """Validate token against Auth Service, retrying transient failures"""
         client = await self.get_client()
+        for attempt in range(self.retry_attempts):
+            if not self.breaker.allow():
+                AUTH_CIRCUIT_REJECTIONS.inc(outcome="rejected")
+                raise _service_unavailable("Auth service unavailable", self.breaker.retry_after())
+            try:
+                user_info = await self._call_validate(client, token)
+            except HTTPException as exc:
+                if exc.status_code != status.HTTP_503_SERVICE_UNAVAILABLE:
+                    # Auth Service answered: the token is the problem, not the service
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt + 1 >= self.retry_attempts:
+                    raise
+                await asyncio.sleep(random.uniform(0, self.retry_backoff * 2 ** attempt))
+            else:
+                self.breaker.record_success()
+                return user_info
+
+    async def _call_validate(self, client: httpx.AsyncClient, token: str) -> Dict[str, Any]:
+        """One /auth/token/validate call; 503 means the attempt may be retried"""
+        started = time.perf_counter()
+        outcome = "error"
         
         try:
             response = await client.post(
                 f"{self.auth_service_url}/auth/token/validate",
                 headers={"Authorization": f"Bearer {token}"},
-                timeout=5.0
             )
+            outcome = str(response.status_code)
             
+            if response.status_code >= 500:
+                raise _service_unavailable(f"Auth service error ({response.status_code})")
             if response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Token validation failed",
-                    headers={"WWW-Authenticate": "Bearer"}
+                raise _unauthorized(
+                    "Token validation failed",
+                    definitive=response.status_code in (401, 403),
                 )
             
             data = response.json()
             
             if not data.get("valid"):
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail=data.get("message", "Invalid token"),
-                    headers={"WWW-Authenticate": "Bearer"}
-                )
+                raise _unauthorized(data.get("message", "Invalid token"), definitive=True)
             
             return {
                 "user_id": data.get("user_id"),
@@ -93,6 +641,7 @@ class TokenValidator:
             }
             
         except httpx.TimeoutException:
+            outcome = "timeout"
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Auth service timeout"
@@ -102,15 +651,36 @@ class TokenValidator:
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail=f"Auth service unreachable: {str(e)}"
             )
+        finally:
+            AUTH_SERVICE_LATENCY.observe(time.perf_counter() - started, call="validate", outcome=outcome)
     
     async def close(self):
         """Close HTTP client"""
+        if self.key_store is not None:
+            await self.key_store.stop()
         if self._client:
             await self._client.aclose()
+            self._client = None
+
+
+def _build_validator() -> TokenValidator:
+    validator = TokenValidator()
+    if AUTH_LOCAL_VERIFY:
+        validator.key_store = JWKSKeyStore(AUTH_JWKS_URL, validator.get_client)
+    return validator
 
 
 # Singleton validator instance
-_validator = TokenValidator()
+_validator = _build_validator()
+
+TOKEN_CACHE_STATS = metrics.gauge(
+    "auth_token_cache",
+    "Token validation cache counters (size, hits, negative_hits, misses, stale_hits, coalesced, hit_ratio)",
+    labelnames=("stat",),
+)
+TOKEN_CACHE_STATS.set_function(
+    lambda: {(name,): float(value) for name, value in _validator.cache.stats().items()}
+)
 
 
 async def require_auth(
@@ -200,6 +770,15 @@ def require_scopes(*required_scopes: str):
     return _require_scopes
 
 
+async def check_auth_service() -> Dict[str, Any]:
+    """Readiness check: Auth Service answers over the validator's pooled client"""
+    client = await _validator.get_client()
+    response = await client.get(AUTH_HEALTH_URL)
+    if response.status_code >= 500:
+        raise RuntimeError(f"Auth Service answered {response.status_code}")
+    return {"circuit": _validator.breaker.state}
+
+
 # Cleanup function for app shutdown
 async def cleanup_auth_middleware():
     """Call this in FastAPI lifespan shutdown"""
@@ -0,0 +1,134 @@
+# src/middleware/metrics_middleware.py
+"""
+Per-request instrumentation.
+
+MetricsMiddleware is a plain ASGI middleware (no BaseHTTPMiddleware, no
+extra task per request) that records request latency per route template and
+the number/time of SQL statements each request ran. SQL statements are
+counted through SQLAlchemy before/after_cursor_execute events on every
+Engine; the per-request totals live in a context variable, which Starlette
+copies into the threadpool that runs sync handlers.
+
+Usage:
+    app.add_middleware(MetricsMiddleware)
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src import metrics
+
+REQUEST_LATENCY = metrics.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    labelnames=("method", "route"),
+)
+REQUESTS = metrics.counter(
+    "http_requests_total",
+    "HTTP requests by route template and status code",
+    labelnames=("method", "route", "status"),
+)
+REQUEST_DB_QUERIES = metrics.histogram(
+    "http_request_db_queries",
+    "SQL statements executed per request",
+    labelnames=("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_DB_TIME = metrics.histogram(
+    "http_request_db_seconds",
+    "Time spent in SQL statements per request",
+    labelnames=("route",),
+)
+DB_QUERY_DURATION = metrics.histogram(
+    "db_query_duration_seconds",
+    "Duration of individual SQL statements",
+)
+
+
+class RequestStats:
+    """Mutable per-request counters shared with threadpool workers"""
+
+    __slots__ = ("db_queries", "db_time")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start_time")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    DB_QUERY_DURATION.observe(elapsed)
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_time += elapsed
+
+
+def route_template(scope) -> str:
+    """
+    Route path template (/users/{user_id}) to keep label cardinality bounded
+
+    Built from the request path and its matched path params, which works for
+    routes included with a prefix regardless of how the router nests them.
+    """
+    if scope.get("route") is None:
+        return "unmatched"
+    segments = scope["path"].split("/")
+    for name, value in scope.get("path_params", {}).items():
+        value = str(value)
+        for index in range(len(segments) - 1, -1, -1):
+            if segments[index] == value:
+                segments[index] = "{" + name + "}"
+                break
+    return "/".join(segments)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started
+            current_request_stats.reset(token)
+            route = route_template(scope)
+            method = scope["method"]
+            REQUEST_LATENCY.observe(duration, method=method, route=route)
+            REQUESTS.inc(method=method, route=route, status=status_code)
+            REQUEST_DB_QUERIES.observe(stats.db_queries, route=route)
+            REQUEST_DB_TIME.observe(stats.db_time, route=route)
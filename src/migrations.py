@@ -0,0 +1,410 @@
+# src/migrations.py
+"""
+Versioned schema migrations.
+
+Applied versions are recorded in the ``schema_migrations`` table. A fresh
+database gets the current models through ``create_all`` and every known
+version is stamped as applied; an existing database gets the pending
+migrations applied in order, each one in its own transaction together with
+its bookkeeping row.
+
+Migrations never run on import. The app runs them from its lifespan through
+``ensure_schema``, which costs a single query when the schema is current and
+otherwise takes a cross-process lock (GET_LOCK on MySQL, a lock file next to
+a SQLite database), so N workers booting together apply them exactly once.
+Connection errors while the DB is still starting are retried with backoff:
+
+    from src.migrations import ensure_schema
+    ensure_schema(engine)
+
+or from the command line (uses DATABASE_URL):
+
+    python -m src.migrations            # apply pending migrations
+    python -m src.migrations --status   # list applied / pending versions
+
+Adding a migration: append a ``Migration`` to MIGRATIONS with the next
+version. Databases created before this module existed may or may not already
+have a change, so migrations check the live schema before altering it.
+"""
+
+import argparse
+import logging
+import random
+import time
+import warnings
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, List
+
+from sqlalchemy import (
+    Column, DateTime, Index, Integer, MetaData, String, Table, bindparam, inspect, literal, select, text,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, SAWarning
+
+from .models import Base, User, UserChange, search_key
+
+try:
+    import fcntl
+except ImportError:  # Windows: SQLite dev databases go without the lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping table; kept out of Base.metadata so create_all/drop_all of the
+# models never touch it
+migrations_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migrations_metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+def _has_table(conn: Connection, table: str) -> bool:
+    return inspect(conn).has_table(table)
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return column in {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _has_index(conn: Connection, table: str, name: str) -> bool:
+    with warnings.catch_warnings():
+        # Some dialects cannot reflect expression indexes such as lower(email)
+        warnings.simplefilter("ignore", SAWarning)
+        return name in {i["name"] for i in inspect(conn).get_indexes(table)}
+
+
+def _model_index(name: str) -> Index:
+    return next(index for index in User.__table__.indexes if index.name == name)
+
+
+def _add_dashboard_canvas_id(conn: Connection):
+    """Add dashboards.canvas_id, filled from the dashboard id, NOT NULL and UNIQUE"""
+    if not _has_table(conn, "dashboards") or _has_column(conn, "dashboards", "canvas_id"):
+        return
+    conn.execute(text("ALTER TABLE dashboards ADD COLUMN canvas_id VARCHAR(36) NULL"))
+    conn.execute(text("UPDATE dashboards SET canvas_id = CAST(id AS CHAR) WHERE canvas_id IS NULL"))
+    conn.execute(text("ALTER TABLE dashboards MODIFY canvas_id VARCHAR(36) NOT NULL"))
+    conn.execute(text("CREATE UNIQUE INDEX idx_dashboards_canvas_id ON dashboards(canvas_id)"))
+
+
+def _add_user_version(conn: Connection):
+    """Add users.version (row version used for ETags); existing rows start at 1"""
+    if _has_column(conn, "users", "version"):
+        return
+    conn.execute(text("ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+def _index_users_access_paths(conn: Connection):
+    """
+    Indexes for the real lookups: (is_active, id) for keyset pages of active
+    users and lower(email) for case-insensitive login/registration checks.
+    The full_name index was never used by any query and only cost writes.
+    """
+    for name in ("ix_users_is_active_id", "ix_users_email_lower"):
+        if not _has_index(conn, "users", name):
+            _model_index(name).create(conn)
+    if _has_index(conn, "users", "ix_users_full_name"):
+        on_table = " ON users" if conn.dialect.name == "mysql" else ""
+        conn.execute(text(f"DROP INDEX ix_users_full_name{on_table}"))
+
+
+def _index_users_name_search(conn: Connection):
+    """
+    Superseded by users_search_keys (7): prefix search no longer reads a
+    lower(full_name) index, so it is not created any more
+    """
+
+
+# Stored instead of a password that cannot be hashed; matches no scheme, so
+# check_password always rejects it
+UNUSABLE_PASSWORD = "!unusable"
+
+
+def _hash_plaintext_passwords(conn: Connection):
+    """
+    Hash passwords stored in plaintext (PUT /users/{id} used to store them
+    as sent). Only those rows are touched, with the current hashing policy.
+
+    A plaintext value over bcrypt's 72-byte limit cannot be hashed and is not
+    truncated (that would silently change the password): it is replaced by
+    UNUSABLE_PASSWORD, which never verifies, and the ids are logged so those
+    users can be sent a password reset.
+    """
+    from .password_hashing import BCRYPT_MAX_PASSWORD_BYTES, hash_password, identify
+
+    users = User.__table__
+    candidates = conn.execute(
+        select(users.c.id, users.c.hashed_password).where(
+            ~users.c.hashed_password.like("$2%"), ~users.c.hashed_password.like("$argon2%")
+        )
+    ).all()
+    plaintext = [(user_id, value) for user_id, value in candidates if identify(value) is None]
+    if plaintext:
+        logger.info(f"Hashing {len(plaintext)} plaintext passwords")
+    too_long = []
+    for user_id, value in plaintext:
+        if len(value.encode("utf-8")) > BCRYPT_MAX_PASSWORD_BYTES:
+            too_long.append(user_id)
+            hashed = UNUSABLE_PASSWORD
+        else:
+            hashed = hash_password(value)
+        conn.execute(users.update().where(users.c.id == user_id).values(hashed_password=hashed))
+    if too_long:
+        logger.warning(
+            f"{len(too_long)} plaintext passwords exceed {BCRYPT_MAX_PASSWORD_BYTES} bytes and were disabled; "
+            f"these users need a password reset: {too_long}"
+        )
+
+
+def _create_user_changes(conn: Connection):
+    """
+    Change feed outbox (src/changes.py). Existing users get one "created"
+    entry each, in id order, so replaying the feed from 0 yields every user.
+    """
+    if _has_table(conn, UserChange.__tablename__):
+        return
+    UserChange.__table__.create(conn)
+    users, changes = User.__table__, UserChange.__table__
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    conn.execute(
+        changes.insert().from_select(
+            ["user_id", "op", "changed_at"],
+            select(users.c.id, literal("created"), literal(now)).order_by(users.c.id),
+        )
+    )
+
+
+def _add_user_search_keys(conn: Connection, batch_size: int = 5000):
+    """
+    Lowercased email / full_name copies with a binary collation and their
+    own indexes for prefix search (a range on lower(column) is wrong under
+    MySQL's case- and accent-insensitive collations). Existing rows are
+    filled in id batches with the same Python normalization the app uses.
+    """
+    users = User.__table__
+    for name in ("email_search", "full_name_search"):
+        if not _has_column(conn, "users", name):
+            column_type = users.c[name].type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE users ADD COLUMN {name} {column_type} NULL"))
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(users.c.id, users.c.email, users.c.full_name)
+            .where(users.c.id > last_id)
+            .order_by(users.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            users.update().where(users.c.id == bindparam("user_id")).values(
+                email_search=bindparam("email_key"), full_name_search=bindparam("full_name_key")
+            ),
+            [
+                {"user_id": row.id, "email_key": search_key(row.email), "full_name_key": search_key(row.full_name)}
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+    for name in ("ix_users_email_search", "ix_users_full_name_search"):
+        if not _has_index(conn, "users", name):
+            _model_index(name).create(conn)
+    if _has_index(conn, "users", "ix_users_full_name_lower"):
+        on_table = " ON users" if conn.dialect.name == "mysql" else ""
+        conn.execute(text(f"DROP INDEX ix_users_full_name_lower{on_table}"))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "dashboards_canvas_id", _add_dashboard_canvas_id),
+    Migration(2, "users_version", _add_user_version),
+    Migration(3, "users_access_path_indexes", _index_users_access_paths),
+    Migration(4, "users_name_search_index", _index_users_name_search),
+    Migration(5, "hash_plaintext_passwords", _hash_plaintext_passwords),
+    Migration(6, "user_changes_outbox", _create_user_changes),
+    Migration(7, "users_search_keys", _add_user_search_keys),
+]
+
+
+def _applied(conn: Connection) -> List[int]:
+    if not _has_table(conn, schema_migrations.name):
+        return []
+    return list(conn.execute(select(schema_migrations.c.version).order_by(schema_migrations.c.version)).scalars())
+
+
+def _pending(conn: Connection) -> List[Migration]:
+    applied = set(_applied(conn))
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+
+def applied_versions(engine: Engine) -> List[int]:
+    with engine.connect() as conn:
+        return _applied(conn)
+
+
+def pending_migrations(engine: Engine) -> List[Migration]:
+    with engine.connect() as conn:
+        return _pending(conn)
+
+
+def _record(conn: Connection, migration: Migration):
+    conn.execute(
+        schema_migrations.insert().values(
+            version=migration.version,
+            name=migration.name,
+            applied_at=datetime.now(timezone.utc).replace(tzinfo=None),
+        )
+    )
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Bring the schema up to date; returns the versions applied by this call"""
+    migrations_metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        if not _has_table(conn, User.__tablename__):
+            # New database: the models already describe the latest schema
+            logger.info("Creating schema from models")
+            Base.metadata.create_all(conn)
+            for migration in _pending(conn):
+                _record(conn, migration)
+            return []
+
+    applied = []
+    for migration in pending_migrations(engine):
+        logger.info(f"Applying migration {migration.version}: {migration.name}")
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            _record(conn, migration)
+        applied.append(migration.version)
+
+    # Tables added to the models since the last run need no migration
+    Base.metadata.create_all(engine)
+    return applied
+
+
+class MigrationLockTimeout(Exception):
+    """Raised when another process holds the migration lock for too long"""
+
+
+MIGRATION_LOCK_NAME = "user_service_schema_migrations"
+
+
+@contextmanager
+def migration_lock(engine: Engine, timeout: float):
+    """Hold a lock shared by every process migrating ``engine``'s database"""
+    if engine.dialect.name == "mysql":
+        with engine.connect() as conn:
+            acquired = conn.execute(
+                text("SELECT GET_LOCK(:name, :timeout)"),
+                {"name": MIGRATION_LOCK_NAME, "timeout": int(timeout)},
+            ).scalar()
+            if acquired != 1:
+                raise MigrationLockTimeout(f"Could not acquire {MIGRATION_LOCK_NAME} in {timeout}s")
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK_NAME})
+        return
+
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or fcntl is None or not database or database == ":memory:":
+        yield
+        return
+
+    with open(f"{database}.migrations.lock", "a") as lock_file:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise MigrationLockTimeout(f"Could not lock {lock_file.name} in {timeout}s")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def schema_is_current(engine: Engine) -> bool:
+    """Cheap check done by every worker before competing for the lock"""
+    with engine.connect() as conn:
+        return _has_table(conn, User.__tablename__) and not _pending(conn)
+
+
+def ensure_schema(
+    engine: Engine,
+    startup_timeout: float = 60,
+    max_backoff: float = 5,
+    lock_timeout: float = 120,
+) -> List[int]:
+    """
+    Apply pending migrations once across all workers; returns the versions
+    applied by this process. Retries while the database is unreachable for
+    up to ``startup_timeout`` seconds.
+    """
+    deadline = time.monotonic() + startup_timeout
+    attempt = 0
+    while True:
+        try:
+            if schema_is_current(engine):
+                return []
+            with migration_lock(engine, lock_timeout):
+                # Another worker may have finished while we waited for the lock
+                return run_migrations(engine)
+        except OperationalError as exc:
+            attempt += 1
+            # Exponential backoff with jitter so workers do not retry in lockstep
+            delay = min(max_backoff, 0.1 * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if time.monotonic() + delay > deadline:
+                raise
+            logger.warning(f"Database not ready ({exc.orig!r}); retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply User Service schema migrations")
+    parser.add_argument("--status", action="store_true", help="list applied and pending versions")
+    args = parser.parse_args(argv)
+
+    from .config import Config
+    from .database import get_engine
+
+    engine = get_engine()
+
+    if args.status:
+        applied = set(applied_versions(engine))
+        for migration in MIGRATIONS:
+            state = "applied" if migration.version in applied else "pending"
+            print(f"{migration.version:>4}  {state:<8} {migration.name}")
+        return
+
+    logging.basicConfig(level=logging.INFO)
+    config = Config()
+    applied = ensure_schema(
+        engine,
+        startup_timeout=config.DB_STARTUP_TIMEOUT,
+        max_backoff=config.DB_STARTUP_MAX_BACKOFF,
+        lock_timeout=config.MIGRATION_LOCK_TIMEOUT,
+    )
+    print(f"Applied migrations: {applied or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
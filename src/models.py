@@ -1,14 +1,93 @@
 # src/models.py
-from sqlalchemy import Boolean, Column, Integer, String
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Index, Integer, String, event, func, inspect
+from sqlalchemy.dialects import mysql
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import object_session
 
 Base = declarative_base()
 
+# Prefix search keys are compared by code point (a >= / < range is only exact
+# under a binary collation; SQLite's default BINARY already is one)
+SearchKey = String(255).with_variant(mysql.VARCHAR(255, collation="utf8mb4_bin"), "mysql")
+
+def search_key(value):
+    """Normalized form of email / full_name stored for /users/search"""
+    return value.lower() if value is not None else None
+
+def _search_key_default(source: str):
+    # Column default, so Core inserts (bulk import) fill it as well
+    def default(context):
+        return search_key(context.get_current_parameters().get(source))
+    return default
+
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(255), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
-    full_name = Column(String(255), index=True)
-    is_active = Column(Boolean, default=True)
\ No newline at end of file
+    full_name = Column(String(255))
+    # Lowercased copies for prefix search (see SearchKey)
+    email_search = Column(SearchKey, default=_search_key_default("email"))
+    full_name_search = Column(SearchKey, default=_search_key_default("full_name"))
+    is_active = Column(Boolean, default=True)
+    # Incremented on every update; used for ETags
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __table_args__ = (
+        # Keyset pages of active users: WHERE is_active = ? AND id > ? ORDER BY id
+        Index("ix_users_is_active_id", "is_active", "id"),
+        # Prefix search (/users/search):
+        # WHERE is_active = 1 AND *_search >= ? AND *_search < ? ORDER BY *_search
+        Index("ix_users_email_search", "is_active", "email_search"),
+        Index("ix_users_full_name_search", "is_active", "full_name_search"),
+    )
+
+
+# Case-insensitive email lookups: WHERE lower(email) = ?
+Index("ix_users_email_lower", func.lower(User.email))
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class UserChange(Base):
+    """Transactional outbox of user changes, served by GET /users/changes.
+
+    One row per register/update/deactivate/delete, written in the same
+    transaction as the change. ``seq`` is the feed position; the current
+    state of the user is joined in when the feed is read.
+    """
+    __tablename__ = "user_changes"
+
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False)
+    op = Column(String(16), nullable=False)  # created | updated | deactivated | deleted
+    changed_at = Column(DateTime, nullable=False, default=_utcnow)
+
+    __table_args__ = (
+        # Compaction: latest change per user
+        Index("ix_user_changes_user_id_seq", "user_id", "seq"),
+        # Never reuse the seq of a deleted last row (SQLite reuses rowids otherwise)
+        {"sqlite_autoincrement": True},
+    )
+
+
+@event.listens_for(User, "before_update")
+def _bump_user_version(mapper, connection, target):
+    session = object_session(target)
+    if session is not None and not session.is_modified(target, include_collections=False):
+        return
+    # Increment in SQL so concurrent updates never end up with the same version
+    target.version = User.version + 1
+
+
+@event.listens_for(User, "before_update")
+def _refresh_search_keys(mapper, connection, target):
+    state = inspect(target)
+    for source in ("email", "full_name"):
+        if state.attrs[source].history.has_changes():
+            setattr(target, f"{source}_search", search_key(getattr(target, source)))
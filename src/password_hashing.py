@@ -0,0 +1,322 @@
+# src/password_hashing.py
+"""
+Password service: hashing policy plus a dedicated, bounded worker pool for
+hashing and verification.
+
+Every password hash in the service goes through this module. The policy
+(PASSWORD_HASH_SCHEME, PASSWORD_BCRYPT_ROUNDS, PASSWORD_ARGON2_*) decides how
+new hashes are made; verification accepts any supported scheme and reports
+when a stored hash no longer matches the policy, so logins upgrade hashes
+transparently (``verify_and_update``). argon2 needs the optional
+``argon2-cffi`` package.
+
+bcrypt costs ~200-300 ms per call. Running it inline in a sync route holds one
+of Starlette's shared threadpool threads for that long, so a login burst
+starves every other endpoint. Password work is submitted here instead:
+
+    from src.password_hashing import password_hasher
+
+    hashed = await password_hasher.hash("secret123")
+    ok = await password_hasher.verify("secret123", hashed)
+
+When the pool is saturated (busy workers + PASSWORD_HASH_MAX_QUEUE waiting
+jobs) new jobs raise ``PasswordHasherBusy`` so the route can answer
+503 with Retry-After instead of queueing without bound.
+"""
+
+import asyncio
+import secrets
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import bcrypt
+
+from . import metrics
+from .config import Config
+
+HASH_QUEUE_WAIT = metrics.histogram(
+    "password_hash_queue_wait_seconds",
+    "Time a password job waited for a free hashing worker",
+    labelnames=("operation",),
+)
+HASH_DURATION = metrics.histogram(
+    "password_hash_duration_seconds",
+    "Time spent inside bcrypt",
+    labelnames=("operation",),
+)
+HASH_REJECTED = metrics.counter(
+    "password_hash_rejected_total",
+    "Password jobs rejected because the hashing pool was full",
+    labelnames=("operation",),
+)
+HASH_IN_FLIGHT = metrics.gauge(
+    "password_hash_in_flight",
+    "Password jobs running or waiting in the hashing pool",
+)
+HASH_UPGRADES = metrics.counter(
+    "password_hash_upgrades_total",
+    "Stored hashes replaced on login because they did not match the policy",
+    labelnames=("from_scheme",),
+)
+
+SCHEMES = ("bcrypt", "argon2")
+
+# bcrypt only uses (and the library refuses more than) 72 bytes of a password
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+
+@dataclass(frozen=True)
+class HashPolicy:
+    """How new password hashes are made"""
+
+    scheme: str = "bcrypt"
+    bcrypt_rounds: int = 12
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536  # KiB
+    argon2_parallelism: int = 4
+
+    def __post_init__(self):
+        if self.scheme not in SCHEMES:
+            raise ValueError(f"Unknown PASSWORD_HASH_SCHEME: {self.scheme}")
+        if not 4 <= self.bcrypt_rounds <= 31:
+            raise ValueError("PASSWORD_BCRYPT_ROUNDS must be between 4 and 31")
+
+    @classmethod
+    def from_config(cls, config: Optional[Config] = None) -> "HashPolicy":
+        config = config or Config()
+        return cls(
+            scheme=config.PASSWORD_HASH_SCHEME,
+            bcrypt_rounds=config.PASSWORD_BCRYPT_ROUNDS,
+            argon2_time_cost=config.PASSWORD_ARGON2_TIME_COST,
+            argon2_memory_cost=config.PASSWORD_ARGON2_MEMORY_COST,
+            argon2_parallelism=config.PASSWORD_ARGON2_PARALLELISM,
+        )
+
+
+# Policy for callers that do not pass one (read once from the environment)
+DEFAULT_POLICY = HashPolicy.from_config()
+
+
+def _argon2(policy: HashPolicy):
+    from argon2 import PasswordHasher as Argon2Hasher  # optional dependency
+
+    return Argon2Hasher(
+        time_cost=policy.argon2_time_cost,
+        memory_cost=policy.argon2_memory_cost,
+        parallelism=policy.argon2_parallelism,
+    )
+
+
+def identify(hashed_password: str) -> Optional[str]:
+    """Scheme of a stored hash, or None when it is not a supported hash"""
+    if hashed_password.startswith(("$2a$", "$2b$", "$2y$")):
+        return "bcrypt"
+    if hashed_password.startswith("$argon2"):
+        return "argon2"
+    return None
+
+
+def hash_password(password: str, policy: Optional[HashPolicy] = None) -> str:
+    """Hash password with the configured scheme and cost (blocking)"""
+    policy = policy or DEFAULT_POLICY
+    if policy.scheme == "argon2":
+        return _argon2(policy).hash(password)
+    salt = bcrypt.gensalt(rounds=policy.bcrypt_rounds)
+    return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify password against a stored hash of any supported scheme (blocking)"""
+    scheme = identify(hashed_password)
+    if scheme == "bcrypt":
+        try:
+            return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+        except ValueError:
+            return False
+    if scheme == "argon2":
+        from argon2.exceptions import VerificationError, InvalidHashError
+
+        try:
+            return _argon2(DEFAULT_POLICY).verify(hashed_password, plain_password)
+        except (VerificationError, InvalidHashError):
+            return False
+    # Never compared as plaintext: migration 5 hashed the legacy rows
+    return False
+
+
+def needs_rehash(hashed_password: str, policy: Optional[HashPolicy] = None) -> bool:
+    """True when ``hashed_password`` was not made with ``policy``"""
+    policy = policy or DEFAULT_POLICY
+    scheme = identify(hashed_password)
+    if scheme != policy.scheme:
+        return True
+    if scheme == "bcrypt":
+        return int(hashed_password.split("$")[2]) != policy.bcrypt_rounds
+    return _argon2(policy).check_needs_rehash(hashed_password)
+
+
+def _timed(func, *args):
+    # time.monotonic is system-wide, so it is comparable across worker processes
+    started = time.monotonic()
+    result = func(*args)
+    return result, started, time.monotonic()
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool has no room for another job"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing pool is saturated")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on its own executor with a cap on queued jobs
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        executor_kind: str = "thread",
+        retry_after: int = 1,
+        policy: Optional[HashPolicy] = None,
+    ):
+        if executor_kind not in ("thread", "process"):
+            raise ValueError(f"Unknown PASSWORD_HASH_EXECUTOR: {executor_kind}")
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.executor_kind = executor_kind
+        self.retry_after = retry_after
+        self.policy = policy or DEFAULT_POLICY
+        self._executor: Optional[Executor] = None
+        self._dummy_hash: Optional[str] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of jobs running or waiting at the same time"""
+        return self.workers + self.max_queue
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        # Created lazily so importing the module never forks or spawns threads
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.executor_kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix="password-hash"
+                        )
+        return self._executor
+
+    async def _submit(self, operation: str, func, *args):
+        with self._lock:
+            if self._pending >= self.capacity:
+                HASH_REJECTED.inc(operation=operation)
+                raise PasswordHasherBusy(self.retry_after)
+            self._pending += 1
+            HASH_IN_FLIGHT.set(self._pending)
+
+        submitted = time.monotonic()
+        loop = asyncio.get_running_loop()
+        try:
+            result, started, finished = await loop.run_in_executor(
+                self._get_executor(), _timed, func, *args
+            )
+        finally:
+            with self._lock:
+                self._pending -= 1
+                HASH_IN_FLIGHT.set(self._pending)
+
+        HASH_QUEUE_WAIT.observe(max(0.0, started - submitted), operation=operation)
+        HASH_DURATION.observe(finished - started, operation=operation)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", hash_password, password, self.policy)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit("verify", check_password, plain_password, hashed_password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify and, when the stored hash does not match the policy (older
+        cost, other scheme), return a fresh hash to store
+
+        Returns (valid, new_hash); new_hash is None when nothing changes or
+        the pool is too busy to rehash right now (it is retried next login).
+        """
+        valid = await self.verify(plain_password, hashed_password)
+        if not valid or not needs_rehash(hashed_password, self.policy):
+            return valid, None
+        try:
+            new_hash = await self.hash(plain_password)
+        except PasswordHasherBusy:
+            return True, None
+        HASH_UPGRADES.inc(from_scheme=identify(hashed_password))
+        return True, new_hash
+
+    async def verify_dummy(self, plain_password: str) -> bool:
+        """
+        Run a full verification against a throwaway hash and return False
+
+        Used for unknown accounts so that they take as long as a wrong
+        password and response timing does not reveal which emails exist.
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.hash(secrets.token_urlsafe(16))
+        await self.verify(plain_password, self._dummy_hash)
+        return False
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """
+        Hash a batch in parallel on all workers (bulk imports)
+
+        At most ``workers`` jobs of the batch are queued at once, leaving the
+        wait queue for interactive logins; when the pool is full the batch
+        backs off instead of failing.
+        """
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def hash_one(password: str) -> str:
+            async with semaphore:
+                while True:
+                    try:
+                        return await self.hash(password)
+                    except PasswordHasherBusy:
+                        await asyncio.sleep(0.05)
+
+        return list(await asyncio.gather(*(hash_one(p) for p in passwords)))
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker pool (call on app shutdown)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def _build_default_hasher() -> PasswordHasher:
+    config = Config()
+    return PasswordHasher(
+        workers=config.PASSWORD_HASH_WORKERS,
+        max_queue=config.PASSWORD_HASH_MAX_QUEUE,
+        executor_kind=config.PASSWORD_HASH_EXECUTOR,
+        retry_after=config.PASSWORD_HASH_RETRY_AFTER,
+        policy=HashPolicy.from_config(config),
+    )
+
+
+# Singleton hasher shared by all routes
+password_hasher = _build_default_hasher()
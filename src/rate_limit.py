@@ -0,0 +1,247 @@
+# src/rate_limit.py
+"""
+Sliding-window rate limiting for login attempts.
+
+Each key keeps two fixed-window counters (current and previous window). The
+request rate is estimated as ``previous * (1 - elapsed) + current``, which
+smooths the window edge like a true sliding log while storing two integers
+per key, so it maps directly onto INCR/EXPIRE on a shared store.
+
+Backends, selected by LOGIN_RATE_LIMIT_BACKEND:
+
+- "memory": per-process counters (default); each replica limits on its own
+- "redis":  shared Redis-compatible store (LOGIN_RATE_LIMIT_REDIS_URL); needs
+            the optional ``redis`` package
+- "none":   throttling disabled
+
+LoginThrottle combines two limiters, checked before any bcrypt work:
+
+- per client IP: every login attempt counts (credential stuffing from a host)
+- per email: failed attempts count (distributed guessing of one account);
+  a successful login clears it
+"""
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from . import metrics
+from .config import Config
+
+LOGIN_THROTTLED = metrics.counter(
+    "login_throttled_total",
+    "Login attempts rejected with 429 before password verification",
+    labelnames=("scope",),
+)
+LOGIN_FAILURES = metrics.counter(
+    "login_failures_total",
+    "Failed login attempts (unknown email or wrong password)",
+)
+
+
+class InMemoryWindowBackend:
+    """Process-local window counters, bounded to ``max_keys`` (LRU)"""
+
+    shared = False
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> [window index, current count, previous count]
+        self._counters: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _roll(self, key: str, index: int) -> list:
+        entry = self._counters.get(key)
+        if entry is None:
+            entry = self._counters[key] = [index, 0, 0]
+        elif entry[0] != index:
+            previous = entry[1] if entry[0] == index - 1 else 0
+            entry[:] = [index, 0, previous]
+        self._counters.move_to_end(key)
+        while len(self._counters) > self.max_keys:
+            self._counters.popitem(last=False)
+        return entry
+
+    def increment(self, key: str, index: int, window: float) -> Tuple[int, int]:
+        with self._lock:
+            entry = self._roll(key, index)
+            entry[1] += 1
+            return entry[1], entry[2]
+
+    def counts(self, key: str, index: int, window: float) -> Tuple[int, int]:
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None:
+                return 0, 0
+            entry = self._roll(key, index)
+            return entry[1], entry[2]
+
+    def delete(self, key: str, index: int):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+
+
+class RedisWindowBackend:
+    """Shared window counters over a redis-py compatible client"""
+
+    shared = True
+
+    def __init__(self, client, prefix: str = "user_service:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisWindowBackend":
+        import redis  # optional dependency
+
+        return cls(redis.Redis.from_url(url, decode_responses=True))
+
+    def _keys(self, key: str, index: int):
+        return f"{self.prefix}{key}:{index}", f"{self.prefix}{key}:{index - 1}"
+
+    def increment(self, key: str, index: int, window: float) -> Tuple[int, int]:
+        current_key, previous_key = self._keys(key, index)
+        current = int(self.client.incr(current_key))
+        if current == 1:
+            # Lives through the next window, where it is the "previous" count
+            self.client.expire(current_key, int(math.ceil(window * 2)))
+        return current, int(self.client.get(previous_key) or 0)
+
+    def counts(self, key: str, index: int, window: float) -> Tuple[int, int]:
+        current, previous = self.client.mget(self._keys(key, index))
+        return int(current or 0), int(previous or 0)
+
+    def delete(self, key: str, index: int):
+        self.client.delete(*self._keys(key, index))
+
+    def clear(self):
+        # Shared data is owned by every replica; nothing to do locally
+        pass
+
+
+class SlidingWindowLimiter:
+    """At most ``limit`` events per ``window`` seconds for each key"""
+
+    def __init__(self, backend, limit: int, window: float):
+        self.backend = backend
+        self.limit = limit
+        self.window = window
+
+    def _position(self, now: float) -> Tuple[int, float]:
+        index = int(now // self.window)
+        return index, (now - index * self.window) / self.window
+
+    def _retry_after(self, current: int, previous: int, elapsed: float) -> int:
+        """Seconds until the estimate drops below ``limit`` without new events"""
+        if current < self.limit:
+            # The previous window's weight has to decay
+            needed = 1 - (self.limit - current) / previous
+            wait = (needed - elapsed) * self.window
+        else:
+            # Wait for the next window, then for this window's weight to decay
+            wait = (1 - elapsed) * self.window + (1 - self.limit / current) * self.window
+        return max(1, int(math.ceil(wait)))
+
+    def _check(self, current: int, previous: int, elapsed: float) -> Optional[int]:
+        if previous * (1 - elapsed) + current <= self.limit:
+            return None
+        return self._retry_after(current, previous, elapsed)
+
+    def hit(self, key: str, now: Optional[float] = None) -> Optional[int]:
+        """Count one event; returns Retry-After seconds when over the limit"""
+        index, elapsed = self._position(time.time() if now is None else now)
+        current, previous = self.backend.increment(key, index, self.window)
+        return self._check(current, previous, elapsed)
+
+    def blocked(self, key: str, now: Optional[float] = None) -> Optional[int]:
+        """Like ``hit`` without counting: Retry-After if the key is at its limit"""
+        index, elapsed = self._position(time.time() if now is None else now)
+        current, previous = self.backend.counts(key, index, self.window)
+        # One more event would exceed the limit
+        return self._check(current + 1, previous, elapsed)
+
+    def reset(self, key: str, now: Optional[float] = None):
+        index, _ = self._position(time.time() if now is None else now)
+        self.backend.delete(key, index)
+
+
+class LoginThrottled(Exception):
+    """Raised when a login attempt must be rejected with 429"""
+
+    def __init__(self, retry_after: int, scope: str):
+        super().__init__(f"Too many login attempts ({scope})")
+        self.retry_after = retry_after
+        self.scope = scope
+
+
+def _email_key(email: str) -> str:
+    # Hashed so the shared store never holds addresses
+    return "email:" + hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()
+
+
+class LoginThrottle:
+    """
+    Per-IP and per-email login limits
+
+    Call ``check`` before looking up the user or hashing anything, then
+    ``record_failure`` / ``record_success`` with the outcome.
+    """
+
+    def __init__(self, ip_limiter: Optional[SlidingWindowLimiter], email_limiter: Optional[SlidingWindowLimiter]):
+        self.ip_limiter = ip_limiter
+        self.email_limiter = email_limiter
+
+    @property
+    def shared(self) -> bool:
+        """True when checks do network I/O (run them off the event loop)"""
+        limiters = (self.ip_limiter, self.email_limiter)
+        return any(limiter is not None and limiter.backend.shared for limiter in limiters)
+
+    def check(self, ip: Optional[str], email: str):
+        """Count the attempt for ``ip`` and raise LoginThrottled if over a limit"""
+        if self.email_limiter is not None:
+            retry_after = self.email_limiter.blocked(_email_key(email))
+            if retry_after is not None:
+                LOGIN_THROTTLED.inc(scope="email")
+                raise LoginThrottled(retry_after, "email")
+        if self.ip_limiter is not None and ip:
+            retry_after = self.ip_limiter.hit(f"ip:{ip}")
+            if retry_after is not None:
+                LOGIN_THROTTLED.inc(scope="ip")
+                raise LoginThrottled(retry_after, "ip")
+
+    def record_failure(self, email: str):
+        LOGIN_FAILURES.inc()
+        if self.email_limiter is not None:
+            self.email_limiter.hit(_email_key(email))
+
+    def record_success(self, email: str):
+        if self.email_limiter is not None:
+            self.email_limiter.reset(_email_key(email))
+
+
+def _build_login_throttle() -> LoginThrottle:
+    config = Config()
+    if config.LOGIN_RATE_LIMIT_BACKEND == "none":
+        return LoginThrottle(None, None)
+    if config.LOGIN_RATE_LIMIT_BACKEND == "redis":
+        backend = RedisWindowBackend.from_url(config.LOGIN_RATE_LIMIT_REDIS_URL)
+    elif config.LOGIN_RATE_LIMIT_BACKEND == "memory":
+        backend = InMemoryWindowBackend()
+    else:
+        raise ValueError(f"Unknown LOGIN_RATE_LIMIT_BACKEND: {config.LOGIN_RATE_LIMIT_BACKEND}")
+    return LoginThrottle(
+        SlidingWindowLimiter(backend, config.LOGIN_IP_MAX_ATTEMPTS, config.LOGIN_IP_WINDOW),
+        SlidingWindowLimiter(backend, config.LOGIN_EMAIL_MAX_FAILURES, config.LOGIN_EMAIL_WINDOW),
+    )
+
+
+# Singleton throttle shared by the login routes
+login_throttle = _build_login_throttle()
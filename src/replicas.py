@@ -0,0 +1,292 @@
+# src/replicas.py
+"""
+Read-replica routing for the read-only connections (database.get_read_db).
+
+With DATABASE_READ_URLS set, each read picks a replica:
+
+- "round_robin":  rotate through the healthy replicas (default)
+- "least_loaded": the healthy replica with the fewest connections in use
+
+A replica that fails to connect is taken out of rotation for
+DB_REPLICA_RETRY_INTERVAL seconds, then probed with ``SELECT 1`` before it
+serves reads again. With no healthy replica, reads go to the primary.
+
+Read-your-writes: after a write, reads carrying the same key (the written
+user id, or the client that wrote) go to the primary for
+DB_READ_YOUR_WRITES_WINDOW seconds, which covers typical replication lag.
+The pins live in a store selected by DB_READ_YOUR_WRITES_BACKEND:
+
+- "memory": per process (default); only right with a single worker, since a
+            write on one worker does not pin reads served by the others
+- "redis":  shared Redis-compatible store (DB_READ_YOUR_WRITES_REDIS_URL),
+            one key per pin expiring with the window; needs the optional
+            ``redis`` package. If Redis fails, reads go to the primary.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import OperationalError
+
+from . import metrics
+from .db_pool import pool_options
+
+logger = logging.getLogger(__name__)
+
+READS_ROUTED = metrics.counter(
+    "db_reads_routed_total",
+    "Read-only connections by target (replica name or primary) and reason",
+    labelnames=("target", "reason"),
+)
+REPLICA_HEALTHY = metrics.gauge("db_replica_healthy", "1 when the replica is in rotation", labelnames=("replica",))
+
+STRATEGIES = ("round_robin", "least_loaded")
+
+
+class InMemoryPinStore:
+    """Process-local pins: key -> monotonic time until which it stays on the primary"""
+
+    shared = False
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic, max_pins: int = 100000):
+        self.clock = clock
+        self.max_pins = max_pins
+        self._pins: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pin(self, keys: Iterable[str], window: float):
+        until = self.clock() + window
+        with self._lock:
+            for key in keys:
+                self._pins[key] = until
+                self._pins.move_to_end(key)
+            while len(self._pins) > self.max_pins:
+                self._pins.popitem(last=False)
+
+    def pinned(self, keys: Iterable[str]) -> bool:
+        now = self.clock()
+        with self._lock:
+            for key in keys:
+                until = self._pins.get(key)
+                if until is None:
+                    continue
+                if until > now:
+                    return True
+                del self._pins[key]
+        return False
+
+
+class RedisPinStore:
+    """Pins shared by every worker and replica over a redis-py compatible client"""
+
+    shared = True
+
+    def __init__(self, client, prefix: str = "user_service:pin:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisPinStore":
+        import redis  # optional dependency
+
+        return cls(redis.Redis.from_url(url, decode_responses=True))
+
+    def pin(self, keys: Iterable[str], window: float):
+        try:
+            for key in keys:
+                self.client.set(self.prefix + key, "1", px=max(1, int(window * 1000)))
+        except Exception as e:
+            logger.warning(f"Could not record read-your-writes pin: {e}")
+
+    def pinned(self, keys: Iterable[str]) -> bool:
+        names = [self.prefix + key for key in keys]
+        if not names:
+            return False
+        try:
+            return any(value is not None for value in self.client.mget(names))
+        except Exception as e:
+            # The primary is always up to date
+            logger.warning(f"Could not read read-your-writes pins: {e}")
+            return True
+
+
+class Replica:
+    """One read replica: lazily created engine, load and health state"""
+
+    def __init__(self, name: str, url: str, engine_factory: Callable[[str], Engine]):
+        self.name = name
+        self.url = url
+        self._engine_factory = engine_factory
+        self._engine: Optional[Engine] = None
+        self.in_flight = 0
+        self.healthy = True
+        self.down_until = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            self._engine = self._engine_factory(self.url)
+        return self._engine
+
+    def dispose(self):
+        if self._engine is not None:
+            self._engine.dispose()
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "url": make_url(self.url).render_as_string(hide_password=True),
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "last_error": self.last_error,
+        }
+
+
+def _default_engine_factory(url: str) -> Engine:
+    return create_engine(url, **pool_options(url))
+
+
+class ReplicaRouter:
+    """Chooses the engine for each read-only connection"""
+
+    def __init__(
+        self,
+        primary: Callable[[], Engine],
+        urls: Iterable[str],
+        strategy: str = "round_robin",
+        retry_interval: float = 30.0,
+        read_your_writes_window: float = 5.0,
+        engine_factory: Callable[[str], Engine] = _default_engine_factory,
+        clock: Callable[[], float] = time.monotonic,
+        max_pins: int = 100000,
+        pin_store=None,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown DB_READ_STRATEGY: {strategy}")
+        self.primary = primary
+        self.replicas: List[Replica] = [
+            Replica(f"replica{i}", url, engine_factory) for i, url in enumerate(urls)
+        ]
+        self.strategy = strategy
+        self.retry_interval = retry_interval
+        self.read_your_writes_window = read_your_writes_window
+        self.clock = clock
+        self.pin_store = pin_store if pin_store is not None else InMemoryPinStore(clock, max_pins)
+        self._rotation = itertools.count()
+        self._lock = threading.Lock()
+        for replica in self.replicas:
+            REPLICA_HEALTHY.set(1, replica=replica.name)
+
+    # --- read-your-writes ---
+
+    def note_write(self, *keys: str):
+        """Pin reads for ``keys`` to the primary for the read-your-writes window"""
+        if not self.replicas or self.read_your_writes_window <= 0:
+            return
+        self.pin_store.pin(keys, self.read_your_writes_window)
+
+    def pinned(self, keys: Iterable[str]) -> bool:
+        return self.pin_store.pinned(list(keys))
+
+    # --- replica selection ---
+
+    def _candidates(self, now: float) -> List[Replica]:
+        return [replica for replica in self.replicas if replica.healthy or replica.down_until <= now]
+
+    def _order(self, candidates: List[Replica]) -> List[Replica]:
+        """Candidates in the order they should be tried"""
+        offset = next(self._rotation) % len(candidates)
+        rotated = candidates[offset:] + candidates[:offset]
+        if self.strategy == "least_loaded":
+            # Stable sort: equally loaded replicas keep the round-robin order
+            rotated.sort(key=lambda replica: replica.in_flight)
+        return rotated
+
+    def mark_down(self, replica: Replica, error: Exception):
+        with self._lock:
+            if replica.healthy:
+                logger.warning("Read replica out of rotation", extra={"replica": replica.name, "error": str(error)})
+            replica.healthy = False
+            replica.down_until = self.clock() + self.retry_interval
+            replica.last_error = str(error)
+        REPLICA_HEALTHY.set(0, replica=replica.name)
+
+    def _mark_up(self, replica: Replica):
+        with self._lock:
+            was_down = not replica.healthy
+            replica.healthy = True
+            replica.last_error = None
+        if was_down:
+            logger.info("Read replica back in rotation", extra={"replica": replica.name})
+        REPLICA_HEALTHY.set(1, replica=replica.name)
+
+    def _connect_replica(self, replica: Replica):
+        conn = replica.engine.connect()
+        if not replica.healthy:
+            # Retry interval elapsed: probe before serving reads again
+            try:
+                conn.execute(text("SELECT 1"))
+                conn.rollback()
+            except Exception:
+                conn.close()
+                raise
+            self._mark_up(replica)
+        return conn
+
+    def check_replicas(self) -> List[dict]:
+        """Probe every replica now (ignoring the retry interval) and return their status"""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            except OperationalError as exc:
+                self.mark_down(replica, exc)
+            else:
+                self._mark_up(replica)
+        return self.status()
+
+    @contextmanager
+    def connect(self, keys: Iterable[str] = ()):
+        """Yield a Connection to a replica, or to the primary when pinned or none is healthy"""
+        if not self.replicas:
+            reason = "no_replicas"
+        elif self.pinned(keys):
+            reason = "read_your_writes"
+        else:
+            reason = "no_healthy_replica"
+            for replica in self._order(self._candidates(self.clock())):
+                try:
+                    conn = self._connect_replica(replica)
+                except OperationalError as exc:
+                    self.mark_down(replica, exc)
+                    continue
+                READS_ROUTED.inc(target=replica.name, reason="replica")
+                with self._lock:
+                    replica.in_flight += 1
+                try:
+                    with conn:
+                        yield conn
+                finally:
+                    with self._lock:
+                        replica.in_flight -= 1
+                return
+
+        READS_ROUTED.inc(target="primary", reason=reason)
+        with self.primary().connect() as conn:
+            yield conn
+
+    def status(self) -> List[dict]:
+        return [replica.status() for replica in self.replicas]
+
+    def dispose(self):
+        for replica in self.replicas:
+            replica.dispose()
@@ -0,0 +1,21 @@
+# src/routes/internal_routes.py
+"""
+Internal operational endpoints (not exposed through the API Gateway).
+"""
+from fastapi import APIRouter
+from src.database import get_engine, get_replica_router
+from src.db_pool import pool_status
+
+router = APIRouter(tags=["Internal"])
+
+# GET estado del pool de conexiones
+@router.get("/pool")
+def get_pool_status():
+    return pool_status(get_engine())
+
+# GET estado de las réplicas de lectura (?check=true las prueba ahora)
+@router.get("/replicas")
+def get_replicas_status(check: bool = False):
+    replica_router = get_replica_router()
+    replicas = replica_router.check_replicas() if check else replica_router.status()
+    return {"strategy": replica_router.strategy, "replicas": replicas}
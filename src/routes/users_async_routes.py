@@ -0,0 +1,171 @@
+# src/routes/users_async_routes.py
+"""
+Async versions of the user CRUD routes, backed by AsyncSession.
+
+Mounted by app.py ahead of the sync router when USE_ASYNC_DB=true, so these
+handlers take over the CRUD paths while every other endpoint keeps coming
+from users_routes. Ids use the :int converter so that literal paths of the
+sync router (/users/batch, ...) are not swallowed by /{user_id}. Handlers
+never touch the threadpool: DB I/O is awaited on the event loop and bcrypt
+runs on password_hasher.
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from src import changes, crud, crud_async, schemas
+from src.database import get_async_db, get_async_sessionmaker
+from src.etags import collection_etag, if_none_match, user_etag
+from src.password_hashing import PasswordHasherBusy, password_hasher
+from src.rate_limit import LoginThrottled, login_throttle
+from src.serializers import TrustedJSONResponse, dumps, user_out
+from src.routes.users_routes import (
+    INVALID_CREDENTIALS,
+    _hashing_unavailable,
+    _run_throttle,
+    _too_many_attempts,
+    client_ip,
+    config,
+)
+
+router = APIRouter(tags=["Users"])
+
+async def _stream_users_ndjson(after: int, limit: Optional[int], active: Optional[bool] = None):
+    async with get_async_sessionmaker()() as db:
+        async for row in crud_async.iter_user_rows(db, after, config.USERS_STREAM_BATCH_SIZE, limit, active):
+            yield dumps(user_out.one(row)) + b"\n"
+
+# POST crear usuario
+@router.post("/register")
+async def register_async(user_data: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    """Register endpoint that accepts JSON"""
+    if await crud_async.get_user_by_email(db, user_data.email):
+        raise HTTPException(status_code=400, detail="El usuario ya existe")
+
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except PasswordHasherBusy as exc:
+        raise _hashing_unavailable(exc)
+    new_user = await crud_async.create_user(db, user_data, hashed_password)
+
+    return {"message": f"Usuario {new_user.email} registrado con éxito", "id": new_user.id}
+
+@router.post("/login")
+async def login_async(credentials: schemas.UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Login endpoint that accepts JSON credentials"""
+    # El límite se comprueba antes de tocar la BD o bcrypt
+    try:
+        await _run_throttle(login_throttle.check, client_ip(request), credentials.email)
+    except LoginThrottled as exc:
+        raise _too_many_attempts(exc)
+
+    user = await crud_async.get_user_by_email(db, credentials.email)
+    new_hash = None
+    try:
+        if user:
+            valid, new_hash = await password_hasher.verify_and_update(credentials.password, user.hashed_password)
+        else:
+            # Misma duración que una contraseña incorrecta: no revela si el email existe
+            valid = await password_hasher.verify_dummy(credentials.password)
+    except PasswordHasherBusy as exc:
+        raise _hashing_unavailable(exc)
+    if not valid:
+        await _run_throttle(login_throttle.record_failure, credentials.email)
+        raise HTTPException(status_code=400, detail=INVALID_CREDENTIALS)
+
+    await _run_throttle(login_throttle.record_success, credentials.email)
+    if new_hash:
+        # Hash con coste/esquema antiguo (o texto plano): se actualiza de forma transparente
+        await crud_async.update_password_hash(db, user.id, new_hash)
+    return {"message": f"Bienvenido {user.full_name or user.email}", "id": user.id}
+
+# GET todos los usuarios (paginado por cursor sobre User.id)
+@router.get("/", response_model=list[schemas.UserOut])
+async def get_users_async(
+    request: Request,
+    after: int = Query(0, ge=0, description="Cursor: devuelve usuarios con id > after"),
+    limit: Optional[int] = Query(None, ge=1, le=config.USERS_PAGE_MAX_LIMIT),
+    active: Optional[bool] = Query(None, description="Solo usuarios activos (true) o inactivos (false)"),
+    stream: bool = Query(False, description="Transmitir todos los usuarios como NDJSON"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Lista usuarios ordenados por id (ver users_routes.get_users)"""
+    if stream:
+        return StreamingResponse(
+            _stream_users_ndjson(after, limit, active), media_type="application/x-ndjson"
+        )
+
+    page_limit = limit or config.USERS_PAGE_DEFAULT_LIMIT
+    versions = await crud_async.get_users_page_versions(db, after, page_limit, active)
+    etag = collection_etag(versions, after, page_limit, active)
+    if if_none_match(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    users, next_cursor = await crud_async.get_users_page(db, after, page_limit, active)
+    headers = {"ETag": etag}
+    if next_cursor is not None:
+        next_url = request.url.include_query_params(after=next_cursor)
+        headers["X-Next-Cursor"] = str(next_cursor)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return TrustedJSONResponse(user_out.many(users), headers=headers)
+
+# GET usuario por id
+@router.get("/{user_id:int}", response_model=schemas.UserOut)
+async def get_user_async(user_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    db_user = await crud_async.get_user_out(db, user_id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    etag = user_etag(user_id, db_user["version"])
+    if if_none_match(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return TrustedJSONResponse(user_out.one(db_user), headers={"ETag": etag})
+
+# PUT actualizar usuario
+@router.put("/{user_id:int}", response_model=schemas.UserOut)
+async def update_user_async(user_id: int, user: schemas.UserUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await crud_async.get_user(db, user_id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    if user.full_name:
+        db_user.full_name = user.full_name
+    if user.password:
+        try:
+            db_user.hashed_password = await password_hasher.hash(user.password)
+        except PasswordHasherBusy as exc:
+            raise _hashing_unavailable(exc)
+    if db.is_modified(db_user):
+        crud.record_change(db, user_id, changes.UPDATED)
+    await db.commit()
+    crud.invalidate_user(user_id)
+    await db.refresh(db_user)
+    return db_user
+
+# DELETE /users/{user_id}?hard=<bool>
+@router.delete("/{user_id:int}", status_code=status.HTTP_200_OK)
+async def delete_user_async(user_id: int, hard: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """
+    Elimina un usuario.
+    - Por defecto hace *soft delete* (marca is_active=False).
+    - Si se llama con ?hard=true se borra físicamente de la tabla (hard delete).
+    """
+    user = await crud_async.get_user(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if hard:
+        await db.delete(user)
+        crud.record_change(db, user_id, changes.DELETED)
+        await db.commit()
+        crud.invalidate_user(user_id)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    # Soft delete
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="User already inactive")
+    user.is_active = False
+    crud.record_change(db, user_id, changes.DEACTIVATED)
+    await db.commit()
+    crud.invalidate_user(user_id)
+    await db.refresh(user)
+    return {"message": f"User {user.email} deactivated", "id": user.id}
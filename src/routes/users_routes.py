@@ -1,75 +1,455 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Form
+import json
+import time
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Form, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from src import models, schemas
-from src.database import get_db
-import bcrypt
+from src import changes, crud, models, schemas
+from src.config import Config
+from src.database import get_db, get_read_db, read_only_connection
+from src.etags import collection_etag, if_none_match, user_etag
 from src.models import User
+from src.rate_limit import LoginThrottled, login_throttle
+from src.serializers import TrustedJSONResponse, dashboard_out, dumps, user_out
+from src.password_hashing import (
+    PasswordHasherBusy,
+    check_password,
+    hash_password,
+    password_hasher,
+)
 
 router = APIRouter(tags=["Users"])
+config = Config()
 
 def get_password_hash(password: str) -> str:
-    # Convert password to bytes and hash with bcrypt
-    password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
-    return hashed.decode('utf-8')
+    # Blocking helper kept for scripts; routes go through password_hasher
+    return hash_password(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    # Convert passwords to bytes for bcrypt verification
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    # Blocking helper kept for scripts; routes go through password_hasher
+    return check_password(plain_password, hashed_password)
+
+def _hashing_unavailable(exc: PasswordHasherBusy) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Servicio ocupado, intente de nuevo más tarde",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Mismo mensaje para email desconocido y contraseña incorrecta
+INVALID_CREDENTIALS = "Email o contraseña incorrectos"
+
+def client_ip(request: Request) -> Optional[str]:
+    """Client address; behind FORWARDED_ALLOW_IPS proxies it is already the
+    address the gateway appended to X-Forwarded-For (see app.py)"""
+    return request.client.host if request.client else None
+
+async def _run_throttle(func, *args):
+    # The shared (Redis) backend does network I/O: keep it off the event loop
+    if login_throttle.shared:
+        return await run_in_threadpool(func, *args)
+    return func(*args)
+
+def _too_many_attempts(exc: LoginThrottled) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Demasiados intentos de inicio de sesión, intente de nuevo más tarde",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 # POST crear usuario
+# Async handlers: bcrypt runs on password_hasher and only the DB calls use the
+# shared threadpool, so a login burst cannot starve the other endpoints.
 @router.post("/register")
-def register(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
     """Register endpoint that accepts JSON"""
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await run_in_threadpool(crud.get_user_by_email, db, user_data.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="El usuario ya existe")
 
-    hashed_password = get_password_hash(user_data.password)
-    new_user = User(email=user_data.email, hashed_password=hashed_password, full_name=user_data.full_name)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except PasswordHasherBusy as exc:
+        raise _hashing_unavailable(exc)
+    new_user = await run_in_threadpool(crud.create_user, db, user_data, hashed_password)
 
     return {"message": f"Usuario {new_user.email} registrado con éxito", "id": new_user.id}
 
 @router.post("/login")
-def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: schemas.UserLogin, request: Request, db: Session = Depends(get_db)):
     """Login endpoint that accepts JSON credentials"""
-    user = db.query(User).filter(User.email == credentials.email).first()
-    if not user:
-        raise HTTPException(status_code=400, detail="Usuario no encontrado")
+    # El límite se comprueba antes de tocar la BD o bcrypt
+    try:
+        await _run_throttle(login_throttle.check, client_ip(request), credentials.email)
+    except LoginThrottled as exc:
+        raise _too_many_attempts(exc)
 
-    if not verify_password(credentials.password, user.hashed_password):
-        raise HTTPException(status_code=400, detail="Contraseña incorrecta")
+    user = await run_in_threadpool(crud.get_user_by_email, db, credentials.email)
+    new_hash = None
+    try:
+        if user:
+            valid, new_hash = await password_hasher.verify_and_update(credentials.password, user.hashed_password)
+        else:
+            # Misma duración que una contraseña incorrecta: no revela si el email existe
+            valid = await password_hasher.verify_dummy(credentials.password)
+    except PasswordHasherBusy as exc:
+        raise _hashing_unavailable(exc)
+    if not valid:
+        await _run_throttle(login_throttle.record_failure, credentials.email)
+        raise HTTPException(status_code=400, detail=INVALID_CREDENTIALS)
 
+    await _run_throttle(login_throttle.record_success, credentials.email)
+    if new_hash:
+        # Hash con coste/esquema antiguo: se actualiza de forma transparente
+        await run_in_threadpool(crud.update_password_hash, db, user.id, new_hash)
     return {"message": f"Bienvenido {user.full_name or user.email}", "id": user.id}
 
-# GET todos los usuarios
+def _too_many_rows() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Máximo {config.BULK_IMPORT_MAX_ROWS} usuarios por importación",
+    )
+
+async def _iter_bulk_rows(request: Request):
+    """Yield raw rows from a JSON array body or, incrementally, an NDJSON body"""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+
+    try:
+        data = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="El cuerpo debe ser un arreglo JSON o NDJSON")
+    if not isinstance(data, list):
+        raise HTTPException(status_code=400, detail="El cuerpo debe ser un arreglo JSON o NDJSON")
+    if len(data) > config.BULK_IMPORT_MAX_ROWS:
+        raise _too_many_rows()
+    for item in data:
+        yield item
+
+def _parse_bulk_row(raw):
+    """Return (UserCreate, None) or (None, error message)"""
+    try:
+        if isinstance(raw, (bytes, str)):
+            raw = json.loads(raw)
+        if not isinstance(raw, dict):
+            return None, "Cada fila debe ser un objeto JSON"
+        return schemas.UserCreate(**raw), None
+    except ValidationError as exc:
+        return None, "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+        )
+    except ValueError:
+        return None, "JSON inválido"
+
+def _insert_bulk_chunk(db: Session, rows):
+    """Insert a chunk; on a race with a concurrent register, drop the new duplicates and retry once"""
+    try:
+        return crud.bulk_insert_users(db, rows), set()
+    except IntegrityError:
+        db.rollback()
+        taken = crud.get_existing_emails(db, [row["email"] for row in rows])
+        remaining = [row for row in rows if row["email"].lower() not in taken]
+        return crud.bulk_insert_users(db, remaining), taken
+
+async def _import_chunk(db: Session, chunk, seen_emails, results):
+    """Validate, de-duplicate, hash and insert one chunk of (index, raw row)"""
+    candidates = []
+    for index, raw in chunk:
+        user, error = _parse_bulk_row(raw)
+        if error is not None:
+            results.append(schemas.BulkImportRowResult(index=index, status="invalid", error=error))
+            continue
+        # Emails are unique case-insensitively, as in register and login
+        if user.email.lower() in seen_emails:
+            results.append(schemas.BulkImportRowResult(index=index, email=user.email, status="duplicate"))
+            continue
+        seen_emails.add(user.email.lower())
+        candidates.append((index, user))
+
+    existing = await run_in_threadpool(crud.get_existing_emails, db, [u.email for _, u in candidates])
+    new_users = []
+    for index, user in candidates:
+        if user.email.lower() in existing:
+            results.append(schemas.BulkImportRowResult(index=index, email=user.email, status="duplicate"))
+        else:
+            new_users.append((index, user))
+
+    hashes = await password_hasher.hash_many([user.password for _, user in new_users])
+    rows = [
+        {"email": user.email, "hashed_password": hashed, "full_name": user.full_name}
+        for (_, user), hashed in zip(new_users, hashes)
+    ]
+    ids, taken = await run_in_threadpool(_insert_bulk_chunk, db, rows)
+    for index, user in new_users:
+        if user.email.lower() in taken:
+            results.append(schemas.BulkImportRowResult(index=index, email=user.email, status="duplicate"))
+        else:
+            results.append(
+                schemas.BulkImportRowResult(index=index, email=user.email, status="created", id=ids.get(user.email))
+            )
+
+# POST importación masiva de usuarios
+@router.post("/bulk", response_model=schemas.BulkImportOut)
+async def bulk_import(request: Request, db: Session = Depends(get_db)):
+    """
+    Importa usuarios en lote desde un arreglo JSON o un flujo NDJSON
+    (Content-Type: application/x-ndjson) de UserCreate.
+
+    Cada bloque de BULK_IMPORT_CHUNK_SIZE filas se valida, se compara contra
+    la BD con una sola consulta IN, se hashea en paralelo y se inserta con un
+    executemany en su propia transacción. Devuelve el resultado por fila.
+
+    Más de BULK_IMPORT_MAX_ROWS filas responde 413 y deja de leer el cuerpo.
+    Un arreglo JSON se rechaza antes de importar nada; en NDJSON los bloques
+    anteriores ya están confirmados y, al reintentar, salen como duplicados.
+    """
+    results = []
+    seen_emails = set()
+    chunk = []
+    index = -1
+    async for raw in _iter_bulk_rows(request):
+        index += 1
+        if index >= config.BULK_IMPORT_MAX_ROWS:
+            raise _too_many_rows()
+        chunk.append((index, raw))
+        if len(chunk) >= config.BULK_IMPORT_CHUNK_SIZE:
+            await _import_chunk(db, chunk, seen_emails, results)
+            chunk = []
+    if chunk:
+        await _import_chunk(db, chunk, seen_emails, results)
+
+    results.sort(key=lambda result: result.index)
+    counts = {"created": 0, "duplicate": 0, "invalid": 0}
+    for result in results:
+        counts[result.status] += 1
+    return schemas.BulkImportOut(
+        created=counts["created"],
+        duplicates=counts["duplicate"],
+        invalid=counts["invalid"],
+        results=results,
+    )
+
+def _stream_users_ndjson(after: int, limit: Optional[int], active: Optional[bool] = None):
+    # Own connection: the response body is produced after the route returns,
+    # so it must not depend on the request-scoped get_read_db connection.
+    with read_only_connection() as db:
+        for row in crud.iter_user_rows(db, after, config.USERS_STREAM_BATCH_SIZE, limit, active):
+            yield dumps(user_out.one(row)) + b"\n"
+
+# GET todos los usuarios (paginado por cursor sobre User.id)
 @router.get("/", response_model=list[schemas.UserOut])
-def get_users(db: Session = Depends(get_db)):
-    return db.query(models.User).all()
+def get_users(
+    request: Request,
+    after: int = Query(0, ge=0, description="Cursor: devuelve usuarios con id > after"),
+    limit: Optional[int] = Query(None, ge=1, le=config.USERS_PAGE_MAX_LIMIT),
+    active: Optional[bool] = Query(None, description="Solo usuarios activos (true) o inactivos (false)"),
+    stream: bool = Query(False, description="Transmitir todos los usuarios como NDJSON"),
+    db: Connection = Depends(get_read_db),
+):
+    """
+    Lista usuarios ordenados por id.
+
+    - Paginado: ?after=<cursor>&limit=<n>. Si hay más resultados la respuesta
+      incluye el siguiente cursor en X-Next-Cursor y un Link rel="next".
+    - ?stream=true devuelve application/x-ndjson fila a fila con memoria
+      constante (sin límite salvo que se pase limit).
+    - ?active=true|false filtra por is_active (índice (is_active, id)).
+    - Cada página lleva un ETag débil; con If-None-Match coincidente se
+      responde 304 sin cargar ni serializar los usuarios.
+    - Las filas vienen de nuestra BD: se serializan sin volver a validarlas
+      (ver src/serializers.py).
+    """
+    if stream:
+        return StreamingResponse(
+            _stream_users_ndjson(after, limit, active), media_type="application/x-ndjson"
+        )
+
+    page_limit = limit or config.USERS_PAGE_DEFAULT_LIMIT
+    versions = crud.get_users_page_versions(db, after, page_limit, active)
+    etag = collection_etag(versions, after, page_limit, active)
+    if if_none_match(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    users, next_cursor = crud.get_users_page(db, after, page_limit, active)
+    headers = {"ETag": etag}
+    if next_cursor is not None:
+        next_url = request.url.include_query_params(after=next_cursor)
+        headers["X-Next-Cursor"] = str(next_cursor)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return TrustedJSONResponse(user_out.many(users), headers=headers)
+
+def _lookup_batch(db: Connection, ids: List[int]):
+    unique_ids = list(dict.fromkeys(ids))
+    if len(unique_ids) > config.USERS_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"Máximo {config.USERS_BATCH_MAX_IDS} ids por solicitud"
+        )
+    found = crud.get_users_by_ids(db, unique_ids)
+    return TrustedJSONResponse({
+        "users": [user_out.one(found[user_id]) for user_id in unique_ids if user_id in found],
+        "missing": [user_id for user_id in unique_ids if user_id not in found],
+    })
+
+# GET varios usuarios por id: /users/batch?ids=1,2,3 (debe ir antes de /{user_id})
+@router.get("/batch", response_model=schemas.UserBatchOut)
+def get_users_batch(
+    ids: List[str] = Query(..., description="Ids separados por comas o repetidos (?ids=1&ids=2)"),
+    db: Connection = Depends(get_read_db),
+):
+    """
+    Devuelve los usuarios pedidos con una sola consulta IN, en el orden de la
+    solicitud (sin duplicados), y la lista de ids que no existen.
+    """
+    try:
+        parsed = [int(part) for value in ids for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids debe contener solo enteros")
+    return _lookup_batch(db, parsed)
+
+# POST variante con cuerpo para listas largas
+@router.post("/batch", response_model=schemas.UserBatchOut)
+def post_users_batch(request: schemas.UserBatchRequest, db: Connection = Depends(get_read_db)):
+    return _lookup_batch(db, request.ids)
+
+# GET búsqueda por prefijo de email o nombre (autocompletado; antes de /{user_id})
+@router.get("/search", response_model=list[schemas.UserOut])
+def search_users(
+    q: str = Query(..., min_length=1, max_length=255, description="Prefijo de email o nombre"),
+    limit: Optional[int] = Query(None, ge=1, le=config.USERS_SEARCH_MAX_LIMIT),
+    db: Connection = Depends(get_read_db),
+):
+    """
+    Usuarios activos cuyo email o nombre completo empieza por q (sin
+    distinguir mayúsculas), ordenados por relevancia: coincidencias exactas,
+    luego email antes que nombre y valores más cortos primero.
+    """
+    users = crud.search_users(db, q, limit or config.USERS_SEARCH_DEFAULT_LIMIT)
+    return TrustedJSONResponse(user_out.many(users))
+
+def _read_changes(since: int, limit: int):
+    # Own short-lived connection per poll: long-poll and SSE must not hold one while waiting
+    with read_only_connection() as db:
+        return crud.get_user_changes(db, since, limit, config.CHANGES_GAP_GRACE)
+
+async def _stream_changes_sse(request: Request, since: int, limit: int, duration: float):
+    yield b"retry: 1000\n\n"
+    deadline = time.monotonic() + duration
+    last_write = time.monotonic()
+    while time.monotonic() < deadline and not await request.is_disconnected():
+        generation = changes.change_notifier.generation
+        entries, has_more = await run_in_threadpool(_read_changes, since, limit)
+        for entry in entries:
+            yield b"id: %d\nevent: change\ndata: %s\n\n" % (entry["seq"], dumps(entry))
+        if entries:
+            since = entries[-1]["seq"]
+            last_write = time.monotonic()
+            if has_more:
+                continue
+        if time.monotonic() - last_write >= config.CHANGES_SSE_HEARTBEAT:
+            yield b": keep-alive\n\n"
+            last_write = time.monotonic()
+        timeout = min(config.CHANGES_POLL_INTERVAL, max(0.0, deadline - time.monotonic()))
+        await changes.change_notifier.wait(generation, timeout)
+
+# GET feed de cambios de usuarios (antes de /{user_id})
+@router.get("/changes", response_model=schemas.UserChangesOut)
+async def get_user_changes(
+    request: Request,
+    since: int = Query(0, ge=0, description="Devuelve cambios con seq > since (0 = desde el principio)"),
+    limit: Optional[int] = Query(None, ge=1, le=config.CHANGES_MAX_LIMIT),
+    wait: float = Query(0, ge=0, le=config.CHANGES_MAX_WAIT, description="Long-poll: segundos esperando si no hay cambios"),
+    stream: bool = Query(False, description="Server-Sent Events (también con Accept: text/event-stream)"),
+):
+    """
+    Feed de cambios de usuarios (outbox transaccional, ver src/changes.py).
+
+    - Cada entrada lleva su seq monótono, la operación (created, updated,
+      deactivated, deleted) y el estado actual del usuario (null si ya no
+      existe). Seguir con ?since=<next_since>; has_more indica que hay más.
+    - ?since=0 recorre el log compactado: una copia de todos los usuarios.
+    - ?wait=<s> (long-poll): si no hay cambios espera hasta s segundos.
+    - SSE (?stream=true o Accept: text/event-stream): un evento por cambio con
+      id = seq; al reconectar se continúa desde Last-Event-ID. La conexión se
+      cierra tras wait segundos (CHANGES_SSE_MAX_DURATION por defecto).
+    """
+    page_limit = limit or config.CHANGES_DEFAULT_LIMIT
+    if stream or "text/event-stream" in request.headers.get("accept", ""):
+        last_event_id = request.headers.get("last-event-id", "")
+        if last_event_id.isdigit():
+            since = max(since, int(last_event_id))
+        return StreamingResponse(
+            _stream_changes_sse(request, since, page_limit, wait or config.CHANGES_SSE_MAX_DURATION),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    deadline = time.monotonic() + wait
+    while True:
+        generation = changes.change_notifier.generation
+        entries, has_more = await run_in_threadpool(_read_changes, since, page_limit)
+        remaining = deadline - time.monotonic()
+        if entries or remaining <= 0:
+            break
+        await changes.change_notifier.wait(generation, min(remaining, config.CHANGES_POLL_INTERVAL))
+    return TrustedJSONResponse({
+        "changes": entries,
+        "next_since": entries[-1]["seq"] if entries else since,
+        "has_more": has_more,
+    })
 
 # GET usuario por id
 @router.get("/{user_id}", response_model=schemas.UserOut)
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+def get_user(user_id: int, request: Request, db: Connection = Depends(get_read_db)):
+    db_user = crud.get_user(db, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    return db_user
+    etag = user_etag(user_id, db_user["version"])
+    if if_none_match(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return TrustedJSONResponse(user_out.one(db_user), headers={"ETag": etag})
 
 # PUT actualizar usuario
 @router.put("/{user_id}", response_model=schemas.UserOut)
-def update_user(user_id: int, user: schemas.UserUpdate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+async def update_user(user_id: int, user: schemas.UserUpdate, db: Session = Depends(get_db)):
+    # Async como register: la contraseña se hashea en password_hasher
+    hashed_password = None
+    if user.password:
+        try:
+            hashed_password = await password_hasher.hash(user.password)
+        except PasswordHasherBusy as exc:
+            raise _hashing_unavailable(exc)
+    db_user = await run_in_threadpool(_apply_user_update, db, user_id, user.full_name, hashed_password)
     if not db_user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    if user.full_name:
-        db_user.full_name = user.full_name
-    if user.password:
-        db_user.hashed_password = user.password
+    return db_user
+
+def _apply_user_update(db: Session, user_id: int, full_name: Optional[str], hashed_password: Optional[str]):
+    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not db_user:
+        return None
+    if full_name:
+        db_user.full_name = full_name
+    if hashed_password:
+        db_user.hashed_password = hashed_password
+    if db.is_modified(db_user):
+        crud.record_change(db, user_id, changes.UPDATED)
     db.commit()
+    crud.invalidate_user(user_id)
     db.refresh(db_user)
     return db_user
 
@@ -87,7 +467,9 @@ def delete_user(user_id: int, hard: bool = False, db: Session = Depends(get_db))
 
     if hard:
         db.delete(user)
+        crud.record_change(db, user_id, changes.DELETED)
         db.commit()
+        crud.invalidate_user(user_id)
         # 204 No Content suele usarse para borrados, pero devolvemos 200/204 según preferencia.
         return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -97,7 +479,9 @@ def delete_user(user_id: int, hard: bool = False, db: Session = Depends(get_db))
         raise HTTPException(status_code=400, detail="User already inactive")
     user.is_active = False
     db.add(user)
+    crud.record_change(db, user_id, changes.DEACTIVATED)
     db.commit()
+    crud.invalidate_user(user_id)
     db.refresh(user)
     return {"message": f"User {user.email} deactivated", "id": user.id}
 
@@ -107,4 +491,4 @@ def get_user_dashboards(user_id: int, db: Session = Depends(get_db)):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    return user.dashboards
+    return TrustedJSONResponse(dashboard_out.many(user.dashboards))
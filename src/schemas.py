@@ -1,6 +1,16 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from datetime import datetime
 from typing import Optional, List
 
+from src.password_hashing import BCRYPT_MAX_PASSWORD_BYTES
+
+def _hashable_password(password: Optional[str]) -> Optional[str]:
+    # bcrypt refuses longer passwords; enforced for every scheme so that a
+    # hash can always be upgraded back to bcrypt on login
+    if password is not None and len(password.encode("utf-8")) > BCRYPT_MAX_PASSWORD_BYTES:
+        raise ValueError(f"must be at most {BCRYPT_MAX_PASSWORD_BYTES} bytes (UTF-8)")
+    return password
+
 # --------- User Schemas ---------
 class UserBase(BaseModel):
     email: EmailStr = Field(..., example="user@example.com")
@@ -11,6 +21,8 @@ class UserCreate(BaseModel):
     full_name: str = Field(..., example="Daniel Delgado")
     password: str = Field(..., min_length=6, example="secret123")
 
+    _check_password = field_validator("password")(_hashable_password)
+
 class UserLogin(BaseModel):
     email: EmailStr = Field(..., example="user@example.com")
     password: str = Field(..., min_length=1, example="secret123")
@@ -19,6 +31,8 @@ class UserUpdate(BaseModel):
     full_name: Optional[str] = Field(None, example="Nuevo Nombre")
     password: Optional[str] = Field(None, min_length=6, example="newpassword123")
 
+    _check_password = field_validator("password")(_hashable_password)
+
 class UserOut(UserBase):
     id: int
     is_active: bool
@@ -26,6 +40,43 @@ class UserOut(UserBase):
     class Config:
         orm_mode = True
 
+class UserBatchRequest(BaseModel):
+    ids: List[int] = Field(..., example=[1, 2, 3])
+
+class UserBatchOut(BaseModel):
+    users: List[UserOut]
+    missing: List[int]
+
+class BulkImportRowResult(BaseModel):
+    index: int
+    email: Optional[str] = None
+    status: str = Field(..., example="created")  # created | duplicate | invalid
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkImportOut(BaseModel):
+    created: int
+    duplicates: int
+    invalid: int
+    results: List[BulkImportRowResult]
+
+# --------- Change feed Schemas ---------
+class UserChangeState(UserOut):
+    version: int
+
+class UserChangeOut(BaseModel):
+    seq: int
+    op: str = Field(..., example="updated")  # created | updated | deactivated | deleted
+    user_id: int
+    changed_at: datetime
+    # Estado actual del usuario; null si ya no existe
+    user: Optional[UserChangeState] = None
+
+class UserChangesOut(BaseModel):
+    changes: List[UserChangeOut]
+    next_since: int
+    has_more: bool
+
 # --------- Dashboard Schemas ---------
 class DashboardBase(BaseModel):
     title: str = Field(..., example="Mi Tablero")
@@ -11,22 +11,15 @@ For protecting routes, use the JWT middleware:
 from src.middleware.jwt_middleware import require_auth
 """
 
-from passlib.context import CryptContext
-
-# Password hashing context (still used for user registration)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from . import password_hashing
 
 def hash_password(password: str) -> str:
-    """Hash password using bcrypt (for user registration)"""
-    return pwd_context.hash(password)
+    """Hash password with the service policy (see src/password_hashing.py)"""
+    return password_hashing.hash_password(password)
 
 def verify_password(plain: str, hashed: str) -> bool:
-    """Verify password (still used for local validation)"""
-    try:
-        return pwd_context.verify(plain, hashed)
-    except Exception:
-        # Fallback for old unhashed passwords (migration period)
-        return plain == hashed
+    """Verify password against a stored hash (see src/password_hashing.py)"""
+    return password_hashing.check_password(plain, hashed)
 
 def create_access_token(data: dict) -> str:
     """
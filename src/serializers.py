@@ -0,0 +1,75 @@
+# src/serializers.py
+"""
+Fast JSON responses for rows read from our own database.
+
+With ``response_model`` FastAPI validates every returned object against the
+schema before encoding it. For UserOut that means re-running EmailStr
+validation on each email, which dominates the cost of a page of users even
+though the rows were validated when they were written. Routes that return
+trusted rows build the body with a RowSerializer instead and return a
+TrustedJSONResponse, which FastAPI sends as is. ``response_model`` stays on
+those routes for the OpenAPI schema.
+
+Bodies are encoded with orjson when it is installed (optional dependency),
+otherwise with the stdlib json module; both produce the same compact JSON.
+"""
+
+import json
+from collections.abc import Mapping
+from operator import attrgetter, itemgetter
+from typing import Any, Iterable, List, Type
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from . import schemas
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class TrustedJSONResponse(Response):
+    """JSON response for content that needs no validation (see RowSerializer)"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RowSerializer:
+    """
+    Projects rows onto the fields of a response schema, without validation
+
+    The field list is taken from ``model`` once; rows may be mappings (Core
+    rows, cached dicts) or objects with attributes (ORM entities). Extra
+    columns such as ``version`` are dropped.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.fields = tuple(model.model_fields)
+        self._from_mapping = itemgetter(*self.fields)
+        self._from_object = attrgetter(*self.fields)
+
+    def one(self, row) -> dict:
+        getter = self._from_mapping if isinstance(row, Mapping) else self._from_object
+        values = getter(row)
+        if len(self.fields) == 1:
+            values = (values,)
+        return dict(zip(self.fields, values))
+
+    def many(self, rows: Iterable) -> List[dict]:
+        return [self.one(row) for row in rows]
+
+
+user_out = RowSerializer(schemas.UserOut)
+dashboard_out = RowSerializer(schemas.DashboardOut)
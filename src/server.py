@@ -0,0 +1,172 @@
+# src/server.py
+"""
+Production entrypoint: multi-process uvicorn with uvloop/httptools.
+
+    python -m src.server
+
+- one worker process per available CPU (scheduler affinity, capped by the
+  container's cgroup CPU quota), or SERVER_WORKERS / WEB_CONCURRENCY
+- uvloop event loop and httptools parser when installed (uvicorn[standard])
+- TLS from SSL_CERTFILE / SSL_KEYFILE (mounted under /etc/ssl by docker-compose)
+- keep-alive longer than the gateway's, tunable listen backlog
+- each worker is recycled after SERVER_MAX_REQUESTS (+ jitter) requests and
+  replaced by the supervisor, which bounds slow leaks and fragmentation
+- SIGTERM drains: workers stop accepting, finish in-flight requests for up to
+  SERVER_GRACEFUL_TIMEOUT seconds, then run the app's lifespan shutdown
+  (Auth Service client, password hasher, DB pools)
+
+Every worker holds its own DB pool, so the service may open up to
+workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+
+Workers share no memory. With more than one, process-local state weakens
+read-after-write and a warning is logged at startup (process_local_warnings):
+the "memory" user cache of other workers serves the old profile until
+USER_CACHE_TTL after a write (use USER_CACHE_BACKEND=redis), and replica
+reads need DB_READ_YOUR_WRITES_BACKEND=redis so that every worker sees the
+read-your-writes pins.
+"""
+
+import importlib.util
+import logging
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from .config import Config
+from .logger_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def _cgroup_cpu_limit(root: str = "/sys/fs/cgroup") -> Optional[float]:
+    """CPUs allowed by the cgroup quota (v2 cpu.max or v1 cfs files), None if unlimited"""
+    try:
+        with open(os.path.join(root, "cpu.max")) as handle:
+            quota, period = handle.read().split()[:2]
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us")) as handle:
+            quota = int(handle.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us")) as handle:
+            period = int(handle.read())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 and period > 0 else None
+
+
+def available_cpus(cgroup_root: str = "/sys/fs/cgroup") -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit(cgroup_root)
+    if limit is not None:
+        cpus = min(cpus, max(1, math.ceil(limit)))
+    return cpus
+
+
+def tls_files(config: Config) -> Optional[Dict[str, str]]:
+    """uvicorn ssl_* options, or None to serve plain HTTP"""
+    if config.SERVER_TLS in ("false", "0", "no"):
+        return None
+    present = os.path.isfile(config.SSL_CERTFILE) and os.path.isfile(config.SSL_KEYFILE)
+    if not present:
+        if config.SERVER_TLS == "auto":
+            return None
+        raise RuntimeError(f"SERVER_TLS=true but {config.SSL_CERTFILE} or {config.SSL_KEYFILE} is missing")
+    return {"ssl_certfile": config.SSL_CERTFILE, "ssl_keyfile": config.SSL_KEYFILE}
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def server_options(config: Config, cpus: Optional[int] = None) -> Dict[str, Any]:
+    """Keyword arguments for uvicorn.run"""
+    workers = config.SERVER_WORKERS or cpus or available_cpus()
+    options = {
+        "host": config.SERVER_HOST,
+        "port": config.SERVICE_PORT,
+        "workers": workers,
+        "loop": "uvloop" if _installed("uvloop") else "asyncio",
+        "http": "httptools" if _installed("httptools") else "h11",
+        "backlog": config.SERVER_BACKLOG,
+        "timeout_keep_alive": config.SERVER_KEEPALIVE_TIMEOUT,
+        "timeout_graceful_shutdown": config.SERVER_GRACEFUL_TIMEOUT,
+        "limit_max_requests": config.SERVER_MAX_REQUESTS or None,
+        "limit_max_requests_jitter": config.SERVER_MAX_REQUESTS_JITTER if config.SERVER_MAX_REQUESTS else 0,
+        # X-Forwarded-For is handled by the app (FORWARDED_ALLOW_IPS), not twice
+        "proxy_headers": False,
+        # Requests are logged by AccessLogMiddleware; uvicorn logs go to the JSON root logger
+        "access_log": False,
+        "log_config": None,
+    }
+    options.update(tls_files(config) or {})
+    return options
+
+
+def process_local_warnings(config: Config, workers: int) -> List[str]:
+    """Settings whose per-process state is not seen by the other workers"""
+    if workers <= 1:
+        return []
+    warnings = []
+    if config.USER_CACHE_BACKEND == "memory":
+        warnings.append(
+            f"USER_CACHE_BACKEND=memory with {workers} workers: invalidations only reach the worker "
+            f"that wrote, others may serve a profile up to {config.USER_CACHE_TTL:g}s old; use redis"
+        )
+    if (
+        config.DATABASE_READ_URLS
+        and config.DB_READ_YOUR_WRITES_WINDOW > 0
+        and config.DB_READ_YOUR_WRITES_BACKEND == "memory"
+    ):
+        warnings.append(
+            f"DB_READ_YOUR_WRITES_BACKEND=memory with {workers} workers: a write only pins reads served "
+            "by the same worker; use redis"
+        )
+    return warnings
+
+
+def serve(options: Dict[str, Any]):
+    uv_config = uvicorn.Config("app:app", **options)
+    if uv_config.workers > 1 or uv_config.limit_max_requests:
+        # Through the supervisor even with one worker, so a worker recycled
+        # after limit_max_requests is replaced instead of ending the container
+        Multiprocess(uv_config, sockets=[uv_config.bind_socket()]).run()
+    else:
+        uvicorn.Server(uv_config).run()
+
+
+def main():
+    config = Config()
+    setup_logging(config)
+    cpus = available_cpus()
+    options = server_options(config, cpus)
+    # Split the bcrypt threads between the workers instead of giving each
+    # worker one per core (inherited by the worker processes)
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", str(max(1, cpus // options["workers"])))
+    for warning in process_local_warnings(config, options["workers"]):
+        logger.warning(warning)
+    logger.info(
+        "Starting server",
+        extra={
+            "workers": options["workers"],
+            "cpus": cpus,
+            "port": options["port"],
+            "tls": "ssl_certfile" in options,
+            "loop": options["loop"],
+            "http": options["http"],
+        },
+    )
+    serve(options)
+
+
+if __name__ == "__main__":
+    main()
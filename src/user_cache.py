@@ -0,0 +1,261 @@
+# src/user_cache.py
+"""
+Read-through cache for user profiles (the UserOut fields).
+
+Two backends are available, selected by USER_CACHE_BACKEND:
+
+- "memory": per-process LRU with TTL (default)
+- "redis":  shared Redis-compatible store (USER_CACHE_REDIS_URL); needs the
+            optional ``redis`` package. Any client exposing get/set/delete
+            with redis-py semantics works, which keeps it testable with a fake.
+- "none":   caching disabled
+
+Writers must call ``user_cache.invalidate(user_id)`` after committing a
+change. Concurrent misses for the same id are collapsed behind a per-id lock
+(plus a short SET NX lock on the shared backend), so an expired hot profile
+triggers one DB query instead of a stampede. The async read path
+(``get_or_load_async``) shares one in-flight load per id on the event loop.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from . import metrics
+from .config import Config
+
+CACHE_REQUESTS = metrics.counter(
+    "user_cache_requests_total",
+    "User cache lookups by result",
+    labelnames=("result",),
+)
+CACHE_INVALIDATIONS = metrics.counter(
+    "user_cache_invalidations_total",
+    "Explicit user cache invalidations",
+)
+CACHE_HIT_RATIO = metrics.gauge("user_cache_hit_ratio", "User cache hit ratio since start")
+CACHE_HIT_RATIO.set_function(
+    lambda: {(): _hit_ratio(CACHE_REQUESTS.value(result="hit"), CACHE_REQUESTS.value(result="miss"))}
+)
+
+
+def _hit_ratio(hits: float, misses: float) -> float:
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+class InMemoryLRUBackend:
+    """Process-local LRU with per-entry expiry"""
+
+    shared = False
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def add(self, key: str, value: str, ttl: float) -> bool:
+        """Set only if absent (used for locks); True when stored"""
+        if self.get(key) is not None:
+            return False
+        self.set(key, value, ttl)
+        return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """Shared backend over a redis-py compatible client"""
+
+    shared = True
+
+    def __init__(self, client, prefix: str = "user_service:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        import redis  # optional dependency
+
+        return cls(redis.Redis.from_url(url, decode_responses=True))
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    def set(self, key: str, value: str, ttl: float):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def add(self, key: str, value: str, ttl: float) -> bool:
+        return bool(self.client.set(self.prefix + key, value, ex=max(1, int(ttl)), nx=True))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        # Shared data is owned by every replica; nothing to do locally
+        pass
+
+
+class UserCache:
+    """
+    Read-through cache keyed by user id
+    """
+
+    def __init__(self, backend, ttl: float, lock_timeout: float = 2.0, lock_stripes: int = 256):
+        self.backend = backend
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        # Striped locks: one lock per id without an unbounded lock table
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+        # (event loop, id) -> future of the load in progress (async path)
+        self._loading: Dict[Tuple[asyncio.AbstractEventLoop, int], "asyncio.Future"] = {}
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        if self.backend is None:
+            return None
+        value = self.backend.get(self._key(user_id))
+        CACHE_REQUESTS.inc(result="hit" if value is not None else "miss")
+        return json.loads(value) if value is not None else None
+
+    def set(self, user_id: int, user: Dict[str, Any]):
+        if self.backend is not None:
+            self.backend.set(self._key(user_id), json.dumps(user), self.ttl)
+
+    def get_or_load(
+        self, user_id: int, loader: Callable[[], Optional[Dict[str, Any]]]
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached profile or call ``loader`` once and cache its result"""
+        if self.backend is None:
+            return loader()
+
+        cached = self.get(user_id)
+        if cached is not None:
+            return cached
+
+        with self._locks[user_id % len(self._locks)]:
+            # Another thread may have filled it while we waited
+            value = self.backend.get(self._key(user_id))
+            if value is not None:
+                return json.loads(value)
+            if self.backend.shared:
+                return self._load_with_shared_lock(user_id, loader)
+            return self._load(user_id, loader)
+
+    async def get_or_load_async(
+        self, user_id: int, loader: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[Dict[str, Any]]:
+        """Async ``get_or_load``: concurrent misses for an id await one ``loader`` call"""
+        if self.backend is None:
+            return await loader()
+
+        cached = self.get(user_id)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        key = (loop, user_id)
+        while key in self._loading:
+            pending = self._loading[key]
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The loading caller failed or was cancelled: the next waiter loads
+
+        future = loop.create_future()
+        self._loading[key] = future
+        try:
+            user = await loader()
+            if user is not None:
+                self.set(user_id, user)
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._loading.pop(key, None)
+        future.set_result(user)
+        return user
+
+    def _load(self, user_id, loader):
+        user = loader()
+        if user is not None:
+            self.set(user_id, user)
+        return user
+
+    def _load_with_shared_lock(self, user_id, loader):
+        lock_key = f"lock:{self._key(user_id)}"
+        if self.backend.add(lock_key, "1", self.lock_timeout):
+            try:
+                return self._load(user_id, loader)
+            finally:
+                self.backend.delete(lock_key)
+
+        # Another replica is loading: wait briefly for its result
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            value = self.backend.get(self._key(user_id))
+            if value is not None:
+                return json.loads(value)
+        return self._load(user_id, loader)
+
+    def invalidate(self, user_id: int):
+        if self.backend is not None:
+            self.backend.delete(self._key(user_id))
+            CACHE_INVALIDATIONS.inc()
+
+    def stats(self) -> Dict[str, float]:
+        hits = CACHE_REQUESTS.value(result="hit")
+        misses = CACHE_REQUESTS.value(result="miss")
+        return {"hits": hits, "misses": misses, "hit_ratio": _hit_ratio(hits, misses)}
+
+
+def _build_user_cache() -> UserCache:
+    config = Config()
+    if config.USER_CACHE_BACKEND == "none":
+        backend = None
+    elif config.USER_CACHE_BACKEND == "redis":
+        backend = RedisBackend.from_url(config.USER_CACHE_REDIS_URL)
+    elif config.USER_CACHE_BACKEND == "memory":
+        backend = InMemoryLRUBackend(config.USER_CACHE_MAX_SIZE)
+    else:
+        raise ValueError(f"Unknown USER_CACHE_BACKEND: {config.USER_CACHE_BACKEND}")
+    return UserCache(backend, ttl=config.USER_CACHE_TTL)
+
+
+# Singleton cache shared by the CRUD layer
+user_cache = _build_user_cache()
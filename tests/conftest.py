@@ -3,7 +3,8 @@ from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker
 from src.models import Base
 from app import app  # Tu FastAPI app
-from src.database import get_db  # La dependencia de FastAPI para la DB
+from src.database import get_db, get_read_db  # Dependencias de FastAPI para la DB
+from src.migrations import run_migrations
 
 # ----------------------------
 # Base de datos de test
@@ -20,10 +21,11 @@ def create_test_database():
     inspector = inspect(engine)
     print("Tablas antes de create_all:", inspector.get_table_names())
 
-    Base.metadata.create_all(bind=engine)
+    # Mismo paso que el lifespan de la app: crea las tablas o aplica migraciones
+    run_migrations(engine)
 
     inspector = inspect(engine)
-    print("Tablas después de create_all:", inspector.get_table_names())
+    print("Tablas después de migrar:", inspector.get_table_names())
 
     yield
 
@@ -55,7 +57,13 @@ def client(db_session):
         finally:
             pass
 
+    # Las rutas de solo lectura usan una conexión Core sobre la misma BD de test
+    def override_get_read_db():
+        with engine.connect() as conn:
+            yield conn
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_read_db
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
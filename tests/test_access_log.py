@@ -0,0 +1,55 @@
+# tests/test_access_log.py
+import logging
+
+import pytest
+
+from src.middleware.access_log_middleware import parse_route_sample_rates
+
+
+def _access_records(caplog):
+    return [r for r in caplog.records if r.name == "access"]
+
+
+def test_parse_route_sample_rates():
+    assert parse_route_sample_rates("/health=0.01, /metrics=0") == {"/health": 0.01, "/metrics": 0.0}
+    assert parse_route_sample_rates("") == {}
+    with pytest.raises(ValueError):
+        parse_route_sample_rates("/health")
+
+
+def test_access_log_record_fields(client, db_session, caplog):
+    from src.models import User
+
+    user = User(email="access@example.com", hashed_password="x", full_name="Access")
+    db_session.add(user)
+    db_session.commit()
+
+    with caplog.at_level(logging.INFO, logger="access"):
+        response = client.get(f"/users/{user.id}", headers={"X-Request-ID": "req-123"})
+
+    assert response.headers["x-request-id"] == "req-123"
+    (record,) = _access_records(caplog)
+    assert record.request_id == "req-123"
+    assert record.route == "/users/{user_id}"
+    assert record.status == 200
+    assert record.duration_ms >= 0
+    assert record.db_queries >= 1
+    assert record.db_time_ms >= 0
+
+
+def test_access_log_generates_request_id(client, caplog):
+    with caplog.at_level(logging.INFO, logger="access"):
+        response = client.get("/")
+
+    (record,) = _access_records(caplog)
+    assert record.request_id == response.headers["x-request-id"]
+    assert len(record.request_id) == 32
+
+
+def test_access_log_route_sampling(client, caplog):
+    # /metrics is sampled at 0 by default
+    with caplog.at_level(logging.INFO, logger="access"):
+        client.get("/metrics")
+        client.get("/")
+
+    assert [r.route for r in _access_records(caplog)] == ["/"]
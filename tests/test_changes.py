@@ -0,0 +1,163 @@
+# tests/test_changes.py
+import asyncio
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from src import crud
+from src.changes import ChangeNotifier, compact_changes
+from src.models import Base, UserChange
+
+
+def _now(offset: float = 0):
+    return datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=offset)
+
+
+@pytest.fixture()
+def feed_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'feed.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _insert(engine, *changes):
+    with engine.begin() as conn:
+        conn.execute(UserChange.__table__.insert(), list(changes))
+
+
+def _last_seq(db_session):
+    return db_session.execute(select(func.max(UserChange.seq))).scalar() or 0
+
+
+def test_writes_are_recorded_in_order(client, db_session):
+    since = _last_seq(db_session)
+    email = f"feed-{uuid.uuid4().hex[:8]}@example.com"
+    user_id = client.post("/users/register", json={"email": email, "password": "secret1", "full_name": "Feed"}).json()["id"]
+    client.put(f"/users/{user_id}", json={"full_name": "Renamed"})
+    client.delete(f"/users/{user_id}")
+
+    page = client.get(f"/users/changes?since={since}").json()
+    assert [(c["op"], c["user_id"]) for c in page["changes"]] == [
+        ("created", user_id), ("updated", user_id), ("deactivated", user_id)
+    ]
+    # Every entry carries the current state of the user
+    assert page["changes"][0]["user"] == {
+        "id": user_id, "email": email, "full_name": "Renamed", "is_active": False, "version": 3
+    }
+    assert page["next_since"] == page["changes"][-1]["seq"]
+    assert page["has_more"] is False
+
+    client.delete(f"/users/{user_id}?hard=true")
+    page = client.get(f"/users/changes?since={page['next_since']}").json()
+    assert [(c["op"], c["user"]) for c in page["changes"]] == [("deleted", None)]
+
+
+def test_limit_and_has_more(client, db_session):
+    since = _last_seq(db_session)
+    rows = [{"email": f"bulk-{uuid.uuid4().hex[:8]}@example.com", "password": "secret1", "full_name": "B"} for _ in range(3)]
+    assert client.post("/users/bulk", json=rows).json()["created"] == 3
+
+    first = client.get(f"/users/changes?since={since}&limit=2").json()
+    assert len(first["changes"]) == 2 and first["has_more"] is True
+    second = client.get(f"/users/changes?since={first['next_since']}&limit=2").json()
+    assert len(second["changes"]) == 1 and second["has_more"] is False
+    assert [c["user"]["email"] for c in first["changes"] + second["changes"]] == [r["email"] for r in rows]
+
+
+def test_entries_after_a_recent_gap_are_held_back(feed_engine):
+    _insert(
+        feed_engine,
+        {"seq": 1, "user_id": 1, "op": "created", "changed_at": _now(-60)},
+        # seq 2 may still be committing
+        {"seq": 3, "user_id": 3, "op": "created", "changed_at": _now()},
+    )
+    with feed_engine.connect() as conn:
+        entries, has_more = crud.get_user_changes(conn, 0, 10, gap_grace=5)
+        assert [e["seq"] for e in entries] == [1] and has_more
+        # Nothing is served past the gap, even from a later since
+        assert crud.get_user_changes(conn, 1, 10, gap_grace=5) == ([], True)
+        # Once the gap is older than the grace period it is a rolled-back seq
+        entries, has_more = crud.get_user_changes(conn, 0, 10, gap_grace=0)
+        assert [e["seq"] for e in entries] == [1, 3] and not has_more
+        assert entries[1]["user"] is None
+
+
+def test_compaction_keeps_latest_change_per_user(feed_engine):
+    day = 86400
+    _insert(
+        feed_engine,
+        {"seq": 1, "user_id": 1, "op": "created", "changed_at": _now(-3 * day)},
+        {"seq": 2, "user_id": 2, "op": "created", "changed_at": _now(-10 * day)},
+        {"seq": 3, "user_id": 1, "op": "updated", "changed_at": _now(-2 * day)},
+        {"seq": 4, "user_id": 2, "op": "deleted", "changed_at": _now(-9 * day)},
+        {"seq": 5, "user_id": 3, "op": "deleted", "changed_at": _now(-day)},
+        {"seq": 6, "user_id": 1, "op": "updated", "changed_at": _now()},
+    )
+    removed = compact_changes(feed_engine, compact_after=day / 2, tombstone_retention=7 * day, batch_size=1)
+    assert removed == {"superseded": 3, "tombstone": 1}
+    with feed_engine.connect() as conn:
+        remaining = conn.execute(select(UserChange.seq, UserChange.op).order_by(UserChange.seq)).all()
+    # User 3's tombstone is still within retention
+    assert remaining == [(5, "deleted"), (6, "updated")]
+
+
+def test_notifier_wakes_waiters_from_other_threads():
+    notifier = ChangeNotifier()
+
+    async def run():
+        generation = notifier.generation
+        threading.Timer(0.05, notifier.notify).start()
+        started = time.perf_counter()
+        woke = await notifier.wait(generation, 5)
+        elapsed = time.perf_counter() - started
+        # A change since the caller's generation returns at once
+        assert await notifier.wait(generation, 5)
+        assert not await notifier.wait(notifier.generation, 0.01)
+        return woke, elapsed
+
+    woke, elapsed = asyncio.run(run())
+    assert woke and elapsed < 1
+
+
+def test_long_poll_waits_for_a_change(client, db_session):
+    since = _last_seq(db_session)
+    started = time.perf_counter()
+    page = client.get(f"/users/changes?since={since}&wait=0.3").json()
+    assert page == {"changes": [], "next_since": since, "has_more": False}
+    assert time.perf_counter() - started >= 0.3
+
+    def register():
+        time.sleep(0.1)
+        client.post("/users/register", json={
+            "email": f"poll-{uuid.uuid4().hex[:8]}@example.com", "password": "secret1", "full_name": "Poll"
+        })
+
+    writer = threading.Thread(target=register)
+    writer.start()
+    started = time.perf_counter()
+    page = client.get(f"/users/changes?since={since}&wait=10").json()
+    writer.join()
+    assert [c["op"] for c in page["changes"]] == ["created"]
+    assert time.perf_counter() - started < 5
+
+
+def test_server_sent_events_resume_from_last_event_id(client, db_session):
+    since = _last_seq(db_session)
+    for _ in range(2):
+        client.post("/users/register", json={
+            "email": f"sse-{uuid.uuid4().hex[:8]}@example.com", "password": "secret1", "full_name": "SSE"
+        })
+
+    response = client.get(
+        "/users/changes?wait=0.2",
+        headers={"Accept": "text/event-stream", "Last-Event-ID": str(since + 1)},
+    )
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block for block in response.text.split("\n\n") if block.startswith("id:")]
+    assert len(events) == 1
+    assert events[0].startswith(f"id: {since + 2}\nevent: change\ndata: ")
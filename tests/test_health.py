@@ -0,0 +1,136 @@
+# tests/test_health.py
+import asyncio
+
+import app as app_module
+from src.health import HealthChecker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_checker(required=None, **checker_kwargs):
+    calls = {"database": 0, "auth_service": 0}
+    healthy = {"database": True, "auth_service": True}
+
+    def make_check(name):
+        async def check():
+            calls[name] += 1
+            if not healthy[name]:
+                raise ConnectionError(f"{name} down")
+            return {"detail": name}
+
+        return check
+
+    checker = HealthChecker(
+        {name: make_check(name) for name in calls}, required=required, **checker_kwargs
+    )
+    return checker, calls, healthy
+
+
+def test_not_ready_until_first_check():
+    checker, calls, _ = make_checker(clock=FakeClock())
+    ready, report = checker.status()
+    assert not ready
+    assert report["database"] == {"status": "unknown", "age_seconds": None, "required": True}
+
+    asyncio.run(checker.run_checks())
+    ready, report = checker.status()
+    assert ready
+    assert report["database"]["status"] == "ok"
+    assert report["database"]["detail"] == "database"
+    assert calls == {"database": 1, "auth_service": 1}
+
+
+def test_failures_and_stale_results():
+    clock = FakeClock()
+    checker, _, healthy = make_checker(clock=clock, interval=10)
+    healthy["auth_service"] = False
+    asyncio.run(checker.run_checks())
+    ready, report = checker.status()
+    assert not ready
+    assert report["auth_service"]["status"] == "fail"
+    assert report["auth_service"]["error"] == "ConnectionError: auth_service down"
+
+    healthy["auth_service"] = True
+    asyncio.run(checker.run_checks())
+    clock.now += 25
+    ready, report = checker.status()
+    assert ready and report["database"]["age_seconds"] == 25
+    # Older than max_age (3 intervals): the checker is stuck
+    clock.now += 10
+    ready, report = checker.status()
+    assert not ready and report["database"]["status"] == "stale"
+
+
+def test_only_required_checks_gate_readiness():
+    checker, _, healthy = make_checker(required=["database"])
+    healthy["auth_service"] = False
+    asyncio.run(checker.run_checks())
+    ready, report = checker.status()
+    assert ready
+    assert report["auth_service"]["status"] == "fail"
+    assert report["auth_service"]["required"] is False
+
+
+def test_slow_check_times_out():
+    async def hanging():
+        await asyncio.sleep(1)
+
+    checker = HealthChecker({"database": hanging}, timeout=0.01)
+    asyncio.run(checker.run_checks())
+    ready, report = checker.status()
+    assert not ready
+    assert report["database"]["error"] == "timeout after 0.01s"
+
+
+def test_background_task_refreshes_results():
+    checker, calls, _ = make_checker(interval=0.01)
+
+    async def run():
+        checker.start()
+        checker.start()
+        await asyncio.sleep(0.05)
+        await checker.stop()
+
+    asyncio.run(run())
+    assert calls["database"] >= 2
+    assert checker.status()[0]
+
+
+def test_probes_read_cached_results(client, monkeypatch):
+    checker, calls, healthy = make_checker()
+    monkeypatch.setattr(app_module, "health_checker", checker)
+
+    assert client.get("/livez").status_code == 200
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["status"] == "not_ready"
+
+    asyncio.run(checker.run_checks())
+    for _ in range(5):
+        response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["checks"]["database"]["status"] == "ok"
+    # Probes never run the checks themselves
+    assert calls == {"database": 1, "auth_service": 1}
+
+    healthy["database"] = False
+    asyncio.run(checker.run_checks())
+    assert client.get("/readyz").status_code == 503
+    assert client.get("/livez").status_code == 200
+
+
+def test_default_checker_requires_only_the_database(monkeypatch):
+    from src import health
+
+    monkeypatch.delenv("HEALTH_READY_CHECKS", raising=False)
+    checker = health._build_default_checker()
+    assert checker.required == ("database",)
+    # Auth Service is still checked and reported
+    assert set(checker.checks) == {"database", "auth_service"}
+    assert checker.status()[1]["auth_service"]["required"] is False
@@ -0,0 +1,435 @@
+# tests/test_jwt_middleware.py
+import asyncio
+import time
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from jose import jwk, jwt
+
+from src.middleware import jwt_middleware
+from src.middleware.jwt_middleware import CircuitBreaker, JWKSKeyStore, TokenCache, TokenValidator
+
+
+def make_validator(handler, breaker=None, retry_attempts=1, **cache_kwargs):
+    """TokenValidator whose Auth Service calls go to a local mock transport"""
+    calls = []
+
+    async def recording_handler(request):
+        calls.append(request)
+        return await handler(request)
+
+    validator = TokenValidator(
+        cache=TokenCache(**cache_kwargs),
+        breaker=breaker,
+        retry_attempts=retry_attempts,
+        retry_backoff=0,
+    )
+    validator._client = httpx.AsyncClient(transport=httpx.MockTransport(recording_handler))
+    return validator, calls
+
+
+async def valid_response(request):
+    return httpx.Response(200, json={
+        "valid": True,
+        "user_id": 7,
+        "email": "cached@example.com",
+        "scopes": ["read"],
+        "expires_at": time.time() + 3600,
+    })
+
+
+def test_repeated_validation_hits_cache():
+    validator, calls = make_validator(valid_response)
+
+    async def run():
+        first = await validator.validate_token("token-a")
+        second = await validator.validate_token("token-a")
+        await validator.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert first["user_id"] == 7
+    assert len(calls) == 1
+    assert validator.cache.stats()["hits"] == 1
+
+
+def test_entry_expires_with_token():
+    async def short_lived(request):
+        return httpx.Response(200, json={"valid": True, "user_id": 1, "expires_at": time.time() - 1})
+
+    validator, calls = make_validator(short_lived, ttl=60)
+
+    async def run():
+        await validator.validate_token("expired")
+        await validator.validate_token("expired")
+        await validator.close()
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_rejected_tokens_are_negatively_cached():
+    async def rejected(request):
+        return httpx.Response(200, json={"valid": False, "message": "Token revoked"})
+
+    validator, calls = make_validator(rejected, negative_ttl=30)
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(HTTPException) as exc_info:
+                await validator.validate_token("revoked")
+            assert exc_info.value.status_code == 401
+            assert exc_info.value.detail == "Token revoked"
+        await validator.close()
+
+    asyncio.run(run())
+    assert len(calls) == 1
+    assert validator.cache.stats()["negative_hits"] == 1
+
+
+def test_auth_service_errors_are_not_cached():
+    async def broken(request):
+        raise httpx.ConnectError("down", request=request)
+
+    validator, calls = make_validator(broken)
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(HTTPException) as exc_info:
+                await validator.validate_token("token-b")
+            assert exc_info.value.status_code == 503
+        await validator.close()
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_concurrent_validations_are_coalesced():
+    async def slow(request):
+        await asyncio.sleep(0.05)
+        return await valid_response(request)
+
+    validator, calls = make_validator(slow)
+
+    async def run():
+        results = await asyncio.gather(*(validator.validate_token("token-c") for _ in range(10)))
+        await validator.close()
+        return results
+
+    results = asyncio.run(run())
+    assert all(r["email"] == "cached@example.com" for r in results)
+    assert len(calls) == 1
+    assert validator.cache.stats()["coalesced"] == 9
+
+
+def test_cache_is_bounded():
+    cache = TokenCache(max_size=2, ttl=60)
+    for token in ("a", "b", "c"):
+        cache.set_valid(cache.key(token), {"user_id": token})
+    assert cache.get(cache.key("a")) is None
+    assert cache.get(cache.key("c")) == ({"user_id": "c"}, None)
+
+
+# --- Offline verification with JWKS ---
+JWKS_URL = "https://auth.test/auth/.well-known/jwks.json"
+
+
+def generate_key(kid):
+    """Locally generated RSA key pair: (private PEM, public JWK)"""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public_jwk = jwk.construct(public_pem, "RS256").to_dict()
+    public_jwk["kid"] = kid
+    return private_pem, public_jwk
+
+
+def sign(private_pem, kid, **claims):
+    claims.setdefault("sub", "42")
+    claims.setdefault("exp", int(time.time()) + 600)
+    return jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": kid})
+
+
+def make_local_validator(jwks):
+    """Validator with a key store; jwks is a mutable list of published keys"""
+    calls = {"jwks": 0, "validate": 0}
+
+    async def handler(request):
+        if request.url.path.endswith("jwks.json"):
+            calls["jwks"] += 1
+            return httpx.Response(200, json={"keys": list(jwks)})
+        calls["validate"] += 1
+        return httpx.Response(200, json={"valid": True, "user_id": 99, "scopes": []})
+
+    validator = TokenValidator(cache=TokenCache(max_size=0))
+    validator._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    validator.key_store = JWKSKeyStore(JWKS_URL, validator.get_client, min_refresh_interval=0)
+    return validator, calls
+
+
+def test_local_verification_skips_auth_service():
+    private_pem, public_jwk = generate_key("k1")
+    validator, calls = make_local_validator([public_jwk])
+    token = sign(private_pem, "k1", email="local@example.com", scopes=["read", "write"])
+
+    async def run():
+        info = await validator.validate_token(token)
+        await validator.validate_token(token)
+        await validator.close()
+        return info
+
+    info = asyncio.run(run())
+    assert info["user_id"] == 42
+    assert info["email"] == "local@example.com"
+    assert info["scopes"] == ["read", "write"]
+    assert calls == {"jwks": 1, "validate": 0}
+
+
+def test_local_verification_rejects_expired_and_forged_tokens():
+    private_pem, public_jwk = generate_key("k1")
+    forged_pem, _ = generate_key("k1")
+    validator, calls = make_local_validator([public_jwk])
+
+    async def run():
+        with pytest.raises(HTTPException) as expired:
+            await validator.validate_token(sign(private_pem, "k1", exp=int(time.time()) - 10))
+        with pytest.raises(HTTPException) as forged:
+            await validator.validate_token(sign(forged_pem, "k1"))
+        await validator.close()
+        return expired.value, forged.value
+
+    expired, forged = asyncio.run(run())
+    assert expired.status_code == 401 and expired.detail == "Token expired"
+    assert forged.status_code == 401
+    assert calls["validate"] == 0
+
+
+def test_local_verification_requires_exp():
+    private_pem, public_jwk = generate_key("k1")
+    validator, calls = make_local_validator([public_jwk])
+    token = jwt.encode({"sub": "42"}, private_pem, algorithm="RS256", headers={"kid": "k1"})
+
+    async def run():
+        with pytest.raises(HTTPException) as missing:
+            await validator.validate_token(token)
+        await validator.close()
+        return missing.value
+
+    missing = asyncio.run(run())
+    assert missing.status_code == 401
+    assert missing.detail == 'Invalid token: missing required key "exp" among claims'
+    # Rejected locally, never sent to Auth Service
+    assert calls["validate"] == 0
+
+
+def test_unknown_kid_triggers_key_rotation():
+    old_pem, old_jwk = generate_key("old")
+    new_pem, new_jwk = generate_key("new")
+    jwks = [old_jwk]
+    validator, calls = make_local_validator(jwks)
+
+    async def run():
+        await validator.validate_token(sign(old_pem, "old"))
+        jwks.append(new_jwk)
+        info = await validator.validate_token(sign(new_pem, "new"))
+        await validator.close()
+        return info
+
+    info = asyncio.run(run())
+    assert info["user_id"] == 42
+    assert calls == {"jwks": 2, "validate": 0}
+
+
+def test_falls_back_to_remote_when_keys_are_unavailable():
+    private_pem, _ = generate_key("k1")
+    validator, calls = make_local_validator([])
+
+    async def run():
+        info = await validator.validate_token(sign(private_pem, "k1"))
+        await validator.close()
+        return info
+
+    info = asyncio.run(run())
+    assert info["user_id"] == 99
+    assert calls["validate"] == 1
+
+
+# --- Connection pool, retries and circuit breaker ---
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_client_pool_limits_and_http2(monkeypatch):
+    monkeypatch.setattr(jwt_middleware, "AUTH_HTTP_MAX_CONNECTIONS", 7)
+    monkeypatch.setattr(jwt_middleware, "h2", None)
+
+    async def run():
+        validator = TokenValidator()
+        client = await validator.get_client()
+        pool = client._transport._pool
+        await validator.close()
+        return pool
+
+    pool = asyncio.run(run())
+    assert pool._max_connections == 7
+    # HTTP/2 is requested by default but needs the h2 package
+    assert pool._http2 is False
+
+
+def test_transient_failures_are_retried():
+    failures = [httpx.Response(502), httpx.ConnectError("reset")]
+
+    async def handler(request):
+        if not failures:
+            return await valid_response(request)
+        failure = failures.pop(0)
+        if isinstance(failure, Exception):
+            raise failure
+        return failure
+
+    validator, calls = make_validator(handler, retry_attempts=3)
+
+    async def run():
+        info = await validator.validate_token("token-r")
+        await validator.close()
+        return info
+
+    assert asyncio.run(run())["user_id"] == 7
+    assert len(calls) == 3
+    assert validator.breaker.state == CircuitBreaker.CLOSED
+    assert validator.breaker.failures == 0
+
+
+def test_retries_are_bounded_and_rejections_not_retried():
+    async def timing_out(request):
+        await asyncio.sleep(0.01)
+        raise httpx.ReadTimeout("slow", request=request)
+
+    validator, calls = make_validator(timing_out, retry_attempts=3)
+
+    async def run():
+        with pytest.raises(HTTPException) as exc_info:
+            await validator.validate_token("token-t")
+        await validator.close()
+        return exc_info.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503 and error.detail == "Auth service timeout"
+    assert len(calls) == 3
+
+    async def unauthorized(request):
+        return httpx.Response(401)
+
+    validator, calls = make_validator(unauthorized, retry_attempts=3)
+
+    async def run_rejected():
+        with pytest.raises(HTTPException) as exc_info:
+            await validator.validate_token("token-u")
+        await validator.close()
+        return exc_info.value
+
+    assert asyncio.run(run_rejected()).status_code == 401
+    assert len(calls) == 1
+
+
+def test_open_circuit_fails_fast_until_probe_succeeds():
+    clock = FakeClock()
+    healthy = {"up": False}
+
+    async def handler(request):
+        await asyncio.sleep(0.05)
+        if not healthy["up"]:
+            raise httpx.ConnectError("down", request=request)
+        return await valid_response(request)
+
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    validator, calls = make_validator(handler, breaker=breaker, retry_attempts=2)
+
+    async def attempt(token):
+        started = time.perf_counter()
+        try:
+            return await validator.validate_token(token), time.perf_counter() - started
+        except HTTPException as exc:
+            return exc, time.perf_counter() - started
+
+    async def run():
+        first, _ = await attempt("token-1")
+        fast, elapsed = await attempt("token-2")
+        clock.now += 31
+        healthy["up"] = True
+        recovered, _ = await attempt("token-3")
+        await validator.close()
+        return first, fast, elapsed, recovered
+
+    first, fast, elapsed, recovered = asyncio.run(run())
+    assert first.status_code == 503
+    # Both attempts of the first validation failed and opened the circuit
+    assert fast.status_code == 503 and fast.detail == "Auth service unavailable"
+    assert fast.headers["Retry-After"] == "30"
+    assert elapsed < 0.05
+    assert len(calls) == 3
+    assert recovered["user_id"] == 7
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens_circuit():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert not breaker.allow()
+    clock.now += 10
+    assert breaker.allow()
+    # Only one probe while half-open
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 5
+    assert not breaker.allow()
+
+
+def test_still_valid_tokens_are_served_while_auth_service_is_down():
+    healthy = {"up": True}
+
+    async def handler(request):
+        if not healthy["up"]:
+            return httpx.Response(503)
+        return await valid_response(request)
+
+    validator, calls = make_validator(handler, ttl=0.01, stale_ttl=60)
+
+    async def run():
+        await validator.validate_token("known")
+        healthy["up"] = False
+        await asyncio.sleep(0.02)
+        info = await validator.validate_token("known")
+        with pytest.raises(HTTPException) as unknown:
+            await validator.validate_token("unknown")
+        await validator.close()
+        return info, unknown.value
+
+    info, unknown = asyncio.run(run())
+    assert info["email"] == "cached@example.com"
+    assert unknown.status_code == 503
+    assert len(calls) == 3
+    assert validator.cache.stats()["stale_hits"] == 1
+
+
+def test_stale_entries_never_outlive_the_token():
+    cache = TokenCache(ttl=60, stale_ttl=600)
+    key = cache.key("short")
+    cache.set_valid(key, {"user_id": 1, "expires_at": time.time() + 0.01})
+    time.sleep(0.02)
+    assert cache.get(key) is None
+    assert cache.get_stale(key) is None
@@ -0,0 +1,34 @@
+# tests/test_metrics.py
+from src import metrics
+
+
+def test_render_prometheus_text_format():
+    requests = metrics.counter("test_render_requests_total", "Requests", labelnames=("path",))
+    latency = metrics.histogram("test_render_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    requests.inc(path='/a"b')
+    latency.observe(0.05)
+    latency.observe(2.0)
+
+    text = metrics.render_prometheus()
+    assert "# TYPE test_render_requests_total counter" in text
+    assert 'test_render_requests_total{path="/a\\"b"} 1' in text
+    assert 'test_render_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_render_latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "test_render_latency_seconds_count 2" in text
+
+
+def test_metrics_endpoint_reports_route_latency_and_sql(client, db_session):
+    from src.models import User
+
+    user = User(email="metrics@example.com", hashed_password="x", full_name="Metrics")
+    db_session.add(user)
+    db_session.commit()
+    client.get(f"/users/{user.id}")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/users/{user_id}"}' in body
+    assert 'http_request_db_queries_count{route="/users/{user_id}"}' in body
+    assert "password_hash_duration_seconds" in body or "password_hash_in_flight" in body
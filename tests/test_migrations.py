@@ -0,0 +1,91 @@
+# tests/test_migrations.py
+from sqlalchemy import create_engine, inspect, text
+
+from src import migrations
+
+
+def _index_names(engine):
+    return {index["name"] for index in inspect(engine).get_indexes("users")}
+
+
+def test_fresh_database_is_created_and_stamped(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+
+    assert migrations.run_migrations(engine) == []
+    assert migrations.applied_versions(engine) == [m.version for m in migrations.MIGRATIONS]
+    assert migrations.pending_migrations(engine) == []
+    assert "ix_users_is_active_id" in _index_names(engine)
+    assert "ix_users_full_name" not in _index_names(engine)
+
+
+def test_legacy_database_is_upgraded_in_order(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR(255) NOT NULL UNIQUE, "
+            "hashed_password VARCHAR(255) NOT NULL, full_name VARCHAR(255), is_active BOOLEAN)"
+        ))
+        conn.execute(text("CREATE INDEX ix_users_full_name ON users (full_name)"))
+        conn.execute(text(
+            "INSERT INTO users (email, hashed_password, full_name) VALUES ('old@example.com', 'x', 'Óscar Old')"
+        ))
+        conn.execute(text(
+            "INSERT INTO users (email, hashed_password) VALUES ('long@example.com', :password)"
+        ), {"password": "p" * 100})
+        # Created by the previous migration 4, replaced by the search keys
+        conn.execute(text("CREATE INDEX ix_users_full_name_lower ON users (lower(full_name))"))
+
+    assert migrations.run_migrations(engine) == [1, 2, 3, 4, 5, 6, 7]
+
+    columns = {c["name"] for c in inspect(engine).get_columns("users")}
+    assert "version" in columns
+    assert "ix_users_is_active_id" in _index_names(engine)
+    assert "ix_users_full_name" not in _index_names(engine)
+    assert "ix_users_full_name_lower" not in _index_names(engine)
+    assert {"ix_users_email_search", "ix_users_full_name_search"} <= _index_names(engine)
+    with engine.connect() as conn:
+        # Search keys are backfilled with the app's (Unicode) lowercasing
+        assert conn.execute(text("SELECT email_search, full_name_search FROM users WHERE id = 1")).one() == (
+            "old@example.com", "óscar old"
+        )
+        version, hashed_password = conn.execute(text("SELECT version, hashed_password FROM users WHERE id = 1")).one()
+        assert version == 1
+        # The plaintext password was hashed in place
+        assert hashed_password.startswith("$2b$")
+        # Too long for bcrypt: disabled rather than aborting the migration
+        disabled = conn.execute(text("SELECT hashed_password FROM users WHERE id = 2")).scalar()
+        assert disabled == migrations.UNUSABLE_PASSWORD
+        plan = " ".join(
+            str(row[-1]) for row in conn.execute(
+                text("EXPLAIN QUERY PLAN SELECT id FROM users WHERE lower(email) = 'old@example.com'")
+            )
+        )
+    assert "ix_users_email_lower" in plan
+    with engine.connect() as conn:
+        # Existing users are backfilled into the change feed
+        assert conn.execute(text("SELECT seq, user_id, op FROM user_changes")).all() == [
+            (1, 1, "created"), (2, 2, "created")
+        ]
+
+    # Nothing left to do on the next start
+    assert migrations.run_migrations(engine) == []
+
+
+def test_prefix_search_is_an_index_range_scan(tmp_path):
+    from src import crud
+    from src.models import User
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    migrations.run_migrations(engine)
+    for key, index in (
+        (User.email_search, "ix_users_email_search"),
+        (User.full_name_search, "ix_users_full_name_search"),
+    ):
+        # The exact statement search_users runs, with its bound parameters
+        compiled = crud.prefix_query(key, "ana", 20).compile(engine)
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        with engine.connect() as conn:
+            plan = " ".join(str(row[-1]) for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params))
+        assert f"USING INDEX {index} (is_active=? AND {key.name}>? AND {key.name}<?)" in plan
+        # Rows come back in index order: no sort
+        assert "TEMP B-TREE" not in plan
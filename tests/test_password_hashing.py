@@ -0,0 +1,128 @@
+# tests/test_password_hashing.py
+import asyncio
+import threading
+
+import pytest
+
+from src import password_hashing
+from src.password_hashing import PasswordHasher, PasswordHasherBusy
+
+
+def test_hash_and_verify_roundtrip():
+    hasher = PasswordHasher(workers=2, max_queue=2)
+
+    async def run():
+        hashed = await hasher.hash("secret123")
+        return hashed, await hasher.verify("secret123", hashed), await hasher.verify("nope", hashed)
+
+    try:
+        hashed, ok, wrong = asyncio.run(run())
+    finally:
+        hasher.shutdown()
+
+    assert hashed.startswith("$2")
+    assert ok is True
+    assert wrong is False
+    assert password_hashing.HASH_DURATION.count(operation="verify") >= 2
+
+
+def test_rejects_when_queue_is_full():
+    hasher = PasswordHasher(workers=1, max_queue=1, retry_after=3)
+    release = threading.Event()
+
+    def blocking(_):
+        release.wait(5)
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(hasher._submit("hash", blocking, None))
+        second = asyncio.ensure_future(hasher._submit("hash", blocking, None))
+        await asyncio.sleep(0.05)
+        assert hasher.pending == 2
+        with pytest.raises(PasswordHasherBusy) as exc_info:
+            await hasher._submit("hash", blocking, None)
+        release.set()
+        await asyncio.gather(first, second)
+        return exc_info.value
+
+    try:
+        error = asyncio.run(run())
+    finally:
+        hasher.shutdown()
+
+    assert error.retry_after == 3
+    assert hasher.pending == 0
+
+
+def test_policy_controls_cost_and_rehash():
+    fast = password_hashing.HashPolicy(bcrypt_rounds=4)
+    slow = password_hashing.HashPolicy(bcrypt_rounds=5)
+    hashed = password_hashing.hash_password("secret", fast)
+
+    assert hashed.startswith("$2b$04$")
+    assert password_hashing.check_password("secret", hashed)
+    assert not password_hashing.needs_rehash(hashed, fast)
+    assert password_hashing.needs_rehash(hashed, slow)
+    assert password_hashing.needs_rehash("plaintext", fast)
+    with pytest.raises(ValueError):
+        password_hashing.HashPolicy(scheme="md5")
+
+
+def test_verify_and_update_upgrades_old_hashes():
+    hasher = PasswordHasher(workers=1, max_queue=2, policy=password_hashing.HashPolicy(bcrypt_rounds=5))
+    old_hash = password_hashing.hash_password("secret", password_hashing.HashPolicy(bcrypt_rounds=4))
+
+    async def run():
+        return (
+            await hasher.verify_and_update("secret", old_hash),
+            await hasher.verify_and_update("wrong", old_hash),
+            # Unrecognised stored values are never compared as plaintext
+            await hasher.verify_and_update("legacy", "legacy"),
+        )
+
+    try:
+        (ok, new_hash), (wrong, no_hash), legacy = asyncio.run(run())
+    finally:
+        hasher.shutdown()
+
+    assert ok and new_hash.startswith("$2b$05$")
+    assert not wrong and no_hash is None
+    assert legacy == (False, None)
+    assert not password_hashing.check_password("", "")
+
+
+def test_login_rehashes_and_update_hashes(client, db_session, monkeypatch):
+    from src.models import User
+
+    old_hash = password_hashing.hash_password("secret", password_hashing.HashPolicy(bcrypt_rounds=4))
+    user = User(email="rehash@example.com", hashed_password=old_hash, full_name="Rehash")
+    db_session.add(user)
+    db_session.commit()
+    monkeypatch.setattr(password_hashing.password_hasher, "policy", password_hashing.HashPolicy(bcrypt_rounds=5))
+
+    response = client.post("/users/login", json={"email": "rehash@example.com", "password": "secret"})
+    assert response.status_code == 200
+    db_session.refresh(user)
+    assert user.hashed_password.startswith("$2b$05$")
+
+    response = client.put(f"/users/{user.id}", json={"password": "changed"})
+    assert response.status_code == 200
+    db_session.refresh(user)
+    assert user.hashed_password != "changed"
+    assert password_hashing.check_password("changed", user.hashed_password)
+
+
+def test_passwords_over_72_bytes_are_rejected_before_hashing(client, db_session):
+    from src.models import User
+
+    user = User(email="longpw@example.com", hashed_password=password_hashing.hash_password("secret"), full_name="L")
+    db_session.add(user)
+    db_session.commit()
+    too_long = "x" * 100
+
+    response = client.post("/users/register", json={"email": "longpw2@example.com", "password": too_long, "full_name": "L"})
+    assert response.status_code == 422
+    assert client.put(f"/users/{user.id}", json={"password": too_long}).status_code == 422
+    # 72 bytes of UTF-8 is the limit, not 72 characters
+    assert client.put(f"/users/{user.id}", json={"password": "ñ" * 37}).status_code == 422
+    assert client.put(f"/users/{user.id}", json={"password": "ñ" * 36}).status_code == 200
@@ -0,0 +1,157 @@
+# tests/test_rate_limit.py
+import pytest
+
+from src import rate_limit
+from src.password_hashing import hash_password, password_hasher
+from src.rate_limit import (
+    InMemoryWindowBackend,
+    LoginThrottle,
+    LoginThrottled,
+    RedisWindowBackend,
+    SlidingWindowLimiter,
+)
+
+
+class FakeRedis:
+    """Local stand-in for a redis-py client (incr/expire/get/mget/delete)"""
+
+    def __init__(self):
+        self.data = {}
+
+    def incr(self, name):
+        self.data[name] = int(self.data.get(name, 0)) + 1
+        return self.data[name]
+
+    def expire(self, name, seconds):
+        return True
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def mget(self, names):
+        return [self.data.get(name) for name in names]
+
+    def delete(self, *names):
+        for name in names:
+            self.data.pop(name, None)
+
+
+@pytest.mark.parametrize("backend_factory", [InMemoryWindowBackend, lambda: RedisWindowBackend(FakeRedis())])
+def test_sliding_window_limits_and_decays(backend_factory):
+    limiter = SlidingWindowLimiter(backend_factory(), limit=3, window=60)
+
+    assert [limiter.hit("k", now=0) for _ in range(3)] == [None, None, None]
+    retry_after = limiter.hit("k", now=1)
+    assert retry_after is not None and retry_after > 59
+
+    # Half way through the next window the previous 4 events weigh 2
+    assert limiter.hit("k", now=90) is None
+    assert limiter.hit("k", now=91) is not None
+    # Other keys are independent
+    assert limiter.hit("other", now=91) is None
+
+
+def test_blocked_does_not_count():
+    limiter = SlidingWindowLimiter(InMemoryWindowBackend(), limit=2, window=60)
+    for _ in range(5):
+        assert limiter.blocked("k", now=0) is None
+    limiter.hit("k", now=0)
+    limiter.hit("k", now=0)
+    assert limiter.blocked("k", now=0) is not None
+    limiter.reset("k", now=0)
+    assert limiter.blocked("k", now=0) is None
+
+
+def test_login_throttle_per_email_counts_failures_only():
+    backend = InMemoryWindowBackend()
+    throttle = LoginThrottle(
+        SlidingWindowLimiter(backend, limit=100, window=60),
+        SlidingWindowLimiter(backend, limit=2, window=60),
+    )
+    throttle.check("1.2.3.4", "victim@example.com")
+    throttle.record_failure("victim@example.com")
+    throttle.record_failure("VICTIM@example.com")
+    with pytest.raises(LoginThrottled) as exc_info:
+        throttle.check("5.6.7.8", "victim@example.com")
+    assert exc_info.value.scope == "email"
+
+    throttle.record_success("victim@example.com")
+    throttle.check("5.6.7.8", "victim@example.com")
+
+
+@pytest.fixture()
+def strict_throttle(monkeypatch):
+    backend = InMemoryWindowBackend()
+    throttle = rate_limit.login_throttle
+    monkeypatch.setattr(throttle, "ip_limiter", SlidingWindowLimiter(backend, limit=3, window=60))
+    monkeypatch.setattr(throttle, "email_limiter", SlidingWindowLimiter(backend, limit=2, window=60))
+    return throttle
+
+
+@pytest.fixture()
+def verify_calls(monkeypatch):
+    calls = []
+    real_verify = password_hasher.verify
+
+    async def counting_verify(plain, hashed):
+        calls.append(plain)
+        return await real_verify(plain, hashed)
+
+    monkeypatch.setattr(password_hasher, "verify", counting_verify)
+    return calls
+
+
+def test_login_is_throttled_before_hashing(client, db_session, strict_throttle, verify_calls):
+    from src.models import User
+
+    db_session.add(User(email="stuffed@example.com", hashed_password=hash_password("right"), full_name="S"))
+    db_session.commit()
+
+    for _ in range(2):
+        response = client.post("/users/login", json={"email": "stuffed@example.com", "password": "wrong"})
+        assert response.status_code == 400
+    assert len(verify_calls) == 2
+
+    response = client.post("/users/login", json={"email": "stuffed@example.com", "password": "right"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    # Rejected without running bcrypt
+    assert len(verify_calls) == 2
+
+
+def test_login_ip_limit(client, strict_throttle):
+    statuses = [
+        client.post("/users/login", json={"email": f"ip{i}@example.com", "password": "x"}).status_code
+        for i in range(4)
+    ]
+    assert statuses == [400, 400, 400, 429]
+
+
+def test_login_ip_limit_ignores_spoofed_forwarded_for(client, strict_throttle):
+    from fastapi.testclient import TestClient
+    from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+    from app import app
+
+    # What app.py installs for FORWARDED_ALLOW_IPS; TestClient's peer is the gateway
+    gateway = TestClient(ProxyHeadersMiddleware(app, trusted_hosts="testclient"))
+
+    def login(i, forwarded_for):
+        return gateway.post(
+            "/users/login",
+            json={"email": f"xff{i}@example.com", "password": "x"},
+            headers={"X-Forwarded-For": forwarded_for},
+        ).status_code
+
+    # The client rotates the leftmost entries; the gateway appends the real address
+    statuses = [login(i, f"10.9.9.{i}, 203.0.113.7") for i in range(4)]
+    assert statuses == [400, 400, 400, 429]
+    # Another real client keeps its own budget
+    assert login(4, "203.0.113.7, 198.51.100.2") == 400
+
+
+def test_unknown_email_gets_dummy_verification(client, strict_throttle, verify_calls):
+    response = client.post("/users/login", json={"email": "ghost@example.com", "password": "guess"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email o contraseña incorrectos"
+    assert verify_calls == ["guess"]
@@ -0,0 +1,185 @@
+# tests/test_replicas.py
+import pytest
+from sqlalchemy import create_engine, insert, select
+
+from src import database
+from src.migrations import run_migrations
+from src.models import User
+from src.replicas import RedisPinStore, ReplicaRouter
+from src.user_cache import user_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _sqlite_db(path, marker):
+    """SQLite file standing in for a database; one user whose name tells them apart"""
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(id=1, email="replica@example.com", hashed_password="x", full_name=marker))
+    engine.dispose()
+    return url
+
+
+def _engine(url):
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def _read_marker(router, keys=()):
+    with router.connect(keys) as conn:
+        return conn.execute(select(User.full_name).where(User.id == 1)).scalar_one()
+
+
+@pytest.fixture()
+def databases(tmp_path):
+    primary = _engine(_sqlite_db(tmp_path / "primary.db", "primary"))
+    replicas = [_sqlite_db(tmp_path / f"replica{i}.db", f"replica{i}") for i in range(2)]
+    yield primary, replicas
+    primary.dispose()
+
+
+def _router(databases, **kwargs):
+    primary, urls = databases
+    kwargs.setdefault("clock", FakeClock())
+    return ReplicaRouter(lambda: primary, urls, engine_factory=_engine, **kwargs)
+
+
+def test_round_robin_across_replicas(databases):
+    router = _router(databases)
+    assert [_read_marker(router) for _ in range(4)] == ["replica0", "replica1", "replica0", "replica1"]
+
+
+def test_least_loaded_prefers_idle_replica(databases):
+    router = _router(databases, strategy="least_loaded")
+    with router.connect() as busy:
+        busy_marker = busy.execute(select(User.full_name)).scalar_one()
+        # While one replica holds a connection every read goes to the other
+        assert {_read_marker(router) for _ in range(3)} == {"replica0", "replica1"} - {busy_marker}
+
+
+def test_failed_replica_leaves_rotation_and_is_probed_back(databases, tmp_path):
+    primary, urls = databases
+    clock = FakeClock()
+    broken = f"sqlite:///{tmp_path}/missing-dir/replica.db"
+    router = ReplicaRouter(lambda: primary, [broken, urls[1]], engine_factory=_engine, clock=clock, retry_interval=30)
+
+    assert [_read_marker(router) for _ in range(3)] == ["replica1"] * 3
+    assert router.status()[0]["healthy"] is False
+
+    # Still down: the retry interval has not elapsed
+    clock.now += 10
+    router.replicas[0].url = urls[0]
+    router.replicas[0]._engine = None
+    assert {_read_marker(router) for _ in range(2)} == {"replica1"}
+
+    clock.now += 30
+    assert {_read_marker(router) for _ in range(2)} == {"replica0", "replica1"}
+    assert router.status()[0]["healthy"] is True
+
+
+def test_all_replicas_down_falls_back_to_primary(databases, tmp_path):
+    primary, _ = databases
+    router = ReplicaRouter(
+        lambda: primary, [f"sqlite:///{tmp_path}/missing-dir/r.db"], engine_factory=_engine, clock=FakeClock()
+    )
+    assert _read_marker(router) == "primary"
+
+
+def test_read_your_writes_window(databases):
+    clock = FakeClock()
+    router = _router(databases, clock=clock, read_your_writes_window=5)
+    router.note_write("user:1")
+
+    assert _read_marker(router, ["user:1"]) == "primary"
+    assert _read_marker(router, ["user:2"]).startswith("replica")
+    clock.now += 6
+    assert _read_marker(router, ["user:1"]).startswith("replica")
+
+
+class FakeRedis:
+    """Local stand-in for a redis-py client (set with px / mget)"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+        self.down = False
+
+    def set(self, name, value, px=None):
+        if self.down:
+            raise ConnectionError("redis down")
+        self.data[name] = (value, self.clock() + px / 1000)
+
+    def mget(self, names):
+        if self.down:
+            raise ConnectionError("redis down")
+        now = self.clock()
+        return [value if value is not None and until > now else None
+                for value, until in (self.data.get(name, (None, 0)) for name in names)]
+
+
+def test_read_your_writes_pins_are_shared_between_workers(databases):
+    clock = FakeClock()
+    redis = FakeRedis(clock)
+    # Two workers, each with its own router, over the same store
+    writer = _router(databases, clock=clock, pin_store=RedisPinStore(redis))
+    reader = _router(databases, clock=clock, pin_store=RedisPinStore(redis))
+
+    writer.note_write("user:1")
+    assert _read_marker(reader, ["user:1"]) == "primary"
+    assert _read_marker(reader, ["user:2"]).startswith("replica")
+    clock.now += 6
+    assert _read_marker(reader, ["user:1"]).startswith("replica")
+
+    # Without the store the primary is the safe answer
+    redis.down = True
+    writer.note_write("user:3")
+    assert _read_marker(reader, ["user:2"]) == "primary"
+
+
+def test_get_user_reads_own_update_from_primary(client, db_session, tmp_path, monkeypatch):
+    """GET /users/{id} uses a replica, except right after updating that user"""
+    user = User(email="ryw@example.com", hashed_password="x", full_name="Original")
+    db_session.add(user)
+    db_session.commit()
+
+    replica_url = f"sqlite:///{tmp_path}/replica.db"
+    replica = create_engine(replica_url)
+    run_migrations(replica)
+    with replica.begin() as conn:
+        conn.execute(insert(User).values(id=user.id, email=user.email, hashed_password="x", full_name="Stale"))
+    replica.dispose()
+
+    router = ReplicaRouter(database.get_engine, [replica_url], engine_factory=_engine)
+    monkeypatch.setattr(database, "_replica_router", router)
+    from app import app
+    app.dependency_overrides.pop(database.get_read_db, None)
+    user_cache.invalidate(user.id)
+
+    assert client.get(f"/users/{user.id}").json()["full_name"] == "Stale"
+
+    assert client.put(f"/users/{user.id}", json={"full_name": "Updated"}).status_code == 200
+    assert client.get(f"/users/{user.id}").json()["full_name"] == "Updated"
+    router.dispose()
+
+
+def test_client_key_uses_the_token_only():
+    from starlette.requests import Request
+
+    def request(headers):
+        return Request({
+            "type": "http", "method": "PUT", "path": "/users/1", "client": ("10.0.0.2", 4000),
+            "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        })
+
+    token = database.client_key(request({"Authorization": "Bearer abc"}))
+    assert token.startswith("client:") and "abc" not in token
+    assert token == database.client_key(request({"Authorization": "Bearer abc"}))
+    # The peer address (the gateway) would pin every anonymous caller together
+    assert database.client_key(request({})) is None
@@ -0,0 +1,129 @@
+# tests/test_serialization.py
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+from src import schemas
+from src.middleware import compression_middleware
+from src.middleware.compression_middleware import CompressionMiddleware
+from src.models import User
+from src.serializers import TrustedJSONResponse, dumps, user_out
+
+
+def test_row_serializer_matches_response_model():
+    rows = [
+        {"id": 1, "email": "ana@example.com", "full_name": "Ána", "is_active": True, "version": 3},
+        {"id": 2, "email": "bob@example.com", "full_name": None, "is_active": False, "version": 1},
+    ]
+    expected = TypeAdapter(list[schemas.UserOut]).dump_json(
+        TypeAdapter(list[schemas.UserOut]).validate_python(rows)
+    )
+    assert json.loads(dumps(user_out.many(rows))) == json.loads(expected)
+    # ORM entities work too, and extra columns are dropped
+    entity = User(id=5, email="c@example.com", full_name="C", is_active=True, version=2)
+    assert user_out.one(entity) == {"email": "c@example.com", "full_name": "C", "id": 5, "is_active": True}
+
+
+def test_user_routes_skip_response_validation(client, db_session):
+    # Not a valid EmailStr: response_model validation would turn this into a 500
+    db_session.add(User(email="legacy-login", hashed_password="x", full_name="Trusted"))
+    db_session.commit()
+    user = db_session.query(User).filter_by(email="legacy-login").one()
+
+    response = client.get(f"/users/{user.id}")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"email": "legacy-login", "full_name": "Trusted", "id": user.id, "is_active": True}
+    assert "ETag" in response.headers
+
+    response = client.get(f"/users/?after={user.id - 1}&limit=1")
+    assert response.json()[0]["email"] == "legacy-login"
+
+
+def _app(minimum_size=100):
+    app = FastAPI()
+
+    @app.get("/big")
+    def big():
+        return TrustedJSONResponse([{"n": i} for i in range(200)])
+
+    @app.get("/small")
+    def small():
+        return TrustedJSONResponse({"ok": True})
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse("x" * 5000, media_type="image/svg")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f'{{"n": {i}}}\n' for i in range(50)), media_type="application/x-ndjson")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=minimum_size)
+    return TestClient(app)
+
+
+def test_gzip_above_minimum_size(monkeypatch):
+    monkeypatch.setattr(compression_middleware, "brotli", None)
+    client = _app()
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(dumps([{"n": i} for i in range(200)]))
+    assert len(response.json()) == 200
+
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert small.json() == {"ok": True}
+
+
+@pytest.mark.parametrize("accept", ["identity", "gzip;q=0", ""])
+def test_not_compressed_unless_accepted(accept, monkeypatch):
+    monkeypatch.setattr(compression_middleware, "brotli", None)
+    response = _app().get("/big", headers={"Accept-Encoding": accept})
+    assert "content-encoding" not in response.headers
+
+
+def test_incompressible_types_are_left_alone():
+    response = _app().get("/text", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_streamed_ndjson_is_compressed_incrementally(monkeypatch):
+    monkeypatch.setattr(compression_middleware, "brotli", None)
+    with _app().stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        # httpx decodes each flushed chunk as it arrives
+        body = b"".join(response.iter_bytes())
+    lines = body.decode().splitlines()
+    assert len(lines) == 50 and json.loads(lines[-1]) == {"n": 49}
+
+
+def test_brotli_preferred_when_available(monkeypatch):
+    class FakeCompressor:
+        def __init__(self, quality):
+            self.quality = quality
+
+        def process(self, data):
+            return data
+
+        def flush(self):
+            return b""
+
+        def finish(self):
+            return b""
+
+    class FakeBrotli:
+        Compressor = FakeCompressor
+
+    monkeypatch.setattr(compression_middleware, "brotli", FakeBrotli)
+    client = _app()
+    scope = {"headers": [(b"accept-encoding", b"gzip, br")]}
+    assert compression_middleware.choose_encoding(scope) == "br"
+    response = client.get("/big", headers={"Accept-Encoding": "br"})
+    assert response.headers["content-encoding"] == "br"
@@ -0,0 +1,90 @@
+# tests/test_server.py
+import pytest
+
+from src import server
+from src.config import Config
+
+
+@pytest.fixture()
+def config(monkeypatch, tmp_path):
+    for name in ("SERVER_WORKERS", "WEB_CONCURRENCY", "SERVER_TLS"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("SSL_CERTFILE", str(tmp_path / "server.crt"))
+    monkeypatch.setenv("SSL_KEYFILE", str(tmp_path / "server.key"))
+    return Config()
+
+
+def test_cgroup_v2_quota_caps_cpus(tmp_path, monkeypatch):
+    monkeypatch.setattr(server.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+    assert server.available_cpus(str(tmp_path)) == 2
+
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert server.available_cpus(str(tmp_path)) == 8
+
+
+def test_cgroup_v1_quota(tmp_path, monkeypatch):
+    monkeypatch.setattr(server.os, "sched_getaffinity", lambda pid: set(range(4)), raising=False)
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("50000")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000")
+    assert server.available_cpus(str(tmp_path)) == 1
+
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("-1")
+    assert server.available_cpus(str(tmp_path)) == 4
+
+
+def test_workers_default_to_cpus(config, monkeypatch):
+    assert server.server_options(config, cpus=3)["workers"] == 3
+    monkeypatch.setenv("WEB_CONCURRENCY", "5")
+    assert server.server_options(Config(), cpus=3)["workers"] == 5
+    monkeypatch.setenv("SERVER_WORKERS", "2")
+    assert server.server_options(Config(), cpus=3)["workers"] == 2
+
+
+def test_tls_auto_uses_mounted_certs(config, tmp_path):
+    assert "ssl_certfile" not in server.server_options(config, cpus=1)
+
+    (tmp_path / "server.crt").write_text("cert")
+    (tmp_path / "server.key").write_text("key")
+    options = server.server_options(config, cpus=1)
+    assert options["ssl_certfile"] == str(tmp_path / "server.crt")
+    assert options["ssl_keyfile"] == str(tmp_path / "server.key")
+
+
+def test_tls_required_without_certs_fails(config, monkeypatch):
+    monkeypatch.setenv("SERVER_TLS", "true")
+    with pytest.raises(RuntimeError):
+        server.server_options(Config(), cpus=1)
+
+
+def test_recycling_and_keepalive_options(config, monkeypatch):
+    options = server.server_options(config, cpus=1)
+    assert options["limit_max_requests"] == 10000
+    assert options["limit_max_requests_jitter"] == 1000
+    assert options["timeout_keep_alive"] == 75
+    assert options["access_log"] is False
+
+    monkeypatch.setenv("SERVER_MAX_REQUESTS", "0")
+    options = server.server_options(Config(), cpus=1)
+    assert options["limit_max_requests"] is None
+    assert options["limit_max_requests_jitter"] == 0
+
+
+def test_process_local_state_with_several_workers(config, monkeypatch):
+    monkeypatch.setenv("USER_CACHE_BACKEND", "memory")
+    monkeypatch.delenv("DATABASE_READ_URLS", raising=False)
+    monkeypatch.delenv("DB_READ_YOUR_WRITES_BACKEND", raising=False)
+    assert server.process_local_warnings(Config(), workers=1) == []
+    # Warned, never rewritten: the cache keeps working within each worker
+    [warning] = server.process_local_warnings(Config(), workers=4)
+    assert warning.startswith("USER_CACHE_BACKEND=memory")
+    monkeypatch.setenv("USER_CACHE_BACKEND", "redis")
+    assert server.process_local_warnings(Config(), workers=4) == []
+
+    # Replicas start with any worker count; only per-process pins are flagged
+    monkeypatch.setenv("DATABASE_READ_URLS", "mysql+pymysql://replica/db")
+    [warning] = server.process_local_warnings(Config(), workers=4)
+    assert warning.startswith("DB_READ_YOUR_WRITES_BACKEND=memory")
+    monkeypatch.setenv("DB_READ_YOUR_WRITES_BACKEND", "redis")
+    assert server.process_local_warnings(Config(), workers=4) == []
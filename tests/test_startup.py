@@ -0,0 +1,79 @@
+# tests/test_startup.py
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from src import migrations
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_importing_app_does_not_touch_the_database(tmp_path):
+    db_path = tmp_path / "untouched.db"
+    code = "import app, src.database as d; print(d._engine is None)"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env={"DATABASE_URL": f"sqlite:///{db_path}", "PATH": ""},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip().endswith("True")
+    assert not db_path.exists()
+
+
+def test_ensure_schema_retries_until_database_is_up(monkeypatch):
+    calls, sleeps = [], []
+
+    def flaky_check(engine):
+        calls.append(engine)
+        if len(calls) < 3:
+            raise OperationalError("SELECT 1", {}, ConnectionRefusedError("db starting"))
+        return True
+
+    monkeypatch.setattr(migrations, "schema_is_current", flaky_check)
+    monkeypatch.setattr(migrations.time, "sleep", sleeps.append)
+
+    assert migrations.ensure_schema(object(), startup_timeout=30, max_backoff=1) == []
+    assert len(calls) == 3
+    assert len(sleeps) == 2 and all(0 < delay <= 1 for delay in sleeps)
+
+
+def test_ensure_schema_gives_up_after_startup_timeout(monkeypatch):
+    def down(engine):
+        raise OperationalError("SELECT 1", {}, ConnectionRefusedError("db down"))
+
+    monkeypatch.setattr(migrations, "schema_is_current", down)
+    with pytest.raises(OperationalError):
+        migrations.ensure_schema(object(), startup_timeout=0)
+
+
+def test_concurrent_workers_migrate_once(tmp_path):
+    url = f"sqlite:///{tmp_path / 'workers.db'}"
+    results, errors = [], []
+
+    def worker():
+        engine = create_engine(url)
+        try:
+            results.append(migrations.ensure_schema(engine, lock_timeout=10))
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            engine.dispose()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    engine = create_engine(url)
+    assert migrations.applied_versions(engine) == [m.version for m in migrations.MIGRATIONS]
+    assert migrations.schema_is_current(engine)
@@ -0,0 +1,134 @@
+# tests/test_user_cache.py
+import asyncio
+import threading
+import time
+
+from src.user_cache import InMemoryLRUBackend, RedisBackend, UserCache
+
+
+class FakeRedis:
+    """Local stand-in for a redis-py client (get/set with ex/nx, delete)"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, name):
+        entry = self.data.get(name)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return entry[0]
+
+    def set(self, name, value, ex=None, nx=False):
+        if nx and self.get(name) is not None:
+            return None
+        self.data[name] = (value, time.monotonic() + (ex or 3600))
+        return True
+
+    def delete(self, name):
+        self.data.pop(name, None)
+
+
+def test_memory_backend_is_lru_with_ttl():
+    backend = InMemoryLRUBackend(max_size=2)
+    backend.set("a", "1", ttl=60)
+    backend.set("b", "2", ttl=60)
+    backend.get("a")
+    backend.set("c", "3", ttl=60)
+    assert backend.get("b") is None
+    assert backend.get("a") == "1"
+
+    backend.set("short", "x", ttl=0)
+    assert backend.get("short") is None
+
+
+def test_read_through_and_invalidate():
+    cache = UserCache(InMemoryLRUBackend(100), ttl=60)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return {"id": 1, "email": "c@example.com", "full_name": "C", "is_active": True}
+
+    assert cache.get_or_load(1, loader)["email"] == "c@example.com"
+    assert cache.get_or_load(1, loader)["email"] == "c@example.com"
+    assert len(loads) == 1
+
+    cache.invalidate(1)
+    cache.get_or_load(1, loader)
+    assert len(loads) == 2
+
+
+def test_concurrent_misses_load_once():
+    for backend in (InMemoryLRUBackend(100), RedisBackend(FakeRedis())):
+        cache = UserCache(backend, ttl=60)
+        loads = []
+
+        def loader():
+            loads.append(1)
+            time.sleep(0.05)
+            return {"id": 5, "email": "hot@example.com", "full_name": None, "is_active": True}
+
+        threads = [threading.Thread(target=cache.get_or_load, args=(5, loader)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(loads) == 1
+
+
+def test_concurrent_async_misses_load_once():
+    cache = UserCache(InMemoryLRUBackend(100), ttl=60)
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        await asyncio.sleep(0.05)
+        return {"id": 5, "email": "hot@example.com", "full_name": None, "is_active": True}
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_load_async(5, loader) for _ in range(8)))
+
+    results = asyncio.run(run())
+    assert len(loads) == 1
+    assert all(result == results[0] for result in results)
+    assert cache.get(5) == results[0]
+
+
+def test_failed_async_load_is_retried_by_waiters():
+    cache = UserCache(InMemoryLRUBackend(100), ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise ConnectionError("db down")
+        return {"id": 6, "email": "retry@example.com", "full_name": None, "is_active": True}
+
+    async def run():
+        return await asyncio.gather(
+            cache.get_or_load_async(6, loader), cache.get_or_load_async(6, loader), return_exceptions=True
+        )
+
+    first, second = asyncio.run(run())
+    assert isinstance(first, ConnectionError)
+    assert second["email"] == "retry@example.com"
+    assert cache._loading == {}
+
+
+def test_missing_users_are_not_cached():
+    cache = UserCache(RedisBackend(FakeRedis()), ttl=60)
+    assert cache.get_or_load(404, lambda: None) is None
+    assert cache.get(404) is None
+
+
+def test_update_invalidates_cached_profile(client, db_session):
+    from src.models import User
+
+    user = User(email="cacheroute@example.com", hashed_password="x", full_name="Before")
+    db_session.add(user)
+    db_session.commit()
+
+    assert client.get(f"/users/{user.id}").json()["full_name"] == "Before"
+    client.put(f"/users/{user.id}", json={"full_name": "After"})
+    assert client.get(f"/users/{user.id}").json()["full_name"] == "After"
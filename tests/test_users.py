@@ -1,4 +1,6 @@
 # tests/test_routes.py
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 from app import app  # Asegúrate de importar tu app FastAPI correctamente
@@ -56,12 +58,12 @@ def test_login_wrong_password(client):
     client.post("/users/register", params={"email": "wrongpass@example.com", "password": "rightpass", "full_name": "Wrong Pass"})
     response = client.post("/users/login", params={"email": "wrongpass@example.com", "password": "wrongpass"})
     assert response.status_code == 400
-    assert response.json()["detail"] == "Contraseña incorrecta"
+    assert response.json()["detail"] == "Email o contraseña incorrectos"
 
 def test_login_user_not_found(client):
     response = client.post("/users/login", params={"email": "nonexistent@example.com", "password": "any"})
     assert response.status_code == 400
-    assert response.json()["detail"] == "Usuario no encontrado"
+    assert response.json()["detail"] == "Email o contraseña incorrectos"
 
 # --- Tests GET /users y /users/{id} ---
 def test_get_users(client):
@@ -112,3 +114,221 @@ def test_delete_user_not_found(client):
     response = client.delete("/users/9999")
     assert response.status_code == 404
     assert response.json()["detail"] == "User not found"
+
+# --- Tests GET /users paginado y streaming ---
+def _seed_users(db_session, prefix, count):
+    from src.models import User
+    users = [User(email=f"{prefix}{i}@example.com", hashed_password="x", full_name=f"{prefix} {i}") for i in range(count)]
+    db_session.add_all(users)
+    db_session.commit()
+    return [u.id for u in users]
+
+def test_get_users_keyset_pagination(client, db_session):
+    ids = _seed_users(db_session, "page", 5)
+    after = ids[0] - 1
+    response = client.get(f"/users/?after={after}&limit=2")
+    assert response.status_code == 200
+    assert [u["id"] for u in response.json()] == ids[:2]
+    assert response.headers["X-Next-Cursor"] == str(ids[1])
+    assert 'rel="next"' in response.headers["Link"]
+
+    response = client.get(f"/users/?after={ids[1]}&limit=2")
+    assert [u["id"] for u in response.json()] == ids[2:4]
+
+def test_get_users_last_page_has_no_cursor(client, db_session):
+    ids = _seed_users(db_session, "lastpage", 2)
+    response = client.get(f"/users/?after={ids[0]}&limit=50")
+    assert response.status_code == 200
+    assert "X-Next-Cursor" not in response.headers
+
+def test_get_users_stream_ndjson(client, db_session):
+    import json
+    ids = _seed_users(db_session, "stream", 3)
+    response = client.get(f"/users/?stream=true&after={ids[0] - 1}")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["id"] for r in rows][:3] == ids
+    assert rows[0]["email"] == "stream0@example.com"
+
+# --- Tests POST /users/bulk ---
+def test_bulk_import_json_array(client, db_session):
+    _seed_users(db_session, "bulkexisting", 1)
+    payload = [
+        {"email": "bulk1@example.com", "full_name": "Bulk One", "password": "secret1"},
+        {"email": "bulkexisting0@example.com", "full_name": "Exists", "password": "secret1"},
+        {"email": "bulk1@example.com", "full_name": "Repeated", "password": "secret1"},
+        {"email": "not-an-email", "full_name": "Bad", "password": "secret1"},
+        {"email": "bulk2@example.com", "full_name": "Bulk Two", "password": "secret2"},
+    ]
+    response = client.post("/users/bulk", json=payload)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["duplicates"], body["invalid"]) == (2, 2, 1)
+    assert [r["status"] for r in body["results"]] == ["created", "duplicate", "duplicate", "invalid", "created"]
+    assert body["results"][0]["id"] is not None
+
+    login = client.post("/users/login", json={"email": "bulk2@example.com", "password": "secret2"})
+    assert login.status_code == 200
+
+def test_bulk_import_ndjson(client):
+    lines = [
+        '{"email": "ndjson1@example.com", "full_name": "N One", "password": "secret1"}',
+        "not json",
+        '{"email": "ndjson2@example.com", "full_name": "N Two", "password": "secret2"}',
+    ]
+    response = client.post(
+        "/users/bulk",
+        content="\n".join(lines),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == ["created", "invalid", "created"]
+
+def test_bulk_import_rejects_non_array(client):
+    response = client.post("/users/bulk", json={"email": "x@example.com"})
+    assert response.status_code == 400
+
+def test_bulk_import_duplicates_ignore_case_and_long_passwords_are_invalid(client, db_session):
+    _seed_users(db_session, "bulkcase", 1)
+    payload = [
+        {"email": "BulkCase0@example.com", "full_name": "Exists", "password": "secret1"},
+        {"email": "bulkmixed@example.com", "full_name": "Mixed", "password": "secret1"},
+        {"email": "BULKMIXED@example.com", "full_name": "Mixed again", "password": "secret1"},
+        # bcrypt refuses more than 72 bytes: reported for the row, not a 500
+        {"email": "bulklong@example.com", "full_name": "Long", "password": "ñ" * 37},
+    ]
+    response = client.post("/users/bulk", json=payload)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["duplicate", "created", "duplicate", "invalid"]
+    assert results[3]["error"] == "password: Value error, must be at most 72 bytes (UTF-8)"
+
+def test_bulk_import_over_max_rows_is_rejected(client, monkeypatch):
+    from src.routes import users_routes
+
+    monkeypatch.setattr(users_routes.config, "BULK_IMPORT_MAX_ROWS", 2)
+    rows = [{"email": f"bulkmax{i}@example.com", "full_name": "Max", "password": "secret1"} for i in range(3)]
+    response = client.post("/users/bulk", json=rows)
+    assert response.status_code == 413
+    # Nothing was imported from the rejected array
+    assert client.post("/users/login", json={"email": "bulkmax0@example.com", "password": "secret1"}).status_code == 400
+
+    response = client.post(
+        "/users/bulk",
+        content="\n".join(json.dumps(row) for row in rows),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 413
+
+# --- Tests /users/batch ---
+def test_get_users_batch_preserves_order_and_reports_missing(client, db_session):
+    ids = _seed_users(db_session, "batch", 3)
+    response = client.get(f"/users/batch?ids={ids[2]},{ids[0]},999999,{ids[2]}")
+    assert response.status_code == 200
+    body = response.json()
+    assert [u["id"] for u in body["users"]] == [ids[2], ids[0]]
+    assert body["missing"] == [999999]
+
+def test_post_users_batch(client, db_session):
+    ids = _seed_users(db_session, "batchpost", 2)
+    response = client.post("/users/batch", json={"ids": [ids[1], ids[0]]})
+    assert response.status_code == 200
+    assert [u["email"] for u in response.json()["users"]] == ["batchpost1@example.com", "batchpost0@example.com"]
+
+def test_users_batch_rejects_bad_ids(client):
+    assert client.get("/users/batch?ids=1,abc").status_code == 422
+
+# --- Tests ETag / GET condicional ---
+def test_get_user_etag_and_304(client, db_session):
+    user_id = _seed_users(db_session, "etag", 1)[0]
+    response = client.get(f"/users/{user_id}")
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    cached = client.get(f"/users/{user_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    client.put(f"/users/{user_id}", json={"full_name": "Changed"})
+    changed = client.get(f"/users/{user_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+def test_get_users_collection_etag(client, db_session):
+    ids = _seed_users(db_session, "etaglist", 2)
+    url = f"/users/?after={ids[0] - 1}&limit=2"
+    etag = client.get(url).headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    client.delete(f"/users/{ids[1]}")
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+def test_get_users_filters_active(client, db_session):
+    from src.models import User
+    ids = _seed_users(db_session, "activefilter", 3)
+    db_session.get(User, ids[1]).is_active = False
+    db_session.commit()
+
+    response = client.get(f"/users/?after={ids[0] - 1}&active=true&limit=2")
+    assert [u["id"] for u in response.json()] == [ids[0], ids[2]]
+    response = client.get(f"/users/?after={ids[0] - 1}&active=false&limit=1")
+    assert [u["id"] for u in response.json()] == [ids[1]]
+
+def test_get_user_by_email_is_case_insensitive(db_session):
+    from src import crud
+    (user_id,) = _seed_users(db_session, "MixedCase", 1)
+    assert crud.get_user_by_email(db_session, "mixedcase0@EXAMPLE.com").id == user_id
+
+# --- Tests GET /users/search ---
+
+def test_search_users_by_email_and_name_prefix(client, db_session):
+    from src.models import User
+    users = [
+        User(email="zorro.search@example.com", hashed_password="x", full_name="Zeta Search"),
+        User(email="zeta@example.com", hashed_password="x", full_name="Zorro Search Name"),
+        User(email="zorro@example.com", hashed_password="x", full_name="Other"),
+        User(email="zorrinactive@example.com", hashed_password="x", full_name="Zorro Inactive", is_active=False),
+    ]
+    db_session.add_all(users)
+    db_session.commit()
+
+    response = client.get("/users/search?q=ZORRO")
+    assert response.status_code == 200
+    emails = [u["email"] for u in response.json()]
+    # Email matches first (shorter first), then name matches; inactive excluded
+    assert emails == ["zorro@example.com", "zorro.search@example.com", "zeta@example.com"]
+
+    response = client.get("/users/search?q=zorro&limit=1")
+    assert [u["email"] for u in response.json()] == ["zorro@example.com"]
+
+    # Wildcard-looking characters are matched literally
+    assert client.get("/users/search?q=zo_ro").json() == []
+    assert client.get("/users/search?q=zor%25").json() == []
+
+    # Renames refresh the stored search key
+    assert client.put(f"/users/{users[1].id}", json={"full_name": "Ñandú Renamed"}).status_code == 200
+    assert [u["email"] for u in client.get("/users/search?q=ñandú").json()] == ["zeta@example.com"]
+
+def test_search_users_validates_query(client):
+    assert client.get("/users/search?q=").status_code == 422
+    assert client.get("/users/search?q=abc&limit=0").status_code == 422
+
+# --- Rutas de solo lectura sin Session ---
+
+def test_read_routes_do_not_open_a_session(client, db_session):
+    from app import app
+    from src.database import get_db
+    ids = _seed_users(db_session, "readonly", 2)
+
+    def no_session():
+        raise AssertionError("GET routes must use get_read_db")
+        yield
+
+    app.dependency_overrides[get_db] = no_session
+    assert client.get(f"/users/{ids[0]}").status_code == 200
+    assert client.get(f"/users/?after={ids[0] - 1}&limit=2").status_code == 200
+    assert client.get(f"/users/batch?ids={ids[0]},{ids[1]}").json()["missing"] == []
+    assert client.get("/users/search?q=readonly").status_code == 200
+    lines = client.get(f"/users/?after={ids[0] - 1}&limit=2&stream=true").text.splitlines()
+    assert len(lines) == 2